@@ -0,0 +1,135 @@
+from __future__ import annotations
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Finished jobs kept around for status/result lookups
+MAX_FINISHED_JOBS = 100
+
+
+@dataclass
+class Job:
+    id: str
+    description: str
+    status: str = QUEUED
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    future: Optional[Future] = None
+    # Latest {"done", "total"} and the items reported so far through on_progress
+    progress: Optional[dict] = None
+    partial: List[Any] = field(default_factory=list)
+
+    def report(self, done: int, total: int, item: Any = None) -> None:
+        self.progress = {"done": done, "total": total}
+        if item is not None:
+            self.partial.append(item.to_dict() if hasattr(item, "to_dict") else item)
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED, CANCELLED)
+
+    def to_dict(self, include_result: bool = False) -> dict:
+        d = {
+            "job_id": self.id,
+            "description": self.description,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "progress": self.progress,
+        }
+        if self.partial and not (include_result and self.done):
+            d["partial_results"] = list(self.partial)
+        if include_result:
+            d["result"] = self.result
+        return d
+
+
+class JobManager:
+    """
+    Runs long booking calls on a background executor so MCP tools can
+    return a job id immediately and be polled for status/result.
+
+    Job functions receive a `cancel_event` keyword argument and should stop
+    at the next safe point once it is set, and an `on_progress(done, total,
+    item)` callback whose reports show up in the job's status.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def submit(self, fn: Callable[..., Any], description: str, **kwargs) -> Job:
+        with self._lock:
+            job = Job(id=f"job-{next(self._ids)}", description=description)
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._executor.submit(self._run, job, fn, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Job:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Unknown job id '{job_id}'")
+        return job
+
+    def cancel(self, job_id: str) -> Job:
+        job = self.get(job_id)
+        if job.done:
+            return job
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            # Never started; finish it here since _run will not run
+            job.status = CANCELLED
+            job.finished_at = time.time()
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Any], kwargs: dict) -> None:
+        if job.cancel_event.is_set():
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = fn(cancel_event=job.cancel_event, on_progress=job.report, **kwargs)
+            job.status = CANCELLED if job.cancel_event.is_set() else SUCCEEDED
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self) -> None:
+        finished = [j for j in self._jobs.values() if j.done]
+        for job in sorted(finished, key=lambda j: j.finished_at or 0)[:-MAX_FINISHED_JOBS]:
+            del self._jobs[job.id]
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
@@ -5,21 +5,322 @@ _project_root = Path(__file__).resolve().parents[1]
 if str(_project_root) not in sys.path:
     sys.path.insert(0, str(_project_root))
 
-from mcp.server.fastmcp import FastMCP
-from app_mcp.tools.wework import book_wework_desks
+import argparse
+import asyncio
+import hmac
+import logging
+import os
+import threading
+
+import anyio
+from mcp.server.fastmcp import Context, FastMCP, Image
+from mcp.server.transport_security import TransportSecuritySettings
+
+
+def _tools():
+    """
+    The tool implementations, imported on first use. They pull in Appium and
+    Selenium, so importing them here would delay the MCP handshake.
+    """
+    from app_mcp.tools import wework
+    return wework
+
 
 mcp = FastMCP("Personal Automation Suite", json_response=True)
 
+TRANSPORTS = ("stdio", "streamable-http", "sse")
+# Threads for blocking tool work: Appium/Selenium calls, state and artifact files
+TOOL_THREADS = int(os.environ.get("MCP_TOOL_THREADS", "8"))
+# wework_book_desks calls waiting on the device queue at once; the phones
+# themselves are driven by the dispatcher's one worker per device
+BOOKING_WAITERS = int(os.environ.get("MCP_BOOKING_WAITERS", "32"))
+
+_limiters: dict = {}
+
+
+def _limiter(name: str, total: int) -> anyio.CapacityLimiter:
+    # Created on the event loop, on first use
+    if name not in _limiters:
+        _limiters[name] = anyio.CapacityLimiter(total)
+    return _limiters[name]
+
+
+async def _call(name: str, *args, **kwargs):
+    """
+    Run a tool implementation on the bounded tool threads, so the event loop
+    keeps serving other clients while it blocks. Calls beyond TOOL_THREADS
+    wait for a free thread.
+    """
+    def run():
+        return getattr(_tools(), name)(*args, **kwargs)
+    return await anyio.to_thread.run_sync(run, limiter=_limiter("tools", TOOL_THREADS))
+
+
+def _client(ctx: Context) -> str:
+    """Who is asking, for fair queueing across agents: the client id if sent, else the MCP session."""
+    if ctx.client_id:
+        return ctx.client_id
+    session = ctx.session
+    params = getattr(session, "client_params", None)
+    name = params.clientInfo.name if params is not None else "client"
+    return f"{name}-{id(session):x}"
+
+
 @mcp.tool()
-def wework_book_desks(
+async def wework_book_desks(
     dates: list[str],
-    building: str
+    building: str,
+    ctx: Context
 ) -> str:
-    return book_wework_desks(dates, building)
+    """
+    Book desks and wait for the result. Each date is an ISO date or a spec:
+    '2026-03-02..2026-03-27', '2026-03-02..2026-05-29:Tue,Thu',
+    'today..+13w:Mon,Wed' or 'RRULE:FREQ=WEEKLY;BYDAY=TU,TH;UNTIL=20260630'.
+    Sends a progress notification as each date finishes and returns JSON with
+    a status, duration, error and final screen per date; retry_dates lists
+    the dates worth retrying.
+    """
+    loop = asyncio.get_running_loop()
+    client = _client(ctx)
 
-if __name__ == "__main__":
+    def on_progress(done, total, result):
+        # Called from the device threads; hand the notification to the event loop
+        message = f"{result.date}: {result.status}" + (f" ({result.error})" if result.error else "")
+        asyncio.run_coroutine_threadsafe(ctx.report_progress(done, total, message), loop)
+
+    def book():
+        return _tools().book_wework_desks(dates, building, on_progress=on_progress, client=client)
+
+    # Run off the event loop so the server keeps answering while the phone works.
+    # The thread only waits on the device queue, so these have their own limit.
+    return await anyio.to_thread.run_sync(book, limiter=_limiter("bookings", BOOKING_WAITERS))
+
+@mcp.tool()
+async def wework_submit_booking(
+    dates: list[str],
+    building: str,
+    ctx: Context
+) -> str:
+    """Start booking in the background; returns a job id to poll. Dates as for wework_book_desks."""
+    return await _call("submit_booking_job", dates, building, client=_client(ctx))
+
+@mcp.tool()
+async def wework_job_status(job_id: str) -> str:
+    """Status of a booking job (queued, running, succeeded, failed, cancelled)."""
+    return await _call("booking_job_status", job_id)
+
+@mcp.tool()
+async def wework_job_result(job_id: str) -> str:
+    """Status plus the booking result once the job has finished."""
+    return await _call("booking_job_result", job_id)
+
+@mcp.tool()
+async def wework_cancel_job(job_id: str) -> str:
+    """Cancel a queued job, or stop a running one before its next date."""
+    return await _call("cancel_booking_job", job_id)
+
+@mcp.tool()
+async def wework_queue() -> str:
+    """
+    Device queue shared by all clients: queued dates per client, what each
+    device is booking, queue wait p50/p95 and bookings shared between requests.
+    """
+    return await _call("queue_stats")
+
+@mcp.tool()
+async def wework_availability(
+    dates: list[str],
+    ctx: Context,
+    buildings: list[str] | None = None,
+    max_age_s: float | None = None
+) -> str:
+    """
+    Desks free at each centre per date, without booking. Dates as for
+    wework_book_desks; buildings narrows the answer to those centres. Days
+    checked in the last few minutes are answered from a cache without
+    touching the phone; max_age_s=0 forces a fresh look. A day the app does
+    not offer is returned with bookable false.
+    """
+    return await _call("check_availability", dates, buildings, max_age_s, client=_client(ctx))
+
+@mcp.tool()
+async def wework_list_bookings(
+    ctx: Context,
+    start: str | None = None,
+    end: str | None = None,
+    refresh: bool = False
+) -> str:
+    """
+    Desk bookings in the app from start (default today) to end (ISO dates;
+    default all upcoming). Only as much of the app's list as the range
+    needs is read, and it is remembered until the next booking or
+    cancellation; refresh=true reads it again.
+    """
+    return await _call("list_bookings", start, end, refresh, client=_client(ctx))
+
+@mcp.tool()
+async def wework_cancel_booking(date: str, building: str, ctx: Context) -> str:
+    """Cancel the desk booking on date (ISO) at building."""
+    return await _call("cancel_booking", date, building, client=_client(ctx))
+
+@mcp.tool()
+async def wework_trace(last_runs: int = 20) -> str:
+    """p50/p95/p99 duration, retries and errors per booking step over recent runs."""
+    return await _call("trace_summary", last_runs)
+
+
+@mcp.tool()
+async def wework_failures(limit: int = 20) -> str:
+    """Recent failed booking steps with captured screens: id, date, stage, error."""
+    return await _call("list_artifacts", limit)
+
+@mcp.tool()
+async def wework_failure(artifact_id: str, include_screenshot: bool = True) -> list:
+    """
+    One failure artifact: error, traceback, step trace and the page source at
+    the moment the step failed, plus the screenshot as an image.
+    """
+    text, png = await _call("get_artifact", artifact_id)
+    if include_screenshot and png:
+        return [text, Image(data=png, format="png")]
+    return [text]
+
+
+@mcp.tool()
+async def wework_schedule_add(
+    dates: list[str],
+    building: str,
+    fire_at: str,
+    lead_seconds: float = 90,
+    repeat_days: int = 0
+) -> str:
+    """
+    Book automatically the moment the booking window opens. fire_at is an ISO
+    datetime (local time unless it has an offset). The app is pre-warmed to the
+    date picker lead_seconds before. Dates as for wework_book_desks, relative to
+    the fire day ('+14d'); repeat_days re-arms the schedule after each run.
+    """
+    return await _call("add_schedule", dates, building, fire_at, lead_seconds, repeat_days)
+
+@mcp.tool()
+async def wework_schedule_list() -> str:
+    """Pending and past schedules with each run's fire-time jitter and booking results."""
+    return await _call("list_schedules")
+
+@mcp.tool()
+async def wework_schedule_remove(schedule_id: str) -> str:
+    """Delete a schedule; a pre-warmed run stops before it fires."""
+    return await _call("remove_schedule", schedule_id)
+
+
+def _warm_up() -> None:
+    # Load the automation stack, resume saved schedules and start the Appium
+    # session so the first booking finds everything warm
+    _tools().start_scheduler()
+    _tools().warm_session()
+
+
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+class _BearerAuth:
+    """
+    ASGI middleware for the HTTP transports: every request must carry
+    `Authorization: Bearer <MCP_AUTH_TOKEN>`.
+    """
+
+    def __init__(self, app, token: str):
+        self.app = app
+        self._expected = f"Bearer {token}".encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            given = dict(scope.get("headers") or []).get(b"authorization", b"")
+            if not hmac.compare_digest(given, self._expected):
+                await send({
+                    "type": "http.response.start",
+                    "status": 401,
+                    "headers": [(b"content-type", b"text/plain"), (b"www-authenticate", b"Bearer")],
+                })
+                await send({"type": "http.response.body", "body": b"Unauthorized"})
+                return
+        await self.app(scope, receive, send)
+
+
+def configure_http(host: str, port: int) -> None:
+    """
+    Settings for the HTTP transports, where one long-running server is shared
+    by many clients.
+
+    The tools book and cancel desks on the signed-in account, so a bind beyond
+    loopback needs MCP_ALLOWED_HOSTS or MCP_AUTH_TOKEN; without either this
+    raises ValueError rather than serve them to anyone who can reach the port.
+    """
+    mcp.settings.host = host
+    mcp.settings.port = port
+    # Stream progress notifications back as SSE instead of a single JSON body
+    mcp.settings.json_response = False
+    if host not in LOOPBACK_HOSTS:
+        allowed = [h.strip() for h in os.environ.get("MCP_ALLOWED_HOSTS", "").split(",") if h.strip()]
+        if not allowed and not os.environ.get("MCP_AUTH_TOKEN"):
+            raise ValueError(
+                f"Refusing to serve on {host} without MCP_ALLOWED_HOSTS or MCP_AUTH_TOKEN; "
+                "set one of them, or bind to 127.0.0.1"
+            )
+        # The DNS rebinding check set up for the loopback default would reject
+        # every request addressed to this host; MCP_ALLOWED_HOSTS narrows it again
+        mcp.settings.transport_security = TransportSecuritySettings(
+            enable_dns_rebinding_protection=bool(allowed),
+            allowed_hosts=allowed,
+            allowed_origins=[f"http://{h}" for h in allowed] + [f"https://{h}" for h in allowed],
+        )
+
+
+def http_app(transport: str):
+    """
+    The ASGI app for an HTTP transport, behind the bearer-token check when
+    MCP_AUTH_TOKEN is set.
+    """
+    app = mcp.sse_app() if transport == "sse" else mcp.streamable_http_app()
+    token = os.environ.get("MCP_AUTH_TOKEN")
+    return _BearerAuth(app, token) if token else app
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="WeWork automation MCP server")
+    parser.add_argument(
+        "--transport", choices=TRANSPORTS, default=os.environ.get("MCP_TRANSPORT", "stdio"),
+        help="stdio (default) for one client; streamable-http or sse to serve many clients",
+    )
+    parser.add_argument("--host", default=os.environ.get("MCP_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("MCP_PORT", "8000")))
+    args = parser.parse_args(argv)
+    if args.transport != "stdio":
+        try:
+            configure_http(args.host, args.port)
+        except ValueError as e:
+            parser.error(str(e))
+
+    # With stdio, stdout is the MCP channel; logs go to stderr
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    threading.Thread(target=_warm_up, name="appium-warmup", daemon=True).start()
+    if args.transport != "stdio":
+        # Imported here: only the HTTP transports need it
+        import uvicorn
+
+        logging.getLogger(__name__).info(
+            "MCP server on %s transport at %s:%d%s", args.transport, args.host, args.port,
+            " (bearer token required)" if os.environ.get("MCP_AUTH_TOKEN") else "",
+        )
+        uvicorn.run(http_app(args.transport), host=args.host, port=args.port,
+                    log_level=mcp.settings.log_level.lower())
+        return
     try:
         mcp.run(transport="stdio")
     except TypeError:
         # Older MCP SDK may not accept transport=
         mcp.run()
+
+
+if __name__ == "__main__":
+    main()
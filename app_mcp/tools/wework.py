@@ -1,28 +1,378 @@
-from typing import List
-from automation.calendar import filter_bookable_dates
-from automation.wework_flow import book_desks
+import datetime as dt
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from app_mcp.jobs import get_job_manager
+from automation import tracing
+from automation.artifacts import get_store, screenshot_bytes
+from automation.availability import get_availability_cache
+from automation.availability import scan as scan_availability
+from automation.bookings import BookingNotFound, get_bookings_cache, read_bookings
+from automation.bookings import cancel_booking as cancel_app_booking
+from automation.buildings import BuildingNotFound, get_building_index
+from automation.calendar import expand_dates
+from automation.ledger import account_name, get_ledger
+from automation.dispatcher import NoDeviceAvailable, get_dispatcher
+from automation.planner import plan_bookings
+from automation.results import ALREADY_BOOKED, CANCELLED, BookingResult
+from automation.scheduler import DEFAULT_LEAD_S, get_scheduler, parse_fire_time
+from automation.session_pool import get_pool
+
+# Called with (dates finished, total dates, that date's BookingResult)
+ProgressCallback = Callable[[int, int, BookingResult], None]
+
+
+def run_booking(
+    dates: List[str],
+    building: str,
+    cancel_event=None,
+    on_progress: Optional[ProgressCallback] = None,
+    client: str = "default"
+) -> dict:
+    """
+    Book WeWork desks for given dates.
+    Each entry is an ISO date or a date spec (range, weekday mask, RRULE; see
+    automation.calendar). Sundays, holidays/closures and dates outside the
+    booking window are skipped automatically.
+    Dates are queued per device through the shared dispatcher
+    (automation.dispatcher): every attached device takes dates as it frees
+    up, work is shared fairly between `client`s, and a date another client
+    is already booking is not booked twice.
+    `on_progress` is called as each date finishes. Returns a JSON-ready
+    dict with one result per date (status, duration, error, screen reached),
+    or {"error": ...} when the request cannot start.
+    """
+    # Fail fast on a wrong building name when the cached centre list is fresh
+    index = get_building_index()
+    if index.fresh:
+        try:
+            building = index.resolve(building).name
+        except BuildingNotFound as e:
+            return {"error": str(e), "suggestions": e.suggestions}
+    # The ledger is keyed by the centre's own name
+    building = index.canonical(building)
+
+    try:
+        expansion = expand_dates(dates, building)
+    except ValueError as e:
+        return {"error": str(e)}
+    filtered = expansion.dates
+
+    # Dates the ledger already holds as confirmed need no device work
+    already = get_ledger().confirmed_dates(account_name(), building, filtered)
+    todo = [d for d in filtered if d not in already]
+    plan = plan_bookings((d, building) for d in todo)
+    # Reported before any device work, so the size of a long run is known up front
+    logging.getLogger(__name__).info("Plan: %s", plan.describe())
+
+    results: Dict[str, BookingResult] = {}
+    lock = threading.Lock()
+
+    def _done(result: BookingResult) -> None:
+        with lock:
+            results[result.date] = result
+            done = len(results)
+        if on_progress is not None:
+            on_progress(done, len(filtered), result)
+
+    for d in sorted(already):
+        _done(BookingResult(d, ALREADY_BOOKED, building))
+    if todo:
+        try:
+            get_dispatcher().book(
+                todo,
+                building,
+                client=client,
+                cancel_event=cancel_event,
+                on_result=_done,
+            )
+        except NoDeviceAvailable as e:
+            return {"error": str(e)}
+    for d in filtered:
+        if d not in results:
+            results[d] = BookingResult(d, CANCELLED, building)
+
+    ordered = [results[d] for d in filtered]
+    summary: Dict[str, int] = {}
+    for r in ordered:
+        summary[r.status] = summary.get(r.status, 0) + 1
+    return {
+        "building": building,
+        "summary": summary,
+        "results": [r.to_dict() for r in ordered],
+        # Pass these back to retry just the dates that did not go through
+        "retry_dates": [r.date for r in ordered if not r.ok],
+        "skipped": expansion.skipped,
+        "plan": plan.describe(),
+        "estimated_actions": plan.estimated_actions,
+    }
+
 
 def book_wework_desks(
     dates: List[str],
-    building: str
+    building: str,
+    cancel_event=None,
+    on_progress: Optional[ProgressCallback] = None,
+    client: str = "default"
 ) -> str:
+    """JSON form of run_booking for the MCP tool."""
+    return json.dumps(run_booking(dates, building, cancel_event, on_progress, client))
+
+
+def warm_session() -> None:
     """
-    Book WeWork desks for given dates.
-    Sundays are skipped automatically.
+    Pre-create the Appium session for the first connected device.
+    Failures are logged only; the next tool call retries.
     """
-    filtered = filter_bookable_dates(dates)
+    try:
+        get_pool().warm()
+    except Exception as e:
+        logging.getLogger(__name__).warning("Session warm-up failed: %s", e)
 
-    if not filtered:
-        return "No bookable dates (all were non-working days)."
 
-    book_desks(
-        dates=filtered,
-        building_name=building
+def submit_booking_job(
+    dates: List[str],
+    building: str,
+    client: str = "default"
+) -> str:
+    """
+    Queue a booking on the background executor and return its job id at once.
+    """
+    job = get_job_manager().submit(
+        run_booking,
+        description=f"Book desks for {dates} at {building}",
+        dates=dates,
+        building=building,
+        client=client,
     )
+    return json.dumps(job.to_dict())
+
+
+def booking_job_status(job_id: str) -> str:
+    try:
+        job = get_job_manager().get(job_id)
+    except KeyError as e:
+        return json.dumps({"error": str(e.args[0])})
+    return json.dumps(job.to_dict())
+
+
+def booking_job_result(job_id: str) -> str:
+    try:
+        job = get_job_manager().get(job_id)
+    except KeyError as e:
+        return json.dumps({"error": str(e.args[0])})
+    return json.dumps(job.to_dict(include_result=True))
+
+
+def cancel_booking_job(job_id: str) -> str:
+    """
+    Cancel a queued job, or stop a running one before its next date.
+    """
+    try:
+        job = get_job_manager().cancel(job_id)
+    except KeyError as e:
+        return json.dumps({"error": str(e.args[0])})
+    return json.dumps(job.to_dict())
+
+
+def trace_summary(last_runs: int = 20) -> str:
+    """
+    Per-step latency (p50/p95/p99), retries and errors over the most recent
+    booking runs, read from the trace file.
+    """
+    return json.dumps(tracing.summarize(last_runs))
+
+
+def queue_stats() -> str:
+    """Device queue: depth per client, what each device is booking, waits and shared bookings."""
+    return json.dumps(get_dispatcher().stats())
+
+
+def check_availability(
+    dates: List[str],
+    buildings: Optional[List[str]] = None,
+    max_age_s: Optional[float] = None,
+    client: str = "default"
+) -> str:
+    """
+    Desks free per centre for each date (see automation.availability).
+    Dates the cache can answer, younger than `max_age_s` (default: the cache
+    TTL), cost no device work; the rest are read in one pass through the
+    date picker on a device borrowed from the dispatcher in `client`'s turn.
+    `buildings` narrows the answer.
+    """
+    try:
+        expansion = expand_dates(dates)
+    except ValueError as e:
+        return json.dumps({"error": str(e)})
+
+    index = get_building_index()
+    names: Optional[List[str]] = None
+    if buildings and index.fresh:
+        try:
+            names = [index.resolve(b).name for b in buildings]
+        except BuildingNotFound as e:
+            return json.dumps({"error": str(e), "suggestions": e.suggestions})
+
+    cache = get_availability_cache()
+    found = {d: cache.get(d, names, max_age_s) for d in expansion.dates}
+    todo = [d for d, day in found.items() if day is None]
+    error = None
+    if todo:
+        try:
+            with get_dispatcher().lease(client, purpose="availability") as (_, driver):
+                # Another call may have read these while this one waited for the device
+                todo = [d for d in todo if cache.get(d, names, max_age_s) is None]
+                for day in scan_availability(driver, todo, names):
+                    found[day.date] = day
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e).strip()}"
+        for d in expansion.dates:
+            found[d] = found[d] or cache.get(d, names)
+
+    if buildings and names is None:
+        # The scan has filled the building index
+        try:
+            names = [index.resolve(b).name for b in buildings]
+        except BuildingNotFound as e:
+            return json.dumps({"error": str(e), "suggestions": e.suggestions})
+
+    now = time.time()
+    rows = []
+    for d in expansion.dates:
+        day = found[d]
+        if day is None:
+            rows.append({"date": d, "error": "not checked"})
+            continue
+        centres = {n: day.centres.get(n) for n in names} if names else day.centres
+        rows.append({
+            "date": d,
+            "bookable": day.bookable,
+            "desks": centres if day.bookable else {},
+            "age_s": round(now - day.checked_at),
+            "from_device": d in todo,
+        })
+    out = {"dates": rows, "skipped": expansion.skipped}
+    if error:
+        out["error"] = error
+    return json.dumps(out)
+
+
+def list_bookings(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    refresh: bool = False,
+    client: str = "default"
+) -> str:
+    """
+    Bookings the app shows from `start` (default: today) to `end` (ISO;
+    default: all of them). The list is read on a device borrowed from the
+    dispatcher, only as far as `end`, and kept until the next booking or
+    cancellation, so later questions inside what was read cost no device work.
+    """
+    try:
+        first = dt.date.fromisoformat(start) if start else dt.date.today()
+        last = dt.date.fromisoformat(end) if end else None
+    except ValueError as e:
+        return json.dumps({"error": str(e)})
+
+    cache = get_bookings_cache()
+    if refresh:
+        cache.invalidate()
+    from_device = not cache.covers(last)
+    if from_device:
+        try:
+            with get_dispatcher().lease(client, purpose="bookings list") as (_, driver):
+                read_bookings(driver, last)
+        except Exception as e:
+            return json.dumps({"error": f"{type(e).__name__}: {str(e).strip()}"})
+    return json.dumps({
+        "bookings": [{"date": e.date.isoformat(), "building": e.building} for e in cache.between(first, last)],
+        "age_s": round(time.time() - cache.read_at),
+        "from_device": from_device,
+    })
+
+
+def cancel_booking(date: str, building: str, client: str = "default") -> str:
+    """Cancel the app booking on `date` (ISO) at `building` and record it in the ledger."""
+    try:
+        day = dt.date.fromisoformat(date)
+    except ValueError as e:
+        return json.dumps({"error": str(e)})
+    index = get_building_index()
+    try:
+        name = index.resolve(building).name if index.fresh else building
+    except BuildingNotFound as e:
+        return json.dumps({"error": str(e), "suggestions": e.suggestions})
+
+    try:
+        with get_dispatcher().lease(client, purpose="cancel booking") as (_, driver):
+            entry = cancel_app_booking(driver, day, name)
+    except BookingNotFound as e:
+        return json.dumps({
+            "error": str(e), "bookings_that_day": [b.building for b in e.that_day],
+        })
+    except Exception as e:
+        return json.dumps({"error": f"{type(e).__name__}: {str(e).strip()}"})
+    return json.dumps({"cancelled": {"date": date, "building": entry.building}})
+
+
+def list_artifacts(limit: int = 20) -> str:
+    """Newest failure artifacts: id, time, date, building, stage, error and size."""
+    store = get_store()
+    return json.dumps({"artifacts": store.list(limit), "dropped": store.dropped})
+
+
+def get_artifact(artifact_id: str, max_source_chars: int = 200_000):
+    """
+    (JSON text, screenshot PNG bytes or None) for one artifact: error,
+    traceback, step trace and page source (cut at max_source_chars).
+    """
+    try:
+        artifact = get_store().load(artifact_id)
+    except KeyError:
+        return json.dumps({"error": f"Unknown artifact id '{artifact_id}'"}), None
+    png = screenshot_bytes(artifact)
+    artifact.pop("screenshot_png", None)
+    source = artifact.get("page_source") or ""
+    if len(source) > max_source_chars:
+        artifact["page_source"] = source[:max_source_chars]
+        artifact["page_source_truncated"] = len(source)
+    return json.dumps(artifact), png
+
+
+def add_schedule(
+    dates: List[str],
+    building: str,
+    fire_at: str,
+    lead_seconds: float = DEFAULT_LEAD_S,
+    repeat_days: int = 0
+) -> str:
+    """
+    Store a booking intent that fires when the booking window opens at
+    `fire_at` (ISO datetime, local time unless it has an offset).
+    """
+    try:
+        schedule = get_scheduler().add(dates, building, parse_fire_time(fire_at), lead_seconds, repeat_days)
+    except ValueError as e:
+        return json.dumps({"error": str(e)})
+    return json.dumps(schedule.to_dict())
+
+
+def list_schedules() -> str:
+    return json.dumps([s.to_dict() for s in get_scheduler().list()])
+
+
+def remove_schedule(schedule_id: str) -> str:
+    try:
+        schedule = get_scheduler().remove(schedule_id)
+    except KeyError as e:
+        return json.dumps({"error": str(e.args[0])})
+    return json.dumps(schedule.to_dict())
 
-    skipped = set(dates) - set(filtered)
-    msg = f"Booked desks for {filtered} at {building}."
-    if skipped:
-        msg += f" Skipped non-working days: {sorted(skipped)}."
 
-    return msg
+def start_scheduler() -> None:
+    """Resume persisted schedules at server start."""
+    get_scheduler()
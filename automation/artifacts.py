@@ -0,0 +1,207 @@
+"""
+Failure artifacts: what the phone showed when a booking step failed.
+
+A capture holds the page source, the run's recent trace spans
+(automation.tracing) and, for a failure that ends the step, a screenshot.
+The booking thread only fetches the source, and the screenshot only when
+nothing is retried after it, so a retry does not wait for one; compressing
+and writing happen on a background writer thread. The queue to the writer is bounded, and a capture that finds it
+full is dropped rather than blocking or piling up in memory.
+
+Artifacts are stored as gzipped JSON in artifacts/ under the state
+directory. Each has a small .meta.json beside it for listing. The
+directory is a ring: once it grows past WEWORK_ARTIFACT_MAX_MB (default
+50), the oldest artifacts are deleted. 0 turns capture off.
+"""
+from __future__ import annotations
+import base64
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import traceback
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+from automation import tracing
+from automation.state import state_dir
+
+log = logging.getLogger(__name__)
+
+ARTIFACT_DIR = "artifacts"
+MAX_BYTES = int(float(os.environ.get("WEWORK_ARTIFACT_MAX_MB", "50")) * 1024 * 1024)
+# Captures waiting for the writer; a page source plus screenshot is ~0.5-2 MB
+MAX_PENDING = 8
+# Trace spans of the failing run stored with each capture
+TRACE_SPANS = 60
+
+_DATA_SUFFIX = ".json.gz"
+_META_SUFFIX = ".meta.json"
+
+
+class ArtifactStore:
+    def __init__(self, root: Optional[Path] = None, max_bytes: int = MAX_BYTES):
+        self.root = Path(root or state_dir() / ARTIFACT_DIR)
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=MAX_PENDING)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    # -------------------------
+    # PUBLIC API
+    # -------------------------
+
+    def capture(self, driver, error: BaseException, screenshot: bool = True, **context) -> Optional[str]:
+        """
+        Record the screen for a failure and queue it for writing. `context`
+        (date, building, stage, attempt, ...) is stored with it. Pass
+        screenshot=False when the step is about to be retried. Returns the
+        artifact id, or None when capture is off or the queue is full.
+        Never raises.
+        """
+        if not self.enabled:
+            return None
+        if self._queue.full():
+            self.dropped += 1
+            log.debug("Failure artifact dropped, writer is behind")
+            return None
+        now = time.time()
+        # Sortable by capture time, down to the millisecond
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+        artifact_id = f"{stamp}{int(now * 1000) % 1000:03d}-{uuid.uuid4().hex[:4]}"
+        run_id = tracing.current_run()
+        item = {
+            "id": artifact_id,
+            "ts": now,
+            "run": run_id,
+            **context,
+            "error": f"{type(error).__name__}: {str(error).strip()}",
+            "traceback": "".join(traceback.format_exception(type(error), error, error.__traceback__)),
+        }
+        try:
+            item["page_source"] = driver.page_source
+            if screenshot:
+                item["screenshot_png"] = driver.get_screenshot_as_base64()
+        except Exception as e:
+            # The session may be what failed; keep whatever was fetched
+            item["capture_error"] = f"{type(e).__name__}: {str(e).strip()}"
+        item["trace"] = tracing.recent_spans(run_id, TRACE_SPANS) if run_id else []
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            return None
+        self._ensure_writer()
+        return artifact_id
+
+    def list(self, limit: int = 20) -> List[dict]:
+        """Metadata of the newest artifacts, newest first."""
+        metas = []
+        for path in sorted(self.root.glob(f"*{_META_SUFFIX}"), reverse=True)[:limit]:
+            try:
+                metas.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue
+        return metas
+
+    def load(self, artifact_id: str) -> dict:
+        """Full artifact; raises KeyError for an unknown (or already rotated out) id."""
+        if not artifact_id or "/" in artifact_id or "\\" in artifact_id or artifact_id.startswith("."):
+            raise KeyError(artifact_id)
+        try:
+            with gzip.open(self.root / f"{artifact_id}{_DATA_SUFFIX}", "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(artifact_id) from None
+
+    def flush(self, timeout: float = 10.0) -> None:
+        """Wait until queued captures are on disk (tests, benchmarks, shutdown)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+    # -------------------------
+    # WRITER
+    # -------------------------
+
+    def _ensure_writer(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_loop, name="artifact-writer", daemon=True)
+                self._thread.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                self._write(item)
+                self._trim()
+            except Exception:
+                log.exception("Could not write failure artifact %s", item.get("id"))
+            finally:
+                self._queue.task_done()
+
+    def _write(self, item: dict) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        artifact_id = item["id"]
+        data_path = self.root / f"{artifact_id}{_DATA_SUFFIX}"
+        tmp = data_path.with_name(data_path.name + ".tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump(item, f)
+        os.replace(tmp, data_path)
+
+        meta = {k: v for k, v in item.items() if k not in ("page_source", "screenshot_png", "trace", "traceback")}
+        meta["has_screenshot"] = bool(item.get("screenshot_png"))
+        meta["bytes"] = data_path.stat().st_size
+        meta_path = self.root / f"{artifact_id}{_META_SUFFIX}"
+        tmp = meta_path.with_name(meta_path.name + ".tmp")
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, meta_path)
+        log.info("Failure artifact %s written (%d KB)", artifact_id, meta["bytes"] // 1024)
+
+    def _trim(self) -> None:
+        """Delete the oldest artifacts until the directory fits in max_bytes."""
+        files = sorted(p for p in self.root.iterdir() if p.name.endswith((_DATA_SUFFIX, _META_SUFFIX)))
+        sizes = {p: p.stat().st_size for p in files}
+        total = sum(sizes.values())
+        # Names start with the capture time, so sorted order is oldest first
+        ids = sorted({p.name.split(".", 1)[0] for p in files})
+        for artifact_id in ids:
+            if total <= self.max_bytes:
+                break
+            for suffix in (_DATA_SUFFIX, _META_SUFFIX):
+                path = self.root / f"{artifact_id}{suffix}"
+                if path in sizes:
+                    total -= sizes[path]
+                    path.unlink(missing_ok=True)
+
+
+def screenshot_bytes(artifact: dict) -> Optional[bytes]:
+    data = artifact.get("screenshot_png")
+    return base64.b64decode(data) if data else None
+
+
+_store: Optional[ArtifactStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ArtifactStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
+
+
+def capture_failure(driver, error: BaseException, screenshot: bool = True, **context) -> Optional[str]:
+    """Capture a failure into the process-wide store (see ArtifactStore.capture)."""
+    return get_store().capture(driver, error, screenshot, **context)
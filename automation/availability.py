@@ -0,0 +1,178 @@
+"""
+Desk availability per date and centre, without booking.
+
+Each card in the centre list leads with the desks still free at that centre
+on the day picked in the date picker (see automation.buildings). `scan`
+walks one leased session through the picker for every requested date: the
+picker is opened once, and for each date the day is picked and confirmed,
+the centre list read, and a back press returns to the picker. It never
+slides to book. A day the picker shows disabled is reported as not
+bookable without opening the list.
+
+Results are kept in memory and in availability.json under the state
+directory for WEWORK_AVAILABILITY_TTL_S seconds (default 600), so follow-up
+questions about the same days are answered without touching the device.
+A booking forgets its date (see automation.wework_flow.book_desks).
+"""
+from __future__ import annotations
+import datetime as dt
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from automation import tracing
+from automation.state import state_dir, write_atomic
+
+log = logging.getLogger(__name__)
+
+AVAILABILITY_FILE = "availability.json"
+AVAILABILITY_TTL = float(os.environ.get("WEWORK_AVAILABILITY_TTL_S", "600"))
+
+
+@dataclass
+class DayAvailability:
+    date: str
+    # False when the date picker shows the day disabled
+    bookable: bool = True
+    # Centre name -> desks free that day
+    centres: Dict[str, Optional[int]] = field(default_factory=dict)
+    # The whole list was read, so a centre missing from `centres` is not offered that day
+    complete: bool = False
+    checked_at: float = 0.0
+
+    def answers(self, centres: Optional[Iterable[str]] = None) -> bool:
+        """Whether this entry covers a question about `centres` (None: every centre)."""
+        if not self.bookable or self.complete:
+            return True
+        return centres is not None and all(c in self.centres for c in centres)
+
+
+class AvailabilityCache:
+    def __init__(self, path: Optional[str] = None, ttl: float = AVAILABILITY_TTL):
+        self.path = path or str(state_dir() / AVAILABILITY_FILE)
+        self.ttl = ttl
+        self._days: Dict[str, DayAvailability] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def get(
+        self, date: str, centres: Optional[Iterable[str]] = None, max_age: Optional[float] = None
+    ) -> Optional[DayAvailability]:
+        """The day's entry if it is younger than `max_age` (default: the TTL) and covers `centres`."""
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            day = self._days.get(date)
+        if day is None or time.time() - day.checked_at > max_age or not day.answers(centres):
+            return None
+        return day
+
+    def put(self, day: DayAvailability) -> None:
+        with self._lock:
+            old = self._days.get(day.date)
+            if (old is not None and old.bookable and day.bookable and not day.complete
+                    and time.time() - old.checked_at <= self.ttl):
+                # A partial read adds to what is still fresh; the entry ages from its oldest part
+                day.centres = {**old.centres, **day.centres}
+                day.complete = old.complete
+                day.checked_at = min(old.checked_at, day.checked_at)
+            self._days[day.date] = day
+            self._save()
+
+    def forget(self, date: str) -> None:
+        with self._lock:
+            if self._days.pop(date, None) is not None:
+                self._save()
+
+    def _save(self) -> None:
+        # Caller holds the lock; expired days are dropped on the way out
+        now = time.time()
+        self._days = {d: day for d, day in self._days.items() if now - day.checked_at <= self.ttl}
+        try:
+            write_atomic(self.path, json.dumps([asdict(day) for day in self._days.values()]))
+        except OSError as e:
+            log.warning("Could not save desk availability: %s", e)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable desk availability %s: %s", self.path, e)
+            return
+        for entry in data:
+            day = DayAvailability(**entry)
+            self._days[day.date] = day
+
+
+# =========================
+# DEVICE SCAN
+# =========================
+
+def scan(
+    driver, dates: Iterable[str], centres: Optional[Iterable[str]] = None, cancel_event=None
+) -> List[DayAvailability]:
+    """
+    Read availability for `dates` (ISO) in one pass through the date picker
+    on a leased `driver` (automation.session_pool), leaving the app on its
+    home screen. With `centres` (canonical names) a day's list is only
+    scrolled until they have all been seen. Each day goes into the cache as
+    soon as it is read, so a failure part-way keeps the days before it.
+    """
+    # Imported here: automation.wework_flow imports this module for the cache
+    from automation.buildings import card_pages, get_building_index
+    from automation.wework_flow import check_day, open_date_picker, return_home
+
+    wanted = set(centres or ())
+    ordered = sorted(dt.date.fromisoformat(d) for d in dates)
+    index = get_building_index()
+    cache = get_availability_cache()
+    days: List[DayAvailability] = []
+    if not ordered:
+        return days
+    with tracing.span("availability_scan", dates=len(ordered), centres=len(wanted) or None):
+        try:
+            return_home(driver)
+            open_date_picker(driver, ordered[0], cancel_event)
+            for target in ordered:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                day = DayAvailability(target.isoformat(), checked_at=time.time())
+                snap = check_day(driver, target, cancel_event)
+                if snap is None:
+                    day.bookable = False
+                else:
+                    for cards in card_pages(driver, snap):
+                        for card in cards:
+                            index.add(card)
+                            day.centres[card.name] = card.available
+                        if wanted and wanted <= day.centres.keys():
+                            break
+                    else:
+                        day.complete = True
+                    driver.back()
+                cache.put(day)
+                days.append(day)
+        finally:
+            try:
+                return_home(driver)
+            except Exception as e:
+                log.warning("Could not return home after the availability scan: %s", e)
+    return days
+
+
+_cache: Optional[AvailabilityCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_availability_cache() -> AvailabilityCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AvailabilityCache()
+        return _cache
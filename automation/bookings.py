@@ -0,0 +1,372 @@
+"""
+Reading existing bookings out of the app, and cancelling them.
+
+Booking entries are rows whose content-desc mentions a date and a building,
+e.g. 'Desk\nWed, 25 Feb\nTwo Horizon Center'. The parser is deliberately
+loose about layout: it looks for a date in any of the formats the app uses
+and treats the first remaining non-trivial line as the building.
+
+`read_bookings` pages through the Bookings tab one scroll step at a time,
+parsing each step from a single page-source dump, and stops at the first
+step that shows a booking after the requested range. What it read is kept
+in a BookingsCache with the scroll step of every entry, until the next
+booking or cancellation. `cancel_booking` uses those steps to scroll
+straight to the entry.
+"""
+from __future__ import annotations
+import calendar
+import datetime as dt
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+from appium.webdriver.common.appiumby import AppiumBy
+
+from automation import tracing
+from automation.availability import get_availability_cache
+from automation.buildings import aliases, normalize
+from automation.ledger import account_name, get_ledger
+from automation.locator import Snapshot, UiNode, scroll_down, take_snapshot, tap_at, tap_node
+from automation.screens import (
+    BOOKING_DETAIL, BOOKINGS_LIST, BOOKINGS_TAB, CANCEL_BOOKING, CANCEL_DIALOG, CONFIRM_CANCEL, detect_screen,
+)
+from automation.waits import adaptive_wait
+
+log = logging.getLogger(__name__)
+
+_MONTHS = {m.lower(): i for i, m in enumerate(calendar.month_abbr) if m}
+_MONTHS.update({m.lower(): i for i, m in enumerate(calendar.month_name) if m})
+_MONTH_ALT = "|".join(sorted(_MONTHS, key=len, reverse=True))
+
+# 25 Feb 2026 / 25 Feb / Wed, 25 Feb
+_DAY_MONTH_RE = re.compile(rf"\b(\d{{1,2}})\s+({_MONTH_ALT})\b\.?,?(?:\s+(\d{{4}}))?", re.I)
+# Feb 25, 2026 / February 25
+_MONTH_DAY_RE = re.compile(rf"\b({_MONTH_ALT})\.?\s+(\d{{1,2}})\b(?:,?\s+(\d{{4}}))?", re.I)
+_ISO_RE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+
+# Lines that are labels, not building names
+_NOISE_RE = re.compile(
+    rf"^(desk(\s+booking)?|day pass|meeting room|all day|upcoming|booked|confirmed|cancel\w*|view all.*|"
+    rf"\d{{1,2}}(:\d{{2}})?\s*(am|pm).*|({'|'.join(calendar.day_abbr)}|{'|'.join(calendar.day_name)})\b.*)$",
+    re.I,
+)
+
+UPCOMING_HEADER = "UPCOMING BOOKINGS"
+MAX_LIST_PAGES = 30
+# How long the list, a booking's page or the cancel dialog gets to appear
+SCREEN_TIMEOUT = 10.0
+
+
+@dataclass
+class BookingEntry:
+    date: dt.date
+    building: str
+    desc: str
+    bounds: tuple = (0, 0, 0, 0)
+    # Scroll step of the bookings list the entry was first seen on
+    page: int = 0
+
+
+def _resolve_year(day: int, month: int, year: Optional[str], today: dt.date) -> Optional[dt.date]:
+    try:
+        if year:
+            return dt.date(int(year), month, day)
+        date = dt.date(today.year, month, day)
+    except ValueError:
+        return None
+    # Year-less dates in an upcoming list are never far in the past
+    if date < today - dt.timedelta(days=31):
+        date = date.replace(year=today.year + 1)
+    return date
+
+
+def parse_date(text: str, today: Optional[dt.date] = None) -> Optional[dt.date]:
+    today = today or dt.date.today()
+    m = _ISO_RE.search(text)
+    if m:
+        try:
+            return dt.date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        except ValueError:
+            return None
+    m = _DAY_MONTH_RE.search(text)
+    if m:
+        return _resolve_year(int(m.group(1)), _MONTHS[m.group(2).lower()], m.group(3), today)
+    m = _MONTH_DAY_RE.search(text)
+    if m:
+        return _resolve_year(int(m.group(2)), _MONTHS[m.group(1).lower()], m.group(3), today)
+    return None
+
+
+def parse_entry(node: UiNode, today: Optional[dt.date] = None, page: int = 0) -> Optional[BookingEntry]:
+    desc = node.desc
+    if "\n" not in desc:
+        return None
+    date = parse_date(desc, today)
+    if date is None:
+        return None
+    building = ""
+    for line in (l.strip() for l in desc.split("\n")):
+        if not line or parse_date(line, today) or _NOISE_RE.match(line):
+            continue
+        building = line
+        break
+    if not building:
+        return None
+    return BookingEntry(date=date, building=building, desc=desc, bounds=node.bounds, page=page)
+
+
+def entries_in(snap: Snapshot, today: Optional[dt.date] = None, page: int = 0) -> List[BookingEntry]:
+    entries = []
+    for node in snap.nodes:
+        if node.desc and node.visible:
+            entry = parse_entry(node, today, page)
+            if entry is not None:
+                entries.append(entry)
+    return entries
+
+
+def upcoming_from_home(snap: Snapshot, today: Optional[dt.date] = None) -> Optional[List[BookingEntry]]:
+    """
+    Entries in the home screen's UPCOMING BOOKINGS section, or None when the
+    section is not part of this snapshot (so nothing can be concluded).
+    """
+    if UPCOMING_HEADER not in snap.by_desc:
+        return None
+    return entries_in(snap, today)
+
+
+# =========================
+# BOOKINGS LIST
+# =========================
+
+class BookingNotFound(RuntimeError):
+    def __init__(self, date: dt.date, building: str, that_day: List[BookingEntry]):
+        self.date = date
+        self.building = building
+        self.that_day = that_day
+        msg = f"No booking at '{building}' on {date.isoformat()}"
+        if that_day:
+            msg += f"; that day: {', '.join(e.building for e in that_day)}"
+        super().__init__(msg)
+
+
+class CancelAborted(RuntimeError):
+    """
+    A screen on the way to cancelling did not look as expected, so nothing
+    on it was tapped and the booking is left as it was.
+    """
+
+
+def _key(entry: BookingEntry) -> Tuple[dt.date, str]:
+    return entry.date, normalize(entry.building)
+
+
+def same_building(entry: BookingEntry, name: str) -> bool:
+    norm = normalize(name)
+    return norm == normalize(entry.building) or norm in aliases(entry.building)
+
+
+class BookingsCache:
+    """
+    The bookings list as last read, in list order, each entry with the
+    scroll step it was first seen on. It holds every booking up to
+    `read_through`, or all of them once `complete`. It stays valid until
+    the next booking or cancellation made from here (invalidate()).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries: List[BookingEntry] = []
+        # Scroll step the last read stopped on; a later read resumes there
+        self.pages = 0
+        self.read_through: Optional[dt.date] = None
+        self.complete = False
+        self.read_at = 0.0
+
+    def covers(self, end: Optional[dt.date]) -> bool:
+        """Whether every booking up to `end` (None: all of them) is in the cache."""
+        with self._lock:
+            if self.complete:
+                return True
+            return end is not None and self.read_through is not None and self.read_through >= end
+
+    def between(self, start: Optional[dt.date], end: Optional[dt.date]) -> List[BookingEntry]:
+        with self._lock:
+            return [
+                e for e in self.entries
+                if (start is None or e.date >= start) and (end is None or e.date <= end)
+            ]
+
+    def find(self, date: dt.date, building: str) -> Optional[BookingEntry]:
+        return next((e for e in self.between(date, date) if same_building(e, building)), None)
+
+    def add(self, entries: List[BookingEntry], page: int) -> None:
+        with self._lock:
+            known = {_key(e) for e in self.entries}
+            self.entries.extend(e for e in entries if _key(e) not in known)
+            self.entries.sort(key=lambda e: e.date)
+            self.pages = page
+
+    def finish(self, complete: bool) -> None:
+        with self._lock:
+            self.complete = complete
+            # The list is in date order, so every booking before the last date seen has been seen
+            last = max((e.date for e in self.entries), default=None)
+            self.read_through = last - dt.timedelta(days=1) if last and not complete else None
+            self.read_at = time.time()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.entries = []
+            self.pages = 0
+            self.read_through = None
+            self.complete = False
+            self.read_at = 0.0
+
+
+def _on_screen(screen: str):
+    def check(driver) -> Optional[Snapshot]:
+        snap = take_snapshot(driver)
+        return snap if detect_screen(snap) == screen else None
+    return check
+
+
+def _open_list(driver) -> Snapshot:
+    """The Bookings tab from wherever the app is, scrolled to the top."""
+    # Imported here: automation.wework_flow imports this module
+    from automation.wework_flow import return_home
+
+    return_home(driver)
+    tab = take_snapshot(driver).find(AppiumBy.ACCESSIBILITY_ID, BOOKINGS_TAB)
+    if tab is None:
+        raise RuntimeError("The home screen has no Bookings tab")
+    tap_node(driver, tab)
+    return adaptive_wait(driver, _on_screen(BOOKINGS_LIST), BOOKINGS_LIST, SCREEN_TIMEOUT)
+
+
+def _pages(driver, snap: Optional[Snapshot], first_page: int = 0) -> Iterator[Tuple[int, List[BookingEntry]]]:
+    """
+    (scroll step, entries first seen on it) from the step on screen down to
+    the bottom of the list; `snap` is that step's dump if already taken.
+    Stop iterating to stop scrolling.
+    """
+    today = dt.date.today()
+    seen = set()
+    for page in range(first_page, first_page + MAX_LIST_PAGES):
+        if snap is None:
+            snap = take_snapshot(driver)
+        new = [e for e in entries_in(snap, today, page) if _key(e) not in seen]
+        if not new and page > first_page:
+            return
+        seen.update(_key(e) for e in new)
+        yield page, new
+        scroll_down(driver, snap)
+        snap = None
+
+
+def read_bookings(driver, end: Optional[dt.date] = None) -> BookingsCache:
+    """
+    Bring the cache up to `end` (None: the whole list) and return it. A
+    read that stopped early resumes from the step it stopped on, scrolling
+    there without dumping the steps it already has. The ledger is synced
+    with what was read. Leaves the app on the bookings list.
+    """
+    cache = get_bookings_cache()
+    if cache.covers(end):
+        return cache
+    with tracing.span("read_bookings", selector=end.isoformat() if end else None) as span:
+        snap = _open_list(driver)
+        first = cache.pages
+        for _ in range(first):
+            scroll_down(driver, snap)
+        complete = False
+        for page, entries in _pages(driver, None if first else snap, first):
+            cache.add(entries, page)
+            if end is not None and any(e.date > end for e in entries):
+                break
+        else:
+            # _pages ends early at the bottom of the list; one that ran all
+            # MAX_LIST_PAGES steps may have stopped short of it
+            complete = page < first + MAX_LIST_PAGES - 1
+            if not complete:
+                log.warning("Bookings list still scrolling after %d steps; keeping what was read", MAX_LIST_PAGES)
+        cache.finish(complete)
+        span.set(pages=cache.pages + 1, entries=len(cache.entries), resumed_at=first or None)
+
+    known = cache.between(None, None if cache.complete else cache.read_through)
+    if known:
+        get_ledger().reconcile(account_name(), [(e.building, e.date.isoformat()) for e in known])
+    return cache
+
+
+def cancel_booking(driver, date: dt.date, building: str) -> BookingEntry:
+    """
+    Cancel the booking on `date` at `building`. The cache says which scroll
+    step the entry is on, so the list is scrolled straight there and dumped
+    once; if the list has changed since, it is searched from the top.
+    Raises BookingNotFound when there is no such booking, and CancelAborted
+    without tapping anything further when the booking's page or the cancel
+    dialog does not look as expected.
+    """
+    cache = get_bookings_cache()
+    with tracing.span("cancel_booking", selector=date.isoformat(), building=building) as span:
+        entry = read_bookings(driver, date).find(date, building)
+        if entry is None:
+            raise BookingNotFound(date, building, cache.between(date, date))
+
+        snap = _open_list(driver)
+        for _ in range(entry.page):
+            scroll_down(driver, snap)
+        if entry.page:
+            snap = take_snapshot(driver)
+        row = next((e for e in entries_in(snap) if _key(e) == _key(entry)), None)
+        span.set(page=entry.page, via="index")
+        if row is None:
+            log.info("Booking on %s moved in the list; searching from the top", date)
+            span.set(via="search")
+            cache.invalidate()
+            for _, entries in _pages(driver, _open_list(driver)):
+                row = next((e for e in entries if _key(e) == _key(entry)), None)
+                if row is not None:
+                    break
+            else:
+                raise BookingNotFound(date, building, [])
+
+        x1, y1, x2, y2 = row.bounds
+        tap_at(driver, (x1 + x2) // 2, (y1 + y2) // 2)
+        detail = adaptive_wait(driver, _on_screen(BOOKING_DETAIL), BOOKING_DETAIL, SCREEN_TIMEOUT)
+        try:
+            # The page must be this booking's before its cancel button is pressed
+            if not any(_key(e) == _key(entry) for e in entries_in(detail)):
+                raise CancelAborted(f"The page opened from the list is not the booking on {date.isoformat()}")
+            button = detail.find(AppiumBy.ACCESSIBILITY_ID, CANCEL_BOOKING)
+            if button is None:
+                raise CancelAborted(f"The booking's page has no '{CANCEL_BOOKING}' button")
+            tap_node(driver, button)
+            dialog = adaptive_wait(driver, _on_screen(CANCEL_DIALOG), CANCEL_DIALOG, SCREEN_TIMEOUT)
+            confirm = dialog.find(AppiumBy.ACCESSIBILITY_ID, CONFIRM_CANCEL)
+            if confirm is None:
+                raise CancelAborted(f"The cancel dialog has no '{CONFIRM_CANCEL}' button")
+            tap_node(driver, confirm)
+            # The app goes back to the list once the booking is gone
+            adaptive_wait(driver, _on_screen(BOOKINGS_LIST), BOOKINGS_LIST, SCREEN_TIMEOUT)
+        finally:
+            cache.invalidate()
+        get_ledger().mark_cancelled(account_name(), entry.building, date.isoformat())
+        get_availability_cache().forget(date.isoformat())
+    return entry
+
+
+_cache: Optional[BookingsCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_bookings_cache() -> BookingsCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = BookingsCache()
+        return _cache
@@ -0,0 +1,256 @@
+"""
+Appium session bootstrap: capability profiles and a phase profiler.
+
+A UiAutomator2 session start can check and reinstall the server APKs,
+initialise the device (settings app, permissions, unlock) and launch the
+app before the first command is accepted. On a phone that has already
+run a session with the same Appium install, most of that is repeated
+work. Profiles are named capability sets layered over create_driver's
+defaults:
+
+    default       today's behaviour
+    warm          skip server installation, device init and unlock checks
+    warm-attach   warm, and attach to the running app instead of restarting it
+
+Sessions are created with `appium:eventTimings`, so the server's own event
+timestamps split session creation into phases (see `phases`).
+`profile_session` times one profile end to end: session creation, then the
+app reaching its home screen, which also checks the profile still works.
+benchmarks/bench_bootstrap.py compares profiles and records the fastest
+working one per device in bootstrap.json. create_driver then uses that
+profile, and falls back to the defaults if it ever stops working (e.g.
+after an Appium upgrade).
+"""
+from __future__ import annotations
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from automation.state import state_dir, write_atomic
+
+log = logging.getLogger(__name__)
+
+RECOMMENDATION_FILE = "bootstrap.json"
+# Forces a profile for every session, overriding recommendations
+PROFILE_ENV = "WEWORK_CAPS_PROFILE"
+DEFAULT_PROFILE = "default"
+
+_WARM = {
+    # The UiAutomator2 server APKs are already on the device at the installed driver's version
+    "appium:skipServerInstallation": True,
+    # Settings app, permissions and animation scales were set up by an earlier session
+    "appium:skipDeviceInitialization": True,
+    "appium:skipUnlock": True,
+}
+
+PROFILES: Dict[str, Dict[str, object]] = {
+    DEFAULT_PROFILE: {},
+    "warm": dict(_WARM),
+    "warm-attach": {
+        **_WARM,
+        # The booking flow brings the app home itself (ensure_app), relaunching only if it is not running
+        "appium:autoLaunch": False,
+        "appium:dontStopAppOnReset": True,
+    },
+}
+
+# Event keys Appium reports that are not timestamps
+_NON_EVENT_KEYS = ("commands",)
+
+
+def profile_caps(name: str) -> Dict[str, object]:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown capability profile '{name}'; known: {', '.join(PROFILES)}") from None
+
+
+# =========================
+# EVENT TIMINGS
+# =========================
+
+def phases(events: Dict[str, object]) -> List[Tuple[str, float]]:
+    """
+    Session-creation phases from Appium's event timings: every event the
+    server logged, in time order, with the seconds since the previous one
+    (the first is measured from `newSessionRequested`). Event names depend
+    on the driver version, so none are assumed beyond that anchor.
+    """
+    stamps = []
+    for name, value in (events or {}).items():
+        if name in _NON_EVENT_KEYS or not isinstance(value, list) or not value:
+            continue
+        if isinstance(value[0], (int, float)):
+            stamps.append((value[0], name))
+    stamps.sort()
+    start = next((t for t, name in stamps if name == "newSessionRequested"), stamps[0][0] if stamps else 0)
+    out = []
+    prev = start
+    for t, name in stamps:
+        if t < start:
+            continue
+        if name != "newSessionRequested":
+            out.append((name, round((t - prev) / 1000, 3)))
+        prev = t
+    return out
+
+
+# =========================
+# PROFILER
+# =========================
+
+@dataclass
+class BootstrapReport:
+    profile: str
+    ok: bool = False
+    error: Optional[str] = None
+    # Wall time of the new-session request, seen from here
+    session_s: float = 0.0
+    # newSessionRequested -> last event, seen by the server
+    server_s: Optional[float] = None
+    phases: List[Tuple[str, float]] = field(default_factory=list)
+    # Session created -> app on its home screen, ready to book
+    ready_s: float = 0.0
+    # How the app got home (see automation.wework_flow.return_home)
+    ready_via: Optional[str] = None
+
+    @property
+    def total_s(self) -> float:
+        return self.session_s + self.ready_s
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d["total_s"] = round(self.total_s, 3)
+        return d
+
+
+def profile_session(profile: str, udid: Optional[str] = None, server_url: Optional[str] = None) -> BootstrapReport:
+    """
+    Create one session with `profile`, bring the app to its home screen and
+    quit. A profile that fails to start a session, or whose app never
+    reaches home, is reported with ok=False.
+    """
+    # Imported here: automation.driver imports this module for the profiles
+    from automation.driver import create_driver
+    from automation.locator import take_snapshot
+    from automation.screens import HOME, detect_screen
+    from automation.wework_flow import ensure_app
+
+    report = BootstrapReport(profile)
+    t0 = time.perf_counter()
+    try:
+        driver = create_driver(udid=udid, server_url=server_url, profile=profile)
+    except Exception as e:
+        report.session_s = time.perf_counter() - t0
+        report.error = f"{type(e).__name__}: {str(e).strip()}"
+        return report
+    report.session_s = time.perf_counter() - t0
+    try:
+        report.phases = session_phases(driver)
+        if report.phases:
+            report.server_s = round(sum(s for _, s in report.phases), 3)
+        t1 = time.perf_counter()
+        report.ready_via = ensure_app(driver)
+        report.ready_s = time.perf_counter() - t1
+        report.ok = detect_screen(take_snapshot(driver)) == HOME
+        if not report.ok:
+            report.error = "App did not reach its home screen"
+    except Exception as e:
+        report.error = f"{type(e).__name__}: {str(e).strip()}"
+    finally:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+    return report
+
+
+def session_phases(driver) -> List[Tuple[str, float]]:
+    """Phases of the driver's session start; empty when the server keeps no event timings."""
+    try:
+        return phases(driver.get_events())
+    except Exception as e:
+        log.debug("No event timings from the server: %s", e)
+        return []
+
+
+def recommend(reports: Iterable[BootstrapReport]) -> Optional[str]:
+    """Fastest profile by median total time, among profiles that worked on every run."""
+    by_profile: Dict[str, List[BootstrapReport]] = {}
+    for r in reports:
+        by_profile.setdefault(r.profile, []).append(r)
+    working = {
+        name: statistics.median(r.total_s for r in runs)
+        for name, runs in by_profile.items() if all(r.ok for r in runs)
+    }
+    return min(working, key=working.get) if working else None
+
+
+# =========================
+# RECOMMENDATIONS
+# =========================
+
+_lock = threading.Lock()
+
+
+def _path() -> str:
+    return str(state_dir() / RECOMMENDATION_FILE)
+
+
+def _read() -> Dict[str, dict]:
+    try:
+        with open(_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        log.warning("Ignoring unreadable bootstrap recommendations: %s", e)
+        return {}
+
+
+def _write(data: Dict[str, dict]) -> None:
+    try:
+        write_atomic(_path(), json.dumps(data, indent=1))
+    except OSError as e:
+        log.warning("Could not save bootstrap recommendations: %s", e)
+
+
+def recommended_profile(udid: str) -> Optional[str]:
+    with _lock:
+        entry = _read().get(udid)
+    name = entry and entry.get("profile")
+    return name if name in PROFILES else None
+
+
+def save_recommendation(udid: str, profile: str, total_s: Optional[float] = None) -> None:
+    profile_caps(profile)
+    with _lock:
+        data = _read()
+        data[udid] = {"profile": profile, "total_s": total_s, "updated_at": time.time()}
+        _write(data)
+
+
+def forget_recommendation(udid: str) -> None:
+    with _lock:
+        data = _read()
+        if data.pop(udid, None) is not None:
+            _write(data)
+
+
+def select_profile(udid: str, profile: Optional[str] = None) -> Tuple[str, bool]:
+    """
+    (profile name, explicit) for a new session: the argument, then
+    WEWORK_CAPS_PROFILE, then the device's recommendation, then the default.
+    `explicit` is False for a recommendation, which may be dropped if it fails.
+    """
+    if profile:
+        return profile, True
+    forced = os.environ.get(PROFILE_ENV)
+    if forced:
+        return forced, True
+    return recommended_profile(udid) or DEFAULT_PROFILE, False
@@ -0,0 +1,251 @@
+"""
+Building directory index.
+
+The centre list shows one card per building whose content-desc packs extra
+fields around the name, e.g. '86\nTwo Horizon Center\n4.6\n5th Floor\n2.51 km'.
+The index parses those cards once, maps canonical names and aliases to them
+and remembers which scroll page each card was on, so the booking flow can
+scroll straight to it. It is cached on disk with a TTL, so a misspelt
+building name fails in milliseconds with suggestions instead of after a
+30 s selector timeout. Names only match exactly (any alias) or as a part
+of exactly one alias; a near miss is never booked, it is only suggested.
+"""
+from __future__ import annotations
+import difflib
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional
+
+from automation.locator import Snapshot, scroll_down, take_snapshot
+from automation.screens import BUILDING_CARD_RE
+from automation.state import state_dir, write_atomic
+
+log = logging.getLogger(__name__)
+
+INDEX_FILE = "buildings.json"
+BUILDING_INDEX_TTL = 6 * 60 * 60
+MAX_SCROLL_PAGES = 15
+
+_GENERIC_WORDS = {"center", "centre", "tower", "towers", "building", "wework"}
+_RATING_RE = re.compile(r"^\d(?:\.\d)?$")
+_DISTANCE_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*km$")
+
+
+class BuildingNotFound(RuntimeError):
+    def __init__(self, name: str, suggestions: List[str]):
+        self.name = name
+        self.suggestions = suggestions
+        msg = f"Building '{name}' not found"
+        if suggestions:
+            msg += f". Did you mean: {', '.join(suggestions)}?"
+        super().__init__(msg)
+
+
+@dataclass
+class BuildingCard:
+    name: str
+    desc: str
+    # Scroll steps (locator.scroll_down) from the top of the list to the card
+    page: int
+    # Leading number on the card (desks available at the centre)
+    available: Optional[int] = None
+    rating: Optional[float] = None
+    floor: Optional[str] = None
+    distance_km: Optional[float] = None
+
+
+def normalize(name: str) -> str:
+    name = re.sub(r"[^a-z0-9 ]+", " ", name.lower()).replace("centre", "center")
+    return " ".join(name.split())
+
+
+def aliases(name: str) -> List[str]:
+    """Normalised name plus the name without generic words ('two horizon')."""
+    norm = normalize(name)
+    short = " ".join(w for w in norm.split() if w not in _GENERIC_WORDS)
+    return [a for a in {norm, short} if a]
+
+
+def parse_card(desc: str, page: int = 0) -> Optional[BuildingCard]:
+    if not BUILDING_CARD_RE.search(desc):
+        return None
+    card = BuildingCard(name="", desc=desc, page=page)
+    for line in (l.strip() for l in desc.split("\n")):
+        m = _DISTANCE_RE.match(line)
+        if m:
+            card.distance_km = float(m.group(1))
+        elif line.isdigit() and card.available is None and not card.name:
+            card.available = int(line)
+        elif _RATING_RE.match(line) and card.name:
+            card.rating = float(line)
+        elif "floor" in line.lower() and card.name:
+            card.floor = line
+        elif line and not card.name:
+            card.name = line
+    return card if card.name else None
+
+
+def cards_in(snap: Snapshot, page: int = 0) -> List[BuildingCard]:
+    cards = []
+    for desc in snap.by_desc:
+        card = parse_card(desc, page)
+        if card is not None:
+            cards.append(card)
+    return cards
+
+
+class BuildingIndex:
+    def __init__(self, path: Optional[str] = None, ttl: float = BUILDING_INDEX_TTL):
+        self.path = path or str(state_dir() / INDEX_FILE)
+        self.ttl = ttl
+        self.cards: Dict[str, BuildingCard] = {}
+        self.aliases: Dict[str, str] = {}
+        self.built_at = 0.0
+        # True once the whole list has been scrolled; only then can a miss be trusted
+        self.complete = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def fresh(self) -> bool:
+        return self.complete and time.time() - self.built_at < self.ttl
+
+    def add(self, card: BuildingCard) -> None:
+        with self._lock:
+            self.cards[card.name] = card
+            for alias in aliases(card.name):
+                self.aliases[alias] = card.name
+
+    def lookup(self, name: str) -> Optional[BuildingCard]:
+        """
+        Exact alias, else the one building with an alias containing the
+        name; None on a miss or when several buildings match. Close but
+        different names ('One Horizon' for Two Horizon) are misses.
+        """
+        norm = normalize(name)
+        with self._lock:
+            canonical = self.aliases.get(norm)
+            if canonical is None:
+                hits = {c for a, c in self.aliases.items() if norm and norm in a}
+                if len(hits) == 1:
+                    canonical = hits.pop()
+            return self.cards.get(canonical) if canonical else None
+
+    def canonical(self, name: str) -> str:
+        """
+        The card name for `name` as far as the index can tell: any match
+        while it is fresh, only an exact alias while it is not. `name`
+        itself otherwise; select_building resolves it on the device.
+        """
+        if self.fresh:
+            card = self.lookup(name)
+        else:
+            with self._lock:
+                card = self.cards.get(self.aliases.get(normalize(name), ""))
+        return card.name if card else name
+
+    def suggestions(self, name: str, n: int = 3) -> List[str]:
+        with self._lock:
+            close = difflib.get_close_matches(normalize(name), list(self.aliases), n=n * 2, cutoff=0.3)
+            names: List[str] = []
+            for a in close:
+                if self.aliases[a] not in names:
+                    names.append(self.aliases[a])
+            return names[:n]
+
+    def resolve(self, name: str) -> BuildingCard:
+        card = self.lookup(name)
+        if card is None:
+            raise BuildingNotFound(name, self.suggestions(name))
+        return card
+
+    def scan(self, driver) -> None:
+        """
+        Page through the centre list (the current screen) collecting every
+        card and the scroll page it sits on.
+        """
+        seen = set()
+        for cards in card_pages(driver):
+            for card in cards:
+                seen.add(card.name)
+                self.add(card)
+        with self._lock:
+            # Buildings that have disappeared from the list are dropped
+            for name in list(self.cards):
+                if name not in seen:
+                    del self.cards[name]
+            self.aliases = {a: c for a, c in self.aliases.items() if c in self.cards}
+            self.built_at = time.time()
+            self.complete = True
+        self.save()
+
+    def save(self) -> None:
+        with self._lock:
+            data = {
+                "built_at": self.built_at,
+                "complete": self.complete,
+                "cards": [asdict(c) for c in self.cards.values()],
+            }
+            try:
+                write_atomic(self.path, json.dumps(data))
+            except OSError as e:
+                log.warning("Could not save the building index: %s", e)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable building index %s: %s", self.path, e)
+            return
+        try:
+            cards = [BuildingCard(**c) for c in data.get("cards", [])]
+            built_at = float(data.get("built_at", 0.0))
+            complete = bool(data.get("complete", False))
+        except (AttributeError, TypeError, KeyError, ValueError) as e:
+            # Written with another card layout: as good as expired, the next scan rebuilds it
+            log.warning("Discarding building index %s from another version: %s", self.path, e)
+            return
+        for card in cards:
+            self.add(card)
+        self.built_at = built_at
+        self.complete = complete
+
+
+def card_pages(driver, first: Optional[Snapshot] = None) -> Iterator[List[BuildingCard]]:
+    """
+    Page through the centre list (the current screen), yielding the cards
+    first seen on each page. `first` is a snapshot of the list already
+    taken. The generator ends at the bottom of the list; stop iterating to
+    stop scrolling.
+    """
+    seen = set()
+    snap = first
+    for page in range(MAX_SCROLL_PAGES):
+        if snap is None:
+            snap = take_snapshot(driver)
+        new = [c for c in cards_in(snap, page) if c.name not in seen]
+        if not new and page:
+            return
+        seen.update(c.name for c in new)
+        yield new
+        scroll_down(driver, snap)
+        snap = None
+
+
+_index: Optional[BuildingIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_building_index() -> BuildingIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = BuildingIndex()
+        return _index
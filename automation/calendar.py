@@ -1,10 +1,65 @@
+"""
+Date specs for booking requests.
+
+Besides plain ISO dates, a booking request can name dates compactly:
+
+    2026-03-03                              one day
+    2026-03-02..2026-03-27                  every working day in the range
+    2026-03-02..2026-05-29:Tue,Thu          only the listed weekdays
+    today..+13w:Mon-Wed                     relative endpoints (+Nd / +Nw)
+    RRULE:FREQ=WEEKLY;BYDAY=TU,TH;UNTIL=20260630
+    RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=FR;COUNT=6;DTSTART=20260306
+
+Every spec compiles to (first day, last day, weekday mask, stride) over day
+ordinals. Expansion walks those, then drops non-working days, holidays and
+closures (holidays.json in the state directory) and dates outside the
+app's advance-booking window, in one pass, into a sorted de-duplicated
+list. Dropped dates are reported with the reason.
+"""
+from __future__ import annotations
 import datetime as dt
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+from automation.buildings import normalize
+from automation.state import state_dir
+
+log = logging.getLogger(__name__)
+
+HOLIDAYS_FILE = "holidays.json"
+# How far ahead the app lets you book (days from today, inclusive)
+BOOKING_WINDOW_DAYS = int(os.environ.get("WEWORK_BOOKING_WINDOW_DAYS", "90"))
+# Hard cap on the days one request may expand to
+MAX_EXPANDED_DATES = 400
+
+ALL_DAYS = 0b1111111
+# Monday..Saturday; the centres are closed on Sundays
+WORKING_DAYS = 0b0111111
+
+NON_WORKING = "non-working day"
+HOLIDAY = "holiday/closure"
+PAST = "in the past"
+OUTSIDE_WINDOW = "beyond the booking window"
+
+_WEEKDAYS = {
+    "mo": 0, "mon": 0, "monday": 0,
+    "tu": 1, "tue": 1, "tues": 1, "tuesday": 1,
+    "we": 2, "wed": 2, "wednesday": 2,
+    "th": 3, "thu": 3, "thur": 3, "thurs": 3, "thursday": 3,
+    "fr": 4, "fri": 4, "friday": 4,
+    "sa": 5, "sat": 5, "saturday": 5,
+    "su": 6, "sun": 6, "sunday": 6,
+}
+_RELATIVE_RE = re.compile(r"^\+(\d+)([dw])$")
+
 
 def is_bookable_day(date: dt.date) -> bool:
-    # Sunday = 6
-    if date.weekday() == 6:
-        return False
-    return True
+    return bool(WORKING_DAYS & (1 << date.weekday()))
+
 
 def filter_bookable_dates(dates: list[str]) -> list[str]:
     valid = []
@@ -13,3 +68,218 @@ def filter_bookable_dates(dates: list[str]) -> list[str]:
         if is_bookable_day(date):
             valid.append(d)
     return valid
+
+
+# =========================
+# PARSING
+# =========================
+
+@dataclass(frozen=True)
+class DateRule:
+    """Days `first..last` (ordinals, inclusive) on `mask` weekdays, every `stride` weeks/days."""
+    first: int
+    last: int
+    mask: int = ALL_DAYS
+    # Step in days; a multiple of 7 above 7 means "every n-th week" (weekly INTERVAL=n)
+    stride: int = 1
+    # Stop after this many matching days (RRULE COUNT)
+    count: Optional[int] = None
+
+
+def parse_weekdays(text: str) -> int:
+    """'Tue,Thu', 'Mon-Fri', 'TU,TH' -> weekday bitmask (bit 0 = Monday)."""
+    mask = 0
+    for part in re.split(r"[,\s]+", text.strip()):
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        try:
+            a = _WEEKDAYS[lo.lower()]
+            b = _WEEKDAYS[hi.lower()] if hi else a
+        except KeyError:
+            raise ValueError(f"Unknown weekday in '{text}'") from None
+        for i in range(7):
+            if (i - a) % 7 <= (b - a) % 7:
+                mask |= 1 << i
+    if not mask:
+        raise ValueError(f"No weekdays in '{text}'")
+    return mask
+
+
+def _parse_day(text: str, today: dt.date, base: Optional[dt.date] = None) -> dt.date:
+    text = text.strip().lower()
+    if text == "today":
+        return today
+    if text == "tomorrow":
+        return today + dt.timedelta(days=1)
+    m = _RELATIVE_RE.match(text)
+    if m:
+        n = int(m.group(1)) * (7 if m.group(2) == "w" else 1)
+        return (base or today) + dt.timedelta(days=n)
+    if re.fullmatch(r"\d{8}", text):
+        return dt.date(int(text[:4]), int(text[4:6]), int(text[6:]))
+    return dt.date.fromisoformat(text)
+
+
+def _parse_rrule(spec: str, today: dt.date, window_end: dt.date) -> DateRule:
+    parts = {}
+    for item in spec.split(":", 1)[1].split(";"):
+        if item.strip():
+            key, _, value = item.partition("=")
+            parts[key.strip().upper()] = value.strip()
+    freq = parts.get("FREQ", "WEEKLY").upper()
+    if freq not in ("DAILY", "WEEKLY"):
+        raise ValueError(f"Only FREQ=DAILY or FREQ=WEEKLY are supported, got '{freq}'")
+    interval = int(parts.get("INTERVAL", "1"))
+    if interval < 1:
+        raise ValueError("INTERVAL must be at least 1")
+    start = _parse_day(parts["DTSTART"], today) if "DTSTART" in parts else today
+    mask = parse_weekdays(parts["BYDAY"]) if "BYDAY" in parts else (
+        1 << start.weekday() if freq == "WEEKLY" else ALL_DAYS
+    )
+    until = _parse_day(parts["UNTIL"][:8], today) if "UNTIL" in parts else window_end
+    count = int(parts["COUNT"]) if "COUNT" in parts else None
+    # Weekly INTERVAL=n counts weeks from DTSTART's week
+    stride = 7 * interval if freq == "WEEKLY" and interval > 1 else (interval if freq == "DAILY" else 1)
+    return DateRule(start.toordinal(), until.toordinal(), mask, stride, count)
+
+
+def parse_spec(spec: str, today: dt.date, window_end: dt.date) -> DateRule:
+    text = spec.strip()
+    if text.upper().startswith("RRULE:"):
+        return _parse_rrule(text, today, window_end)
+    mask = ALL_DAYS
+    if ".." in text:
+        span, sep, days = text.partition(":")
+        if sep:
+            mask = parse_weekdays(days)
+        a, _, b = span.partition("..")
+        first = _parse_day(a, today)
+        last = _parse_day(b, today, base=first) if b.strip() else window_end
+        return DateRule(first.toordinal(), last.toordinal(), mask)
+    day = _parse_day(text, today)
+    return DateRule(day.toordinal(), day.toordinal())
+
+
+# =========================
+# HOLIDAYS
+# =========================
+
+def load_holidays(building: Optional[str] = None, path: Optional[str] = None) -> List[str]:
+    """
+    Specs from holidays.json: {"*": [...], "<building>": [...]}, each list
+    in the same date-spec syntax ("2026-12-25", "2026-12-24..2027-01-01").
+    Building keys match loosely (case, punctuation, centre/center).
+    """
+    path = path or str(state_dir() / HOLIDAYS_FILE)
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        log.warning("Ignoring unreadable holiday calendar %s: %s", path, e)
+        return []
+    if isinstance(data, list):
+        return list(data)
+    specs = list(data.get("*", []))
+    if building:
+        for key, values in data.items():
+            if key != "*" and normalize(key) == normalize(building):
+                specs.extend(values)
+    return specs
+
+
+# =========================
+# EXPANSION
+# =========================
+
+@dataclass
+class DateExpansion:
+    dates: List[str] = field(default_factory=list)
+    # reason -> dates dropped for it
+    skipped: Dict[str, List[str]] = field(default_factory=dict)
+
+    def describe_skipped(self) -> str:
+        return "; ".join(f"{reason}: {days}" for reason, days in self.skipped.items())
+
+
+def _on(mask: int, ordinal: int) -> bool:
+    # date.fromordinal(o).weekday() == (o - 1) % 7
+    return bool(mask >> ((ordinal - 1) % 7) & 1)
+
+
+def _rule_days(rule: DateRule) -> Iterable[int]:
+    if rule.stride > 7 and rule.stride % 7 == 0:
+        # Every n-th week: the masked days of one week, then jump n weeks
+        monday = rule.first - (rule.first - 1) % 7
+        candidates = (
+            o for week in range(monday, rule.last + 1, rule.stride)
+            for o in range(max(week, rule.first), min(week + 7, rule.last + 1))
+        )
+    else:
+        candidates = range(rule.first, rule.last + 1, rule.stride)
+    taken = 0
+    for o in candidates:
+        if _on(rule.mask, o):
+            yield o
+            taken += 1
+            if rule.count is not None and taken >= rule.count:
+                return
+
+
+def expand_dates(
+    specs: Iterable[str],
+    building: Optional[str] = None,
+    today: Optional[dt.date] = None,
+    window_days: int = BOOKING_WINDOW_DAYS,
+    holidays: Optional[Iterable[str]] = None,
+) -> DateExpansion:
+    """
+    Expand date specs into the sorted, de-duplicated working days that can be
+    booked, with every dropped day listed under its reason. `holidays`
+    defaults to the holiday calendar for `building`. Raises ValueError for a
+    spec it cannot read, naming whether it was a date or a holiday spec.
+    """
+    today = today or dt.date.today()
+    window_end = today + dt.timedelta(days=window_days)
+    lo, hi = today.toordinal(), window_end.toordinal()
+
+    def _ordinals(items: Iterable[str], what: str, window_only: bool = False) -> Set[int]:
+        found: Set[int] = set()
+        for spec in items:
+            try:
+                rule = parse_spec(spec, today, window_end)
+            except (ValueError, KeyError) as e:
+                raise ValueError(f"Cannot read {what} '{spec}': {e}") from None
+            for o in _rule_days(rule):
+                if window_only:
+                    # Days come in order, so nothing after the window can matter
+                    if o > hi:
+                        break
+                    if o < lo:
+                        continue
+                found.add(o)
+                if len(found) > MAX_EXPANDED_DATES:
+                    raise ValueError(f"The requested {what}s expand to more than {MAX_EXPANDED_DATES} days")
+        return found
+
+    # Only holidays inside the booking window matter, which also keeps a long calendar under the cap
+    closed = _ordinals(load_holidays(building) if holidays is None else holidays, "holiday spec", window_only=True)
+
+    result = DateExpansion()
+    for o in sorted(_ordinals(specs, "date spec")):
+        day = dt.date.fromordinal(o).isoformat()
+        if o < lo:
+            reason = PAST
+        elif o > hi:
+            reason = OUTSIDE_WINDOW
+        elif not _on(WORKING_DAYS, o):
+            reason = NON_WORKING
+        elif o in closed:
+            reason = HOLIDAY
+        else:
+            result.dates.append(day)
+            continue
+        result.skipped.setdefault(reason, []).append(day)
+    return result
@@ -0,0 +1,244 @@
+"""
+Live table of the devices attached to the adb server.
+
+Instead of forking `adb devices` for every session, one background thread
+holds a `host:track-devices` connection to the adb server, which pushes the
+full device list every time a device appears, disappears or changes state.
+Lookups read the in-memory table; listeners are called on every change so
+the session pool and the dispatcher hear about a dropped device as
+soon as adb does.
+"""
+from __future__ import annotations
+import logging
+import os
+import re
+import socket
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+# Same variables the adb client honours
+ADB_HOST = os.environ.get("ANDROID_ADB_SERVER_ADDRESS", "127.0.0.1")
+ADB_PORT = int(os.environ.get("ANDROID_ADB_SERVER_PORT", "5037"))
+
+# Device states as reported by adb
+DEVICE = "device"
+OFFLINE = "offline"
+UNAUTHORIZED = "unauthorized"
+
+USB = "usb"
+TCP = "tcp"
+MDNS = "mdns"
+
+CONNECT_TIMEOUT = 2.0
+RECONNECT_MIN = 0.5
+RECONNECT_MAX = 10.0
+
+_TCP_SERIAL_RE = re.compile(r"^[\w.\-]+:\d+$")
+
+# (serial, old_state, new_state); old_state is None for a new device, new_state None once it is gone
+Listener = Callable[[str, Optional[str], Optional[str]], None]
+
+
+class AdbError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class Device:
+    serial: str
+    state: str
+    transport: str
+
+    @property
+    def ready(self) -> bool:
+        return self.state == DEVICE
+
+
+def transport_of(serial: str) -> str:
+    """USB, TCP (ip:port) or mDNS (adb-xxxx._adb-tls-connect._tcp) from the serial alone."""
+    if "._adb" in serial or serial.startswith("adb-"):
+        return MDNS
+    if _TCP_SERIAL_RE.match(serial):
+        return TCP
+    return USB
+
+
+def parse_device_list(payload: str) -> Dict[str, Device]:
+    devices = {}
+    for line in payload.splitlines():
+        parts = line.split("\t")
+        if len(parts) >= 2 and parts[0]:
+            devices[parts[0]] = Device(parts[0], parts[1].strip(), transport_of(parts[0]))
+    return devices
+
+
+# =========================
+# ADB WIRE PROTOCOL
+# =========================
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("adb server closed the connection")
+        buf += chunk
+    return buf
+
+
+def _read_block(sock: socket.socket) -> str:
+    length = int(_recv_exact(sock, 4), 16)
+    return _recv_exact(sock, length).decode("utf-8", "replace") if length else ""
+
+
+def adb_request(sock: socket.socket, service: str) -> None:
+    """Send one host service request and consume the OKAY/FAIL status."""
+    data = service.encode()
+    sock.sendall(b"%04x" % len(data) + data)
+    status = _recv_exact(sock, 4)
+    if status == b"FAIL":
+        raise AdbError(_read_block(sock))
+    if status != b"OKAY":
+        raise AdbError(f"unexpected adb status {status!r}")
+
+
+# =========================
+# REGISTRY
+# =========================
+
+class DeviceRegistry:
+    """
+    Always-current device table fed by the adb server's track-devices stream.
+
+    The watcher thread reconnects with backoff when the adb server is down or
+    restarts; while disconnected the table is empty and `connected` is False,
+    so callers can fall back to the `adb` binary (which also starts the
+    server).
+    """
+
+    def __init__(self, host: str = ADB_HOST, port: int = ADB_PORT):
+        self.host = host
+        self.port = port
+        self._devices: Dict[str, Device] = {}
+        self._lock = threading.Lock()
+        self._listeners: List[Listener] = []
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._sock: Optional[socket.socket] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # -------------------------
+    # PUBLIC API
+    # -------------------------
+
+    def start(self) -> "DeviceRegistry":
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._watch, name="adb-track-devices", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    @property
+    def connected(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: float) -> bool:
+        """True once the first device list has arrived from the adb server."""
+        return self._ready.wait(timeout)
+
+    def devices(self) -> List[Device]:
+        with self._lock:
+            return list(self._devices.values())
+
+    def serials(self, state: str = DEVICE) -> List[str]:
+        with self._lock:
+            return [d.serial for d in self._devices.values() if d.state == state]
+
+    def get(self, serial: str) -> Optional[Device]:
+        with self._lock:
+            return self._devices.get(serial)
+
+    def add_listener(self, fn: Listener) -> None:
+        with self._lock:
+            self._listeners.append(fn)
+
+    def remove_listener(self, fn: Listener) -> None:
+        with self._lock:
+            if fn in self._listeners:
+                self._listeners.remove(fn)
+
+    # -------------------------
+    # INTERNALS
+    # -------------------------
+
+    def _watch(self) -> None:
+        delay = RECONNECT_MIN
+        while not self._stop.is_set():
+            try:
+                with socket.create_connection((self.host, self.port), timeout=CONNECT_TIMEOUT) as sock:
+                    self._sock = sock
+                    adb_request(sock, "host:track-devices")
+                    sock.settimeout(None)
+                    delay = RECONNECT_MIN
+                    while not self._stop.is_set():
+                        self._update(parse_device_list(_read_block(sock)))
+                        self._ready.set()
+            except (OSError, ConnectionError, AdbError, ValueError) as e:
+                if self._stop.is_set():
+                    break
+                log.debug("adb track-devices unavailable (%s); retrying in %.1fs", e, delay)
+            finally:
+                self._sock = None
+            if self._ready.is_set():
+                # The server went away: every device is gone until it is back
+                self._ready.clear()
+                self._update({})
+            self._stop.wait(delay)
+            delay = min(delay * 2, RECONNECT_MAX)
+
+    def _update(self, current: Dict[str, Device]) -> None:
+        with self._lock:
+            previous, self._devices = self._devices, current
+            listeners = list(self._listeners)
+        changes = []
+        for serial in previous.keys() | current.keys():
+            old = previous.get(serial)
+            new = current.get(serial)
+            old_state = old.state if old else None
+            new_state = new.state if new else None
+            if old_state != new_state:
+                changes.append((serial, old_state, new_state))
+        for serial, old_state, new_state in changes:
+            log.info("Device %s: %s -> %s", serial, old_state or "(new)", new_state or "(gone)")
+            for fn in listeners:
+                try:
+                    fn(serial, old_state, new_state)
+                except Exception:
+                    log.exception("Device listener failed for %s", serial)
+
+
+_registry: Optional[DeviceRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> DeviceRegistry:
+    """Process-wide registry, started on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = DeviceRegistry().start()
+        return _registry
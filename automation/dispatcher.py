@@ -0,0 +1,612 @@
+"""
+Per-device booking dispatcher shared by every MCP client.
+
+Booking requests are split into one task per (account, building, date).
+A request for a task that is already queued or running is attached to
+that task and gets the same BookingResult, so two agents asking for the
+same desk cost one booking. Tasks wait in one FIFO per client. Each
+device's worker takes the next task from the clients in turn
+(round-robin), and a client that just had its turn goes behind one that
+joins, so one agent's long range cannot starve a single-date request
+from another. A device only ever runs one task at a time,
+through its leased session (automation.session_pool). Failed dates are
+retried within one RETRY_BUDGET_S per request, counted from when its
+first date starts, rather than a fresh budget for every date.
+
+Tasks are handed out as devices free up, so the work spreads across
+devices without splitting it up front. When adb reports a device gone,
+its unfinished task goes back to the front of the queue for the others.
+`stats()` reports queue depth per client, what each device is doing and
+how long tasks waited.
+
+Every other use of a device goes through the dispatcher too. `lease()`
+queues a request for a device's session (availability scans, reading or
+cancelling bookings, a scheduled fire) in the same client turns. A worker
+lends its session to the caller for the duration. `claim()` marks a date
+the holder of a lease is booking itself, so requests for the same desk
+join that booking instead of running it on a second device.
+"""
+from __future__ import annotations
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from automation.buildings import normalize
+from automation.devices import DEVICE, get_registry
+from automation.driver import get_udids
+from automation.ledger import account_name
+from automation.planner import plan_bookings
+from automation.results import CANCELLED, FAILED, BookingResult, ResultCallback
+from automation.session_pool import SessionPool, get_pool
+from automation.wework_flow import RETRY_BUDGET_S, book_desks
+
+log = logging.getLogger(__name__)
+
+# A worker gives its session back after this long so other lessees (e.g. the scheduler) get a turn
+LEASE_HOLD_S = 60.0
+# The ledger is synced with the home screen at most this often per device
+RECONCILE_EVERY_S = 120.0
+# Queue-wait samples kept for stats()
+WAIT_SAMPLES = 500
+# How often waiting callers look at their cancel flag
+CANCEL_POLL_S = 0.5
+# Consecutive session failures after which a device's worker gives up
+MAX_SESSION_FAILURES = 2
+
+TaskKey = Tuple[str, str, str]
+
+
+class NoDeviceAvailable(RuntimeError):
+    """No device can take bookings, so a request cannot start."""
+
+
+class _Ticket:
+    """One booking request: the dates it still waits for and where their results go."""
+
+    def __init__(self, client: str, on_result: Optional[ResultCallback], cancel_event=None):
+        self.client = client
+        self.on_result = on_result
+        self.cancel_event = cancel_event
+        self.tasks: Dict[str, "_Task"] = {}
+        self.waiting: Set[str] = set()
+        self.results: Dict[str, BookingResult] = {}
+        # Monotonic time after which failed dates are not retried; set when the first date starts
+        self.retry_deadline: Optional[float] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+
+class _Lease:
+    """A device session lent to a caller of Dispatcher.lease, and when it comes back."""
+
+    def __init__(self):
+        self.granted = threading.Event()
+        self.released = threading.Event()
+        self.udid: Optional[str] = None
+        self.driver = None
+        self.error: Optional[str] = None
+
+
+class _Claim:
+    """A date the lease holder books itself (Dispatcher.claim); set `result` once it has."""
+
+    def __init__(self, task: "_Task"):
+        self.task = task
+        self.result: Optional[BookingResult] = None
+
+
+@dataclass(eq=False)
+class _Task:
+    key: TaskKey
+    # The date to book; what the device is used for, for a lease
+    date: str
+    building: str
+    account: str
+    # Client whose queue the task waits in (the first one to ask for it)
+    client: str
+    enqueued_at: float = field(default_factory=time.monotonic)
+    tickets: List[_Ticket] = field(default_factory=list)
+    device: Optional[str] = None
+    # Only this device may take the task
+    udid: Optional[str] = None
+    lease: Optional[_Lease] = None
+
+
+class _TaskStop:
+    """cancel_event for book_desks: the device dropped, or every request for the task was cancelled."""
+
+    def __init__(self, task: _Task, gone: threading.Event):
+        self.task = task
+        self.gone = gone
+
+    def is_set(self) -> bool:
+        return self.gone.is_set() or all(t.cancelled for t in list(self.task.tickets))
+
+
+class _Worker:
+    def __init__(self, udid: str):
+        self.udid = udid
+        self.gone = threading.Event()
+        self.task: Optional[_Task] = None
+        self.completed = 0
+        self.busy_s = 0.0
+        self.thread: Optional[threading.Thread] = None
+
+
+class Dispatcher:
+    def __init__(self, pool: Optional[SessionPool] = None, udids: Optional[List[str]] = None):
+        self._pool = pool
+        # Fixed device list (benchmarks); otherwise whatever adb reports
+        self._udids = udids
+        self._cond = threading.Condition()
+        self._queues: Dict[str, Deque[_Task]] = {}
+        # Clients with queued tasks, in turn order
+        self._turns: Deque[str] = deque()
+        # Client whose task was handed out last
+        self._last_served: Optional[str] = None
+        # Queued and running tasks
+        self._tasks: Dict[TaskKey, _Task] = {}
+        self._workers: Dict[str, _Worker] = {}
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self._last_error: Optional[str] = None
+        self.coalesced = 0
+        self.completed = 0
+
+    # -------------------------
+    # PUBLIC API
+    # -------------------------
+
+    def book(
+        self,
+        dates: List[str],
+        building: str,
+        client: str = "default",
+        cancel_event=None,
+        on_result: Optional[ResultCallback] = None,
+        account: Optional[str] = None,
+    ) -> Dict[str, BookingResult]:
+        """
+        Book `dates` on whichever devices are free, sharing tasks with other
+        clients' in-flight requests for the same desk. Blocks until every
+        date has a result; `on_result` is called as each one arrives. Once
+        `cancel_event` is set, dates not yet started are dropped from the
+        result (other clients waiting for them still get them booked).
+        """
+        account = account or account_name()
+        self._ensure_workers()
+        ticket = _Ticket(client, on_result, cancel_event)
+        plan = plan_bookings((d, building) for d in dates)
+        with self._cond:
+            for item in plan.items:
+                d = item.date.isoformat()
+                key = (account, normalize(building), d)
+                task = self._tasks.get(key)
+                if task is None:
+                    task = self._tasks[key] = _Task(key, d, building, account, client)
+                    self._enqueue(task)
+                else:
+                    self.coalesced += 1
+                    log.info("%s for %s joins the in-flight booking from %s", d, client, task.client)
+                task.tickets.append(ticket)
+                ticket.tasks[d] = task
+                ticket.waiting.add(d)
+            self._cond.notify_all()
+
+            while ticket.waiting:
+                if not self._workers:
+                    # Every device dropped out after this request was queued
+                    self._cond.release()
+                    try:
+                        self._fail_stranded()
+                    finally:
+                        self._cond.acquire()
+                if ticket.cancelled:
+                    self._withdraw(ticket)
+                if ticket.waiting:
+                    self._cond.wait(CANCEL_POLL_S)
+        return {d: ticket.results[d] for d in (i.date.isoformat() for i in plan.items) if d in ticket.results}
+
+    @contextmanager
+    def lease(self, client: str = "default", udid: Optional[str] = None,
+              purpose: str = "device work") -> Iterator[Tuple[str, object]]:
+        """
+        Borrow a device's session for work other than booking. The request
+        waits in `client`'s queue and takes its turn with booking tasks;
+        stats() shows `purpose` while it is held. `udid` pins the device.
+        Yields (udid, driver); the device is the caller's until the block
+        exits. Raises NoDeviceAvailable when no device (or not `udid`) can
+        serve it.
+        """
+        self._ensure_workers()
+        lease = _Lease()
+        task = _Task(("lease", uuid.uuid4().hex, ""), purpose, "", "", client, udid=udid, lease=lease)
+        with self._cond:
+            if udid is not None and udid not in self._workers:
+                raise NoDeviceAvailable(f"Device {udid} is not available")
+            self._tasks[task.key] = task
+            self._enqueue(task)
+            self._cond.notify_all()
+            while not lease.granted.is_set():
+                self._cond.wait(CANCEL_POLL_S)
+        if lease.error is not None:
+            raise NoDeviceAvailable(lease.error)
+        try:
+            yield lease.udid, lease.driver
+        finally:
+            lease.released.set()
+
+    @contextmanager
+    def claim(self, date: str, building: str, account: str, udid: str) -> Iterator[Optional[_Claim]]:
+        """
+        For a lease holder about to book `date` itself on `udid` (the
+        scheduler's fire): while the block runs, book() requests for the
+        same desk join this booking, and a queued task for it is taken
+        over. Yields None when another device is already booking it.
+        Set `.result` on the claim; without an ok result, callers that
+        joined are queued for a device as usual.
+        """
+        key = (account, normalize(building), date)
+        with self._cond:
+            task = self._tasks.get(key)
+            if task is not None and task.device is not None:
+                claim = None
+            else:
+                if task is None:
+                    task = self._tasks[key] = _Task(key, date, building, account, "")
+                else:
+                    self._unqueue(task)
+                task.device = udid
+                claim = _Claim(task)
+        if claim is None:
+            yield None
+            return
+        try:
+            yield claim
+        finally:
+            result = claim.result
+            if result is not None and result.ok:
+                result.device = udid
+                self._finish(None, task, result)
+            else:
+                with self._cond:
+                    task.device = None
+                    if task.tickets:
+                        task.client = task.client or task.tickets[0].client
+                        self._enqueue(task, front=True)
+                    else:
+                        self._tasks.pop(key, None)
+                    self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            waits = sorted(self._waits)
+            devices = {
+                w.udid: {
+                    "booking": w.task.date if w.task and w.task.lease is None else None,
+                    "lent_for": w.task.date if w.task and w.task.lease is not None else None,
+                    "for_client": w.task.client if w.task else None,
+                    "completed": w.completed,
+                    "busy_s": round(w.busy_s, 1),
+                }
+                for w in self._workers.values()
+            }
+            return {
+                "devices": devices,
+                "queue_depth": sum(len(q) for q in self._queues.values()),
+                "queued_by_client": {c: len(q) for c, q in self._queues.items()},
+                "in_flight": len(self._tasks),
+                "completed": self.completed,
+                "coalesced": self.coalesced,
+                "wait_s": {
+                    "samples": len(waits),
+                    "p50": round(_nearest_rank(waits, 50), 2),
+                    "p95": round(_nearest_rank(waits, 95), 2),
+                    "max": round(waits[-1], 2) if waits else 0.0,
+                },
+            }
+
+    def device_changed(self, udid: str, old_state: Optional[str], new_state: Optional[str]) -> None:
+        """Registry listener (see automation.devices): stop the worker of a device that went away."""
+        if new_state == DEVICE:
+            return
+        with self._cond:
+            worker = self._workers.get(udid)
+            if worker is not None:
+                worker.gone.set()
+                self._cond.notify_all()
+
+    # -------------------------
+    # QUEUES
+    # -------------------------
+
+    def _enqueue(self, task: _Task, front: bool = False) -> None:
+        queue = self._queues.get(task.client)
+        if queue is None:
+            queue = self._queues[task.client] = deque()
+        if not queue:
+            if front:
+                self._turns.appendleft(task.client)
+            elif self._turns and self._turns[-1] == self._last_served:
+                # A client that just had its turn waits behind a newcomer
+                self._turns.insert(len(self._turns) - 1, task.client)
+            else:
+                self._turns.append(task.client)
+        if front:
+            queue.appendleft(task)
+        else:
+            queue.append(task)
+
+    def _next(self, udid: Optional[str] = None) -> Optional[_Task]:
+        """
+        First task `udid` may run from the client whose turn it is; that
+        client then goes to the back, behind any client that joins before
+        the next turn (see _enqueue). Clients with only tasks pinned to
+        other devices keep their place. udid=None takes any task.
+        """
+        for client in list(self._turns):
+            queue = self._queues.get(client)
+            if not queue:
+                self._turns.remove(client)
+                self._queues.pop(client, None)
+                continue
+            task = next((t for t in queue if udid is None or t.udid in (None, udid)), None)
+            if task is None:
+                continue
+            queue.remove(task)
+            self._turns.remove(client)
+            self._last_served = client
+            if queue:
+                self._turns.append(client)
+            else:
+                del self._queues[client]
+            return task
+        return None
+
+    def _unqueue(self, task: _Task) -> None:
+        queue = self._queues.get(task.client)
+        if queue is not None and task in queue:
+            queue.remove(task)
+            if not queue:
+                del self._queues[task.client]
+                if task.client in self._turns:
+                    self._turns.remove(task.client)
+
+    def _dequeue(self, task: _Task) -> None:
+        self._unqueue(task)
+        self._tasks.pop(task.key, None)
+
+    def _withdraw(self, ticket: _Ticket) -> None:
+        """Drop a cancelled request's dates that have not started; running ones still report."""
+        for d in list(ticket.waiting):
+            task = ticket.tasks[d]
+            if task.device is not None:
+                continue
+            task.tickets.remove(ticket)
+            ticket.waiting.discard(d)
+            if not task.tickets:
+                self._dequeue(task)
+
+    # -------------------------
+    # WORKERS
+    # -------------------------
+
+    def _ensure_workers(self) -> None:
+        udids = self._udids if self._udids is not None else get_udids()
+        with self._cond:
+            for udid in udids:
+                if udid not in self._workers:
+                    worker = self._workers[udid] = _Worker(udid)
+                    worker.thread = threading.Thread(
+                        target=self._work, args=(worker,), name=f"device-{udid}", daemon=True
+                    )
+                    worker.thread.start()
+            if not self._workers:
+                raise NoDeviceAvailable(self._last_error or "No healthy Android device available for booking")
+
+    def _take(self, worker: _Worker, block: bool) -> Optional[_Task]:
+        with self._cond:
+            while not worker.gone.is_set():
+                task = self._next(worker.udid)
+                if task is not None:
+                    now = time.monotonic()
+                    task.device = worker.udid
+                    worker.task = task
+                    self._waits.append(now - task.enqueued_at)
+                    for ticket in task.tickets:
+                        if ticket.retry_deadline is None:
+                            ticket.retry_deadline = now + RETRY_BUDGET_S
+                    return task
+                if not block:
+                    return None
+                self._cond.wait()
+            return None
+
+    def _work(self, worker: _Worker) -> None:
+        pool = self._pool or get_pool()
+        last_reconcile = 0.0
+        failures = 0
+        try:
+            while True:
+                task = self._take(worker, block=True)
+                if task is None:
+                    return
+                try:
+                    with pool.session(worker.udid) as driver:
+                        leased = time.monotonic()
+                        while task is not None:
+                            if task.lease is not None:
+                                self._lend(worker, task, driver)
+                            else:
+                                reconcile = time.monotonic() - last_reconcile > RECONCILE_EVERY_S
+                                if reconcile:
+                                    last_reconcile = time.monotonic()
+                                self._finish(worker, task, self._book(worker, task, driver, reconcile))
+                            task = None
+                            failures = 0
+                            if time.monotonic() - leased < LEASE_HOLD_S:
+                                task = self._take(worker, block=False)
+                except Exception as e:
+                    # No session on this device, or it died under the task
+                    failures += 1
+                    error = f"{type(e).__name__}: {str(e).strip()}"
+                    log.warning("Session on %s failed (%d in a row): %s", worker.udid, failures, error)
+                    with self._cond:
+                        self._last_error = error
+                    if failures >= MAX_SESSION_FAILURES:
+                        worker.gone.set()
+                    if task is not None:
+                        if worker.gone.is_set():
+                            self._fail(worker, task, error)
+                        else:
+                            self._requeue(worker, task)
+        finally:
+            self._retire(worker)
+
+    def _book(self, worker: _Worker, task: _Task, driver, reconcile: bool) -> BookingResult:
+        start = time.monotonic()
+        # book_desks gets one date at a time, so the retry budget is the request's, not the date's:
+        # whatever is left of it for the request wanting this date that has the most left
+        budget = max(
+            (t.retry_deadline - start for t in list(task.tickets) if t.retry_deadline is not None and not t.cancelled),
+            default=RETRY_BUDGET_S,
+        )
+        results = book_desks(
+            [task.date], task.building, driver=driver, cancel_event=_TaskStop(task, worker.gone),
+            account=task.account, retry_budget_s=max(0.0, budget), reconcile=reconcile,
+        )
+        worker.busy_s += time.monotonic() - start
+        result = results.get(task.date) or BookingResult(task.date, CANCELLED, task.building)
+        result.device = worker.udid
+        return result
+
+    def _lend(self, worker: _Worker, task: _Task, driver) -> None:
+        """Hand the session to the lease holder and wait until it is given back."""
+        lease = task.lease
+        start = time.monotonic()
+        with self._cond:
+            lease.udid, lease.driver = worker.udid, driver
+            lease.granted.set()
+            self._cond.notify_all()
+        lease.released.wait()
+        with self._cond:
+            worker.busy_s += time.monotonic() - start
+            worker.task = None
+            task.device = None
+            self._tasks.pop(task.key, None)
+            worker.completed += 1
+            self.completed += 1
+            self._cond.notify_all()
+
+    def _fail(self, worker: Optional[_Worker], task: _Task, error: str) -> None:
+        """A task that cannot run: a booking gets a failed result, a lease holder the error."""
+        if task.lease is None:
+            self._finish(worker, task, BookingResult(
+                task.date, FAILED, task.building, error=error, device=worker.udid if worker else None,
+            ))
+            return
+        with self._cond:
+            if worker is not None:
+                worker.task = None
+            task.device = None
+            others = [w for w in self._workers.values() if w is not worker and not w.gone.is_set()]
+            if task.udid is None and others:
+                self._enqueue(task, front=True)
+            else:
+                self._tasks.pop(task.key, None)
+                task.lease.error = error
+                task.lease.granted.set()
+            self._cond.notify_all()
+
+    def _requeue(self, worker: _Worker, task: _Task) -> None:
+        """Put a task that never really ran back at the front of its client's queue."""
+        with self._cond:
+            worker.task = None
+            task.device = None
+            self._enqueue(task, front=True)
+            self._cond.notify_all()
+
+    def _finish(self, worker: Optional[_Worker], task: _Task, result: BookingResult) -> None:
+        with self._cond:
+            if worker is not None:
+                worker.task = None
+            task.device = None
+            others = [w for w in self._workers.values() if w is not worker and not w.gone.is_set()]
+            if not result.ok and worker is not None and worker.gone.is_set() and others:
+                # Lost with the device; another device picks it up next
+                log.info("Requeueing %s from dropped device %s", task.date, worker.udid)
+                self._enqueue(task, front=True)
+                self._cond.notify_all()
+                return
+            self._tasks.pop(task.key, None)
+            if worker is not None:
+                worker.completed += 1
+            self.completed += 1
+            deliveries = []
+            for ticket in task.tickets:
+                if task.date in ticket.waiting:
+                    ticket.results[task.date] = result
+                    ticket.waiting.discard(task.date)
+                    deliveries.append(ticket)
+            self._cond.notify_all()
+        for ticket in deliveries:
+            if ticket.on_result is not None:
+                try:
+                    ticket.on_result(result)
+                except Exception:
+                    log.exception("Result callback failed for %s", task.date)
+
+    def _retire(self, worker: _Worker) -> None:
+        with self._cond:
+            if self._workers.get(worker.udid) is worker:
+                del self._workers[worker.udid]
+            # Leases pinned to this device cannot go anywhere else
+            pinned = [t for q in self._queues.values() for t in q if t.udid == worker.udid]
+            for task in pinned:
+                self._dequeue(task)
+            self._cond.notify_all()
+        error = self._last_error or f"Device {worker.udid} went away"
+        for task in pinned:
+            self._fail(None, task, error)
+        self._fail_stranded()
+
+    def _fail_stranded(self) -> None:
+        """With no device left, fail whatever is still queued instead of leaving callers waiting."""
+        with self._cond:
+            if self._workers:
+                return
+            stranded = []
+            while True:
+                task = self._next()
+                if task is None:
+                    break
+                stranded.append(task)
+        error = self._last_error or "No healthy Android device available for booking"
+        for task in stranded:
+            self._fail(None, task, error)
+
+
+def _nearest_rank(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+_dispatcher: Optional[Dispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> Dispatcher:
+    """Process-wide dispatcher shared by all MCP tool calls."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = Dispatcher()
+            get_registry().add_listener(_dispatcher.device_changed)
+        return _dispatcher
@@ -1,21 +1,47 @@
+from __future__ import annotations
+import logging
+import os
 import subprocess
 import re
 from appium import webdriver
 from appium.options.android import UiAutomator2Options
+from selenium.common.exceptions import WebDriverException
 
-APPIUM_SERVER = "http://127.0.0.1:4723"
+from automation import tracing
+from automation.bootstrap import DEFAULT_PROFILE, forget_recommendation, profile_caps, select_profile, session_phases
+from automation.devices import get_registry
+
+# Point at another Appium (or the local fake in devtools/fake_appium.py) with APPIUM_SERVER_URL
+APPIUM_SERVER = os.environ.get("APPIUM_SERVER_URL", "http://127.0.0.1:4723")
 APP_PACKAGE = "in.co.wework.spacecraft"
 APP_ACTIVITY = "in.co.wework.spacecraft.SpacecraftActivity"
+NEW_COMMAND_TIMEOUT = 300
+# UiAutomator2 forwards a host port per session; parallel sessions need distinct ones
+SYSTEM_PORT_BASE = 8200
+# How long the first lookup waits for the adb track-devices stream before forking `adb devices`
+REGISTRY_READY_TIMEOUT = 1.0
 
+log = logging.getLogger(__name__)
 
-def get_udid() -> str:
+
+def get_udids() -> list[str]:
     """
-    Auto-detects the first connected Android device via adb.
+    Lists every Android device adb reports in the `device` state
+    (offline/unauthorized ones are skipped).
     Works for:
     - USB
     - Wi-Fi (IP:5555)
     - Wi-Fi (mDNS adb-xxxx._adb-tls-connect._tcp)
+    Read from the live device registry (automation.devices); the `adb devices`
+    subprocess is only used while the adb server is not reachable.
     """
+    registry = get_registry()
+    if registry.wait_ready(REGISTRY_READY_TIMEOUT):
+        return registry.serials()
+    return _adb_devices()
+
+
+def _adb_devices() -> list[str]:
     try:
         out = subprocess.check_output(
             ["adb", "devices"],
@@ -38,22 +64,54 @@ def get_udid() -> str:
             f"Details: {e}"
         ) from e
 
+    udids = []
     for line in out.splitlines():
         if "\tdevice" in line and not line.startswith("List"):
-            return line.split("\t")[0]
+            udids.append(line.split("\t")[0])
+    return udids
 
-    raise RuntimeError("No connected Android device found via adb")
 
+def get_udid() -> str:
+    """
+    Auto-detects the first connected Android device via adb.
+    """
+    udids = get_udids()
+    if not udids:
+        raise RuntimeError("No connected Android device found via adb")
+    return udids[0]
+
+
+def create_driver(
+    udid: str | None = None,
+    system_port: int | None = None,
+    server_url: str | None = None,
+    profile: str | None = None,
+) -> webdriver.Remote:
+    """
+    Start an Appium session on `udid`. `profile` names a capability profile
+    (see automation.bootstrap); without one, WEWORK_CAPS_PROFILE or the
+    device's benchmarked recommendation is used. A recommended profile that
+    fails to start a session is forgotten and the defaults are used instead.
+    """
+    udid = udid or get_udid()
+    name, explicit = select_profile(udid, profile)
+    try:
+        return _start_session(udid, system_port, server_url, name)
+    except WebDriverException as e:
+        if explicit or name == DEFAULT_PROFILE:
+            raise
+        log.warning("Capability profile '%s' failed on %s, falling back to defaults: %s", name, udid, e)
+        forget_recommendation(udid)
+        return _start_session(udid, system_port, server_url, DEFAULT_PROFILE)
 
-def create_driver() -> webdriver.Remote:
-    udid = get_udid()
 
+def _start_session(udid: str, system_port: int | None, server_url: str | None, profile: str) -> webdriver.Remote:
     opts = UiAutomator2Options()
     opts.platform_name = "Android"
     opts.automation_name = "UiAutomator2"
     opts.udid = udid
     opts.no_reset = True
-    opts.new_command_timeout = 300
+    opts.new_command_timeout = NEW_COMMAND_TIMEOUT
     opts.app_package = APP_PACKAGE
     opts.app_activity = APP_ACTIVITY
 
@@ -63,5 +121,14 @@ def create_driver() -> webdriver.Remote:
     opts.set_capability("appium:adbExecTimeout", 120000)
     # Give UiAutomator2 instrumentation more time to start (helps "instrumentation process cannot be initialized")
     opts.set_capability("appium:uiautomator2ServerLaunchTimeout", 120000)
+    # Server-side timestamps for each phase of the session start (see automation.bootstrap.phases)
+    opts.set_capability("appium:eventTimings", True)
+    if system_port is not None:
+        opts.set_capability("appium:systemPort", system_port)
+    for key, value in profile_caps(profile).items():
+        opts.set_capability(key, value)
 
-    return webdriver.Remote(APPIUM_SERVER, options=opts)
+    with tracing.span("create_driver", udid=udid, profile=profile) as span:
+        driver = webdriver.Remote(server_url or APPIUM_SERVER, options=opts)
+        span.set(phases=dict(session_phases(driver)))
+        return driver
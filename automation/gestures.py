@@ -0,0 +1,278 @@
+"""
+Calibrated, verified swipe-to-book gesture.
+
+The booking slider only accepts a drag that is slow enough for the device
+and app build, and the old fixed 1300 ms swipe was either wasted time on a
+fast phone or silently too fast on a slow one. Here every swipe is checked:
+success means the booked sheet appears. A swipe the slider rejected (it
+snapped back and the confirmation sheet still offers it) is retried at the
+next slower rung of a ladder of profiles. Anything else, such as an error
+dialog or a sheet still loading after the grace period, is not a rejection:
+it is never swiped again here and says nothing about the gesture.
+
+The rung that works is remembered per (device, app version) in
+gestures.json in the state directory. After a few consecutive successes a
+faster rung is probed; a rung the slider rejected is not probed again for
+that device/app version until FLOOR_TTL_S has passed, so calibration
+converges on the fastest reliable swipe without costing a booking.
+"""
+from __future__ import annotations
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from appium.webdriver.common.appiumby import AppiumBy
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.actions.action_builder import ActionBuilder
+from selenium.webdriver.common.actions.pointer_input import PointerInput
+
+from automation import tracing
+from automation.driver import APP_PACKAGE
+from automation.locator import take_snapshot
+from automation.screens import BOOKED, CONFIRMATION, UNKNOWN, detect_screen
+from automation.state import state_dir, write_atomic
+from automation.waits import adaptive_wait
+
+log = logging.getLogger(__name__)
+
+PROFILE_FILE = "gestures.json"
+# Consecutive successes on a rung before the next faster rung is probed
+PROBE_AFTER = 3
+# How long a swipe gets to bring up the booked sheet
+VERIFY_TIMEOUT = 5.0
+# Pause before the screen is read again to tell a rejected swipe from a slow booking
+REVERIFY_S = 1.0
+# How long a rejected rung stays off limits for probing
+FLOOR_TTL_S = 24 * 60 * 60
+# (device, app version) profiles kept; the least recently used go first
+MAX_PROFILES = 64
+# Sessions whose profile key is remembered
+MAX_SESSION_KEYS = 32
+
+REJECTED = "rejected"
+
+
+@dataclass(frozen=True)
+class SwipeProfile:
+    duration_ms: int
+    steps: int
+    end_hold_ms: int
+    # Pixels past the slider's right edge the drag ends at
+    overshoot_px: int = 5
+
+
+# Fastest to slowest. DEFAULT_RUNG is the swipe the flow always used, so an
+# uncalibrated device starts from known-good behaviour.
+LADDER: Tuple[SwipeProfile, ...] = (
+    SwipeProfile(250, 2, 0),
+    SwipeProfile(450, 3, 50),
+    SwipeProfile(700, 4, 150),
+    SwipeProfile(1000, 5, 200),
+    SwipeProfile(1300, 6, 300),
+    SwipeProfile(2000, 8, 400),
+)
+DEFAULT_RUNG = 4
+
+
+class SwipeNotAccepted(RuntimeError):
+    pass
+
+
+# =========================
+# PROFILES
+# =========================
+
+class GestureProfiles:
+    """
+    Per (udid, app version) calibration state:
+    rung - ladder index to use next
+    floor - fastest rung not known to be rejected (forgotten after FLOOR_TTL_S)
+    streak - consecutive successes on the current rung
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or str(state_dir() / PROFILE_FILE)
+        self._lock = threading.Lock()
+        self._profiles: Dict[str, dict] = {}
+        self._load()
+
+    def _entry(self, key: str) -> dict:
+        e = self._profiles.get(key)
+        if e is None:
+            e = self._profiles[key] = {"rung": DEFAULT_RUNG, "floor": 0, "streak": 0, "updated_at": time.time()}
+            for old in sorted(self._profiles, key=lambda k: self._profiles[k].get("updated_at", 0))[:-MAX_PROFILES]:
+                del self._profiles[old]
+        if e["floor"] and time.time() - e.get("floor_at", 0) > FLOOR_TTL_S:
+            # The app or the device may have changed since; faster rungs may be probed again
+            e["floor"] = 0
+        return e
+
+    def rung(self, key: str) -> int:
+        with self._lock:
+            return self._entry(key)["rung"]
+
+    def record(self, key: str, rung: int, ok: bool) -> None:
+        """`ok=False` only for a swipe the slider rejected, never for other failures."""
+        with self._lock:
+            e = self._entry(key)
+            if ok:
+                e["streak"] = e["streak"] + 1 if rung == e["rung"] else 1
+                e["rung"] = rung
+                if e["streak"] >= PROBE_AFTER and rung > e["floor"]:
+                    e["rung"], e["streak"] = rung - 1, 0
+            else:
+                e["floor"] = max(e["floor"], min(rung + 1, len(LADDER) - 1))
+                e["floor_at"] = time.time()
+                e["rung"], e["streak"] = max(e["rung"], e["floor"]), 0
+            e["updated_at"] = time.time()
+            # Written under the lock, so an older profile set never replaces a newer one
+            try:
+                write_atomic(self.path, json.dumps(self._profiles, indent=1))
+            except OSError as err:
+                log.warning("Could not save gesture profiles: %s", err)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._profiles = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable gesture profiles %s: %s", self.path, e)
+
+
+_profiles: Optional[GestureProfiles] = None
+_profiles_lock = threading.Lock()
+
+
+def get_profiles() -> GestureProfiles:
+    global _profiles
+    with _profiles_lock:
+        if _profiles is None:
+            _profiles = GestureProfiles()
+        return _profiles
+
+
+_VERSION_RE = re.compile(r"versionName=(\S+)")
+# session id -> profile key, most recent last; the app version costs an adb shell round trip
+_keys: "OrderedDict[str, str]" = OrderedDict()
+_keys_lock = threading.Lock()
+
+
+def profile_key(driver) -> str:
+    with _keys_lock:
+        cached = _keys.get(driver.session_id)
+        if cached:
+            _keys.move_to_end(driver.session_id)
+            return cached
+    caps = driver.capabilities or {}
+    udid = caps.get("udid") or caps.get("appium:udid") or caps.get("deviceUDID") or "unknown"
+    version = "unknown"
+    try:
+        out = driver.execute_script("mobile: shell", {"command": "dumpsys", "args": ["package", APP_PACKAGE]})
+        m = _VERSION_RE.search(out or "")
+        if m:
+            version = m.group(1)
+    except WebDriverException:
+        # adb_shell needs Appium's --allow-insecure; profiles are then per device only
+        pass
+    key = f"{udid}|{version}"
+    with _keys_lock:
+        _keys[driver.session_id] = key
+        while len(_keys) > MAX_SESSION_KEYS:
+            _keys.popitem(last=False)
+    return key
+
+
+# =========================
+# GESTURE
+# =========================
+
+def perform_swipe(driver, rect: Dict[str, int], profile: SwipeProfile) -> None:
+    """Drag from the slider's left end to just past its right edge."""
+    start_x = rect["x"] + int(rect["width"] * 0.05)
+    end_x = rect["x"] + rect["width"] + profile.overshoot_px
+    y = rect["y"] + rect["height"] // 2
+
+    finger = PointerInput("touch", "finger")
+    actions = ActionBuilder(driver, mouse=finger, duration=0)
+    actions.pointer_action.move_to_location(start_x, y)
+    actions.pointer_action.pointer_down()
+
+    step_pause = (profile.duration_ms / profile.steps) / 1000
+    delta = (end_x - start_x) / profile.steps
+    current_x = start_x
+    for _ in range(profile.steps):
+        current_x += delta
+        actions.pointer_action.pause(step_pause)
+        actions.pointer_action.move_to_location(int(current_x), y)
+
+    actions.pointer_action.pause(profile.end_hold_ms / 1000)
+    actions.pointer_action.pointer_up()
+    actions.perform()
+
+
+def _slider(label: str):
+    def find(driver):
+        return take_snapshot(driver).find(AppiumBy.ACCESSIBILITY_ID, label)
+    return find
+
+
+def _settled_screen(driver) -> Optional[str]:
+    # UNKNOWN covers the frames where the next sheet is still rendering
+    screen = detect_screen(take_snapshot(driver))
+    return None if screen in (CONFIRMATION, UNKNOWN) else screen
+
+
+def _swipe_outcome(driver, label: str) -> str:
+    """
+    BOOKED, REJECTED when the confirmation sheet still offers the slider
+    once the swipe has had VERIFY_TIMEOUT and a second look, or whatever
+    other screen the swipe left the app on.
+    """
+    try:
+        return adaptive_wait(driver, _settled_screen, "booked", VERIFY_TIMEOUT)
+    except WebDriverException:
+        pass
+    # A booking still being confirmed must not be swiped again: read the screen once more
+    time.sleep(REVERIFY_S)
+    snap = take_snapshot(driver)
+    screen = detect_screen(snap)
+    if screen == CONFIRMATION and snap.find(AppiumBy.ACCESSIBILITY_ID, label) is not None:
+        return REJECTED
+    return screen
+
+
+def swipe_to_book(driver, label: str = "Book a desk") -> SwipeProfile:
+    """
+    Swipe the booking slider and confirm the booked sheet appeared, climbing
+    the ladder on a rejected swipe. Returns the profile that worked; raises
+    SwipeNotAccepted when even the slowest swipe is rejected, or when the
+    swipe lands on anything other than the booked sheet or the slider. Only
+    rejections are recorded against the rung.
+    """
+    profiles = get_profiles()
+    key = profile_key(driver)
+    rung = profiles.rung(key)
+    with tracing.span("swipe", selector=label, profile=key, start_rung=rung) as span:
+        for rung in range(rung, len(LADDER)):
+            profile = LADDER[rung]
+            node = adaptive_wait(driver, _slider(label), label, 20)
+            perform_swipe(driver, node.rect, profile)
+            screen = _swipe_outcome(driver, label)
+            span.set(rung=rung, swipe_ms=profile.duration_ms)
+            if screen == BOOKED:
+                profiles.record(key, rung, True)
+                return profile
+            if screen != REJECTED:
+                span.set(landed_on=screen)
+                raise SwipeNotAccepted(f"Swipe on '{label}' led to the {screen} screen, not the booking confirmation")
+            profiles.record(key, rung, False)
+            tracing.note_retry()
+            log.info("Swipe at %d ms not accepted on %s, retrying slower", profile.duration_ms, key)
+        raise SwipeNotAccepted(f"'{label}' rejected every swipe up to {LADDER[-1].duration_ms} ms")
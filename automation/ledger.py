@@ -0,0 +1,151 @@
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from automation.buildings import normalize
+from automation.state import state_dir
+
+LEDGER_FILE = "ledger.sqlite3"
+# Which WeWork login the bookings belong to (one ledger can serve several phones/accounts)
+ACCOUNT_ENV = "WEWORK_ACCOUNT"
+
+ATTEMPTED = "attempted"
+CONFIRMED = "confirmed"
+FAILED = "failed"
+# Cancelled in the app by a cancel_booking call
+CANCELLED = "cancelled"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bookings (
+    account     TEXT NOT NULL,
+    building    TEXT NOT NULL,
+    date        TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL,
+    PRIMARY KEY (account, building, date)
+)
+"""
+
+
+def account_name() -> str:
+    return os.environ.get(ACCOUNT_ENV) or "default"
+
+
+class Ledger:
+    """
+    Local record of every booking attempt, keyed by (account, building, date).
+    Building names are stored normalised so 'Two Horizon Centre' and
+    'Two Horizon Center' share a row.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or str(state_dir() / LEDGER_FILE)
+        with self._connect() as db:
+            db.execute(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _upsert(self, account: str, building: str, date: str, status: str,
+                error: Optional[str] = None, attempt: bool = False) -> None:
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                """
+                INSERT INTO bookings (account, building, date, status, attempts, error, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (account, building, date) DO UPDATE SET
+                    status = excluded.status,
+                    attempts = bookings.attempts + excluded.attempts,
+                    error = excluded.error,
+                    updated_at = excluded.updated_at
+                """,
+                (account, normalize(building), date, status, int(attempt), error, now, now),
+            )
+
+    def mark_attempted(self, account: str, building: str, date: str) -> None:
+        self._upsert(account, building, date, ATTEMPTED, attempt=True)
+
+    def mark_confirmed(self, account: str, building: str, date: str) -> None:
+        self._upsert(account, building, date, CONFIRMED)
+
+    def mark_failed(self, account: str, building: str, date: str, error: str) -> None:
+        self._upsert(account, building, date, FAILED, error=error)
+
+    def mark_cancelled(self, account: str, building: str, date: str) -> None:
+        self._upsert(account, building, date, CANCELLED)
+
+    def discard(self, account: str, building: str, date: str) -> None:
+        """Drop a row, e.g. one recorded under a name the booking later resolved to a centre's own."""
+        with self._connect() as db:
+            db.execute(
+                "DELETE FROM bookings WHERE account = ? AND building = ? AND date = ?",
+                (account, normalize(building), date),
+            )
+
+    def status(self, account: str, building: str, date: str) -> Optional[str]:
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT status FROM bookings WHERE account = ? AND building = ? AND date = ?",
+                (account, normalize(building), date),
+            ).fetchone()
+        return row[0] if row else None
+
+    def confirmed_dates(self, account: str, building: str, dates: Iterable[str]) -> Set[str]:
+        dates = list(dates)
+        if not dates:
+            return set()
+        marks = ",".join("?" * len(dates))
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT date FROM bookings WHERE account = ? AND building = ? AND status = ? AND date IN ({marks})",
+                (account, normalize(building), CONFIRMED, *dates),
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def reconcile(self, account: str, seen: List[Tuple[str, str]]) -> None:
+        """
+        Sync with the (building, date) bookings the app currently shows.
+        Seen bookings become confirmed. Confirmed rows inside the date span
+        the app showed but missing from it were cancelled or never went
+        through, so they are marked failed.
+        """
+        if not seen:
+            return
+        keys = {(normalize(b), d) for b, d in seen}
+        first, last = min(d for _, d in keys), max(d for _, d in keys)
+        for building, date in keys:
+            self._upsert(account, building, date, CONFIRMED)
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT building, date FROM bookings WHERE account = ? AND status = ? AND date BETWEEN ? AND ?",
+                (account, CONFIRMED, first, last),
+            ).fetchall()
+        for building, date in rows:
+            if (building, date) not in keys:
+                self._upsert(account, building, date, FAILED, error="not listed in the app's upcoming bookings")
+
+
+_ledger: Optional[Ledger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger() -> Ledger:
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = Ledger()
+        return _ledger
@@ -0,0 +1,295 @@
+"""
+Page-source snapshot locator.
+
+One `driver.page_source` dump is parsed into a flat, compact node list that
+is indexed by content-desc, resource-id and class. Every selector for the
+current screen then resolves locally, and the match is tapped at the centre
+of its bounds with a single W3C action instead of a find/poll/click cycle
+against the Appium server.
+"""
+from __future__ import annotations
+import re
+from typing import Dict, List, Optional, Tuple
+from xml.parsers import expat
+
+from appium.webdriver.common.appiumby import AppiumBy
+from selenium.webdriver.common.actions.action_builder import ActionBuilder
+from selenium.webdriver.common.actions.pointer_input import PointerInput
+
+_BOUNDS_RE = re.compile(r"\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]")
+_UISELECTOR_CALL_RE = re.compile(r'\.(\w+)\(\s*(?:"((?:[^"\\]|\\.)*)"|(\d+)|(true|false))\s*\)')
+
+# UiSelector methods the local index understands; anything else is a miss
+_UISELECTOR_METHODS = {
+    "description", "descriptionContains", "descriptionStartsWith",
+    "resourceId", "className", "text", "textContains", "textStartsWith",
+    "clickable", "enabled", "instance",
+}
+
+
+class UiNode:
+    __slots__ = ("desc", "rid", "text", "cls", "bounds", "clickable", "enabled", "scrollable")
+
+    def __init__(self, desc, rid, text, cls, bounds, clickable, enabled, scrollable):
+        self.desc = desc
+        self.rid = rid
+        self.text = text
+        self.cls = cls
+        self.bounds = bounds
+        self.clickable = clickable
+        self.enabled = enabled
+        self.scrollable = scrollable
+
+    @property
+    def center(self) -> Tuple[int, int]:
+        x1, y1, x2, y2 = self.bounds
+        return (x1 + x2) // 2, (y1 + y2) // 2
+
+    @property
+    def rect(self) -> Dict[str, int]:
+        x1, y1, x2, y2 = self.bounds
+        return {"x": x1, "y": y1, "width": x2 - x1, "height": y2 - y1}
+
+    @property
+    def visible(self) -> bool:
+        x1, y1, x2, y2 = self.bounds
+        return x2 > x1 and y2 > y1
+
+    def __repr__(self):
+        return f"UiNode(desc={self.desc!r}, rid={self.rid!r}, cls={self.cls!r}, bounds={self.bounds})"
+
+
+class Snapshot:
+    """
+    Parsed page source with lookup indexes. Nodes keep document order, so
+    `instance(n)` and "first match" behave like UiAutomator's.
+    """
+
+    def __init__(self, nodes: List[UiNode], package: str = ""):
+        self.nodes = nodes
+        # Package of the window the dump came from (the launcher, a system dialog, ...)
+        self.package = package
+        self.by_desc: Dict[str, List[UiNode]] = {}
+        self.by_rid: Dict[str, List[UiNode]] = {}
+        self.by_class: Dict[str, List[UiNode]] = {}
+        for n in nodes:
+            if n.desc:
+                self.by_desc.setdefault(n.desc, []).append(n)
+            if n.rid:
+                self.by_rid.setdefault(n.rid, []).append(n)
+            self.by_class.setdefault(n.cls, []).append(n)
+
+    @classmethod
+    def parse(cls, source: str) -> "Snapshot":
+        nodes: List[UiNode] = []
+        packages: List[str] = []
+
+        def start(tag, attrs):
+            if tag != "node":
+                return
+            if not packages:
+                packages.append(attrs.get("package", ""))
+            m = _BOUNDS_RE.match(attrs.get("bounds", ""))
+            bounds = tuple(int(v) for v in m.groups()) if m else (0, 0, 0, 0)
+            nodes.append(UiNode(
+                attrs.get("content-desc", ""),
+                attrs.get("resource-id", ""),
+                attrs.get("text", ""),
+                attrs.get("class", ""),
+                bounds,
+                attrs.get("clickable") == "true",
+                attrs.get("enabled") == "true",
+                attrs.get("scrollable") == "true",
+            ))
+
+        parser = expat.ParserCreate()
+        parser.StartElementHandler = start
+        parser.Parse(source.encode("utf-8") if isinstance(source, str) else source, True)
+        return cls(nodes, packages[0] if packages else "")
+
+    # -------------------------
+    # LOOKUPS
+    # -------------------------
+
+    def find_all(self, by: str, value: str) -> Optional[List[UiNode]]:
+        """
+        All visible, enabled nodes matching the selector, or None when the
+        selector kind is not supported locally (callers should go to the server).
+        """
+        if by == AppiumBy.ACCESSIBILITY_ID:
+            candidates = self.by_desc.get(value, [])
+        elif by == AppiumBy.ID:
+            candidates = self.by_rid.get(value, [])
+        elif by == AppiumBy.CLASS_NAME:
+            candidates = self.by_class.get(value, [])
+        elif by == AppiumBy.ANDROID_UIAUTOMATOR:
+            criteria = parse_uiselector(value)
+            if criteria is None:
+                return None
+            return self._match_uiselector(criteria)
+        else:
+            return None
+        return [n for n in candidates if n.visible and n.enabled]
+
+    def find(self, by: str, value: str) -> Optional[UiNode]:
+        matches = self.find_all(by, value)
+        return matches[0] if matches else None
+
+    def descs_containing(self, needle: str) -> List[UiNode]:
+        return [
+            n for desc, nodes in self.by_desc.items() if needle in desc
+            for n in nodes if n.visible and n.enabled
+        ]
+
+    def _match_uiselector(self, criteria: Dict[str, object]) -> List[UiNode]:
+        instance = criteria.pop("instance", None)
+
+        # Narrow with the cheapest index first
+        if "description" in criteria:
+            candidates = self.by_desc.get(criteria["description"], [])
+        elif "resourceId" in criteria:
+            candidates = self.by_rid.get(criteria["resourceId"], [])
+        elif "className" in criteria:
+            candidates = self.by_class.get(criteria["className"], [])
+        elif "descriptionContains" in criteria:
+            candidates = self.descs_containing(criteria["descriptionContains"])
+        else:
+            candidates = self.nodes
+
+        matches = [
+            n for n in candidates
+            if n.visible and n.enabled and all(_check(n, k, v) for k, v in criteria.items())
+        ]
+        if instance is not None:
+            return matches[instance:instance + 1]
+        return matches
+
+
+def _check(n: UiNode, method: str, arg) -> bool:
+    if method == "description":
+        return n.desc == arg
+    if method == "descriptionContains":
+        return arg in n.desc
+    if method == "descriptionStartsWith":
+        return n.desc.startswith(arg)
+    if method == "resourceId":
+        return n.rid == arg
+    if method == "className":
+        return n.cls == arg
+    if method == "text":
+        return n.text == arg
+    if method == "textContains":
+        return arg in n.text
+    if method == "textStartsWith":
+        return n.text.startswith(arg)
+    if method == "clickable":
+        return n.clickable == arg
+    if method == "enabled":
+        return n.enabled == arg
+    return False
+
+
+def parse_uiselector(expr: str) -> Optional[Dict[str, object]]:
+    """
+    Parse a plain `new UiSelector().a("x").b(1)` chain into {method: arg}.
+    Returns None for anything the local index cannot evaluate (UiScrollable,
+    child selectors, regex matchers, ...).
+    """
+    expr = expr.strip()
+    if not expr.startswith("new UiSelector()"):
+        return None
+    rest = expr[len("new UiSelector()"):].rstrip(";")
+    criteria: Dict[str, object] = {}
+    pos = 0
+    for m in _UISELECTOR_CALL_RE.finditer(rest):
+        if m.start() != pos or m.group(1) not in _UISELECTOR_METHODS:
+            return None
+        method, s, i, b = m.groups()
+        if s is not None:
+            criteria[method] = s.replace('\\"', '"').replace("\\\\", "\\")
+        elif i is not None:
+            criteria[method] = int(i)
+        else:
+            criteria[method] = b == "true"
+        pos = m.end()
+    if pos != len(rest):
+        return None
+    return criteria
+
+
+# =========================
+# DRIVER HELPERS
+# =========================
+
+def take_snapshot(driver) -> Snapshot:
+    return Snapshot.parse(driver.page_source)
+
+
+def tap_at(driver, x: int, y: int, hold_ms: int = 50):
+    finger = PointerInput("touch", "finger")
+    # duration=0: jump straight to the point instead of Selenium's default 250 ms glide
+    actions = ActionBuilder(driver, mouse=finger, duration=0)
+    actions.pointer_action.move_to_location(x, y)
+    actions.pointer_action.pointer_down()
+    actions.pointer_action.pause(hold_ms / 1000)
+    actions.pointer_action.pointer_up()
+    actions.perform()
+
+
+def tap_node(driver, node: UiNode):
+    tap_at(driver, *node.center)
+
+
+def tap_sequence(driver, points, gap_ms: int, hold_ms: int = 50, settle_ms: int = 0):
+    """
+    Tap each (x, y) in order as one W3C actions payload, pausing `gap_ms`
+    between taps so the app can react to one before the next lands, and
+    `settle_ms` after the last. Coordinates come from a snapshot taken
+    before the sequence, so only use this for targets that stay put (a
+    pager's arrow, a back button under a sheet). The caller checks the
+    outcome once at the end.
+    """
+    finger = PointerInput("touch", "finger")
+    actions = ActionBuilder(driver, mouse=finger, duration=0)
+    for i, (x, y) in enumerate(points):
+        if i:
+            actions.pointer_action.pause(gap_ms / 1000)
+        actions.pointer_action.move_to_location(x, y)
+        actions.pointer_action.pointer_down()
+        actions.pointer_action.pause(hold_ms / 1000)
+        actions.pointer_action.pointer_up()
+    if settle_ms:
+        actions.pointer_action.pause(settle_ms / 1000)
+    actions.perform()
+
+
+def tap_repeat(driver, node: UiNode, count: int, gap_ms: int, settle_ms: int = 0):
+    """Tap `node` `count` times in one actions payload (see tap_sequence)."""
+    tap_sequence(driver, [node.center] * count, gap_ms, settle_ms=settle_ms)
+
+
+def scroll_down(driver, snap: Snapshot) -> None:
+    """
+    Scroll the snapshot's innermost scrollable list (the whole screen if it
+    has none) by 60% of its height. The drag is slow enough not to fling,
+    so the same number of steps from the top always lands on the same page.
+    """
+    scrollable = [n for n in snap.nodes if n.scrollable and n.visible]
+    if scrollable:
+        x1, y1, x2, y2 = scrollable[-1].bounds
+    else:
+        x1, y1, x2, y2 = snap.nodes[0].bounds if snap.nodes else (0, 0, 720, 1536)
+    x = (x1 + x2) // 2
+    height = y2 - y1
+    drag(driver, (x, y1 + int(height * 0.8)), (x, y1 + int(height * 0.2)))
+
+
+def drag(driver, start, end, duration_ms: int = 400):
+    """Press at `start`, move to `end` over `duration_ms` and release (list scrolling)."""
+    finger = PointerInput("touch", "finger")
+    actions = ActionBuilder(driver, mouse=finger, duration=duration_ms)
+    actions.pointer_action.move_to_location(*start)
+    actions.pointer_action.pointer_down()
+    actions.pointer_action.move_to_location(*end)
+    actions.pointer_action.pointer_up()
+    actions.perform()
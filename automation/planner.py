@@ -0,0 +1,83 @@
+from __future__ import annotations
+import datetime as dt
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# UI actions per booking, excluding month navigation
+ACTIONS_OPEN_PICKER = 2   # Desk, All day
+ACTIONS_PICK_DAY = 2      # day, Confirm and proceed
+ACTIONS_BUILDING = 1
+ACTIONS_SWIPE = 1
+ACTIONS_RETURN_HOME = 2   # Scrim, back
+FIXED_ACTIONS = ACTIONS_OPEN_PICKER + ACTIONS_PICK_DAY + ACTIONS_BUILDING + ACTIONS_SWIPE + ACTIONS_RETURN_HOME
+
+
+def month_index(date: dt.date) -> int:
+    return date.year * 12 + date.month - 1
+
+
+@dataclass
+class PlannedBooking:
+    date: dt.date
+    building: str
+    # 'Next month' presses from the month the picker opens on
+    month_presses: int = 0
+    actions: int = FIXED_ACTIONS
+
+
+@dataclass
+class BookingPlan:
+    items: List[PlannedBooking] = field(default_factory=list)
+
+    @property
+    def estimated_actions(self) -> int:
+        return sum(i.actions for i in self.items)
+
+    def groups(self) -> List[Dict[str, object]]:
+        """Consecutive items sharing a month and building, in plan order."""
+        out: List[Dict[str, object]] = []
+        for item in self.items:
+            month = f"{item.date:%Y-%m}"
+            if out and out[-1]["month"] == month and out[-1]["building"] == item.building:
+                out[-1]["dates"].append(item.date.isoformat())
+            else:
+                out.append({"month": month, "building": item.building, "dates": [item.date.isoformat()]})
+        return out
+
+    def describe(self) -> str:
+        groups = ", ".join(f"{g['month']} {g['building']} x{len(g['dates'])}" for g in self.groups())
+        presses = sum(i.month_presses for i in self.items)
+        return (
+            f"{len(self.items)} booking(s), ~{self.estimated_actions} UI actions "
+            f"({presses} of them month presses; the picker reopens on the current month "
+            f"for every booking): {groups or 'nothing to book'}"
+        )
+
+
+def plan_bookings(bookings: Iterable[Tuple[str, str]], today: Optional[dt.date] = None) -> BookingPlan:
+    """
+    Order (date, building) requests and estimate the UI actions they take.
+
+    Duplicates are dropped and bookings are grouped by month, then by
+    building, then by date; that is the order the dispatcher queues them
+    in, so the nearest months are booked first and one building's dates
+    follow each other. Each booking starts from the home screen and the
+    date picker reopens on the current month, so every item costs the
+    fixed actions plus one 'Next month' press per month ahead of today;
+    grouping does not change that cost, it is reported so a caller can
+    see a run's size before it starts.
+    """
+    today = today or dt.date.today()
+    requested: List[Tuple[dt.date, str]] = []
+    seen = set()
+    for d, building in bookings:
+        key = (dt.date.fromisoformat(d) if isinstance(d, str) else d, building)
+        if key not in seen:
+            seen.add(key)
+            requested.append(key)
+
+    plan = BookingPlan()
+    for d, building in sorted(requested, key=lambda p: (month_index(p[0]), p[1], p[0])):
+        presses = max(0, month_index(d) - month_index(today))
+        plan.items.append(PlannedBooking(d, building, presses, FIXED_ACTIONS + presses))
+    return plan
@@ -0,0 +1,41 @@
+from __future__ import annotations
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+BOOKED = "booked"
+# Confirmed in the ledger before this run; no UI work was done
+ALREADY_BOOKED = "already_booked"
+FAILED = "failed"
+# Not attempted because the run was cancelled
+CANCELLED = "cancelled"
+
+
+@dataclass
+class BookingResult:
+    date: str
+    status: str
+    building: str = ""
+    duration_s: float = 0.0
+    error: Optional[str] = None
+    # Screen the app was on when the attempt ended (see automation.screens)
+    screen: Optional[str] = None
+    device: Optional[str] = None
+    # Times the date went through the booking stages (0 when no UI work was done)
+    attempts: int = 0
+    # Stage the last attempt failed at (see automation.wework_flow.STAGES)
+    stage: Optional[str] = None
+    # Id of the failure artifact captured for it (see automation.artifacts)
+    artifact: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status in (BOOKED, ALREADY_BOOKED)
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d["duration_s"] = round(self.duration_s, 2)
+        return d
+
+
+# Called once per date as soon as its outcome is known
+ResultCallback = Callable[[BookingResult], None]
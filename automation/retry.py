@@ -0,0 +1,46 @@
+"""
+Bounded retries with exponential backoff and jitter.
+
+Each booking stage (see automation.wework_flow) carries a RetryPolicy. The
+delay before retry n is base_s * factor**(n-1), capped at max_s, with up to
+`jitter` of it randomised. The jitter stops devices sharing one flaky
+backend from retrying in lockstep.
+"""
+from __future__ import annotations
+import random
+import time
+from dataclasses import dataclass
+
+# Slice length for pauses that watch a cancel flag
+_PAUSE_SLICE = 0.1
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    # Total tries, the first one included
+    attempts: int = 3
+    base_s: float = 0.25
+    factor: float = 2.0
+    max_s: float = 4.0
+    # Fraction of each delay that is randomised: 0 = fixed, 1 = anywhere in [0, delay]
+    jitter: float = 0.5
+
+    def delay(self, attempt: int) -> float:
+        """Pause before retry number `attempt` (1 = the first retry)."""
+        d = min(self.max_s, self.base_s * self.factor ** max(0, attempt - 1))
+        return d * (1 - self.jitter * random.random())
+
+
+def pause(seconds: float, cancel_event=None) -> bool:
+    """
+    Sleep `seconds`, waking early if `cancel_event` is set (anything with
+    is_set()). Returns False when cancelled.
+    """
+    deadline = time.monotonic() + seconds
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            return False
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return True
+        time.sleep(min(remaining, _PAUSE_SLICE))
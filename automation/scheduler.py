@@ -0,0 +1,349 @@
+"""
+Booking scheduler: fire a booking the moment the booking window opens.
+
+A schedule (booking intent) names the dates, the building and the wall-clock
+time the window opens. `lead_s` seconds before that time the scheduler
+borrows a device from the dispatcher (automation.dispatcher), brings the
+app home and opens the date picker on the target month. At the fire time
+it only has to tap the day, confirm, pick the building and swipe; the date
+is claimed in the dispatcher meanwhile, so a request for the same desk
+joins the fire rather than booking it on another device. Any further dates
+in the intent go through the dispatcher's queue.
+
+Intents are kept in schedules.json in the state directory, so they survive
+a server restart. Each run records its fire-time jitter, how long the
+pre-warm took and the per-date outcomes. A schedule with `repeat_days` is
+re-armed after each run, e.g. every day at midnight for the date that just
+came into the window ('+14d').
+"""
+from __future__ import annotations
+import datetime as dt
+import json
+import logging
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from automation import tracing
+from automation.buildings import get_building_index
+from automation.calendar import expand_dates
+from automation.dispatcher import get_dispatcher
+from automation.ledger import account_name, get_ledger
+from automation.results import ALREADY_BOOKED, BOOKED, FAILED, BookingResult
+from automation.state import state_dir, write_atomic
+from automation.wework_flow import attempt_date, ensure_app, finish_booking, open_date_picker, return_home
+
+log = logging.getLogger(__name__)
+
+SCHEDULE_FILE = "schedules.json"
+DEFAULT_LEAD_S = 90.0
+# The pre-warmed session is leased until the fire time; stay well inside newCommandTimeout
+MAX_LEAD_S = 240.0
+# A schedule this late (e.g. the server was down at fire time) is marked missed instead of run
+MAX_LATE_S = 15 * 60
+# Runs kept per schedule
+MAX_RUNS = 20
+# Last stretch before the fire time is spun instead of slept, for millisecond accuracy
+SPIN_S = 0.02
+# Finished one-shot schedules are kept this long for their run records
+KEEP_FINISHED_S = 7 * 86400
+
+PENDING = "pending"
+ACTIVE = "active"
+DONE = "done"
+MISSED = "missed"
+REMOVED = "removed"
+
+
+@dataclass
+class Schedule:
+    id: str
+    dates: List[str]
+    building: str
+    # Epoch seconds the booking window opens
+    fire_at: float
+    lead_s: float = DEFAULT_LEAD_S
+    # Re-arm this many days after each run; 0 = one-shot
+    repeat_days: int = 0
+    udid: Optional[str] = None
+    account: Optional[str] = None
+    status: str = PENDING
+    created_at: float = field(default_factory=time.time)
+    runs: List[dict] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d["fire_at_local"] = dt.datetime.fromtimestamp(self.fire_at).isoformat(timespec="seconds")
+        return d
+
+
+def parse_fire_time(text: str) -> float:
+    """ISO datetime to epoch seconds; a time without an offset is local time."""
+    return dt.datetime.fromisoformat(text.strip()).timestamp()
+
+
+def sleep_until(target: float, cancel: Optional[threading.Event] = None) -> bool:
+    """
+    Wait until wall-clock `target` with millisecond accuracy: sleep most of the
+    way, then spin. Returns False if `cancel` was set first.
+    """
+    while True:
+        remaining = target - time.time()
+        if remaining <= SPIN_S:
+            break
+        if cancel is not None:
+            if cancel.wait(remaining - SPIN_S):
+                return False
+        else:
+            time.sleep(remaining - SPIN_S)
+    while time.time() < target:
+        pass
+    return not (cancel is not None and cancel.is_set())
+
+
+class Scheduler:
+    def __init__(self, path: Optional[str] = None, dispatcher=None):
+        self.path = path or str(state_dir() / SCHEDULE_FILE)
+        self._dispatcher = dispatcher
+        self._schedules: Dict[str, Schedule] = {}
+        self._cancels: Dict[str, threading.Event] = {}
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self._load()
+
+    # -------------------------
+    # PUBLIC API
+    # -------------------------
+
+    def start(self) -> "Scheduler":
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="booking-scheduler", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stop = True
+            for ev in self._cancels.values():
+                ev.set()
+            self._cond.notify_all()
+
+    def add(
+        self,
+        dates: List[str],
+        building: str,
+        fire_at: float,
+        lead_s: float = DEFAULT_LEAD_S,
+        repeat_days: int = 0,
+        udid: Optional[str] = None,
+    ) -> Schedule:
+        if not dates:
+            raise ValueError("A schedule needs at least one date")
+        if fire_at < time.time() - MAX_LATE_S and not repeat_days:
+            raise ValueError("Fire time is in the past")
+        # Validate the specs now rather than at fire time
+        expand_dates(dates, building, today=dt.date.fromtimestamp(fire_at), holidays=[])
+        schedule = Schedule(
+            id=uuid.uuid4().hex[:8], dates=list(dates), building=building, fire_at=fire_at,
+            lead_s=max(0.0, min(lead_s, MAX_LEAD_S)), repeat_days=max(0, repeat_days),
+            udid=udid, account=account_name(),
+        )
+        with self._cond:
+            for old in list(self._schedules.values()):
+                if old.status not in (PENDING, ACTIVE) and old.fire_at < time.time() - KEEP_FINISHED_S:
+                    del self._schedules[old.id]
+            self._schedules[schedule.id] = schedule
+            self._save()
+            self._cond.notify_all()
+        return schedule
+
+    def list(self) -> List[Schedule]:
+        with self._cond:
+            return sorted(self._schedules.values(), key=lambda s: s.fire_at)
+
+    def remove(self, schedule_id: str) -> Schedule:
+        with self._cond:
+            schedule = self._schedules.pop(schedule_id, None)
+            if schedule is None:
+                raise KeyError(f"Unknown schedule id '{schedule_id}'")
+            schedule.status = REMOVED
+            ev = self._cancels.get(schedule_id)
+            if ev is not None:
+                # A pre-warmed run stops before it fires
+                ev.set()
+            self._save()
+            self._cond.notify_all()
+        return schedule
+
+    # -------------------------
+    # INTERNALS
+    # -------------------------
+
+    def _loop(self) -> None:
+        with self._cond:
+            while not self._stop:
+                now = time.time()
+                due = None
+                wait = None
+                for s in self._schedules.values():
+                    if s.status != PENDING:
+                        continue
+                    if now > s.fire_at + MAX_LATE_S:
+                        self._missed(s)
+                        # A repeating schedule was re-armed; look again
+                        wait = 0
+                        continue
+                    start_at = s.fire_at - s.lead_s
+                    if start_at <= now:
+                        due = s
+                        break
+                    wait = start_at - now if wait is None else min(wait, start_at - now)
+                if due is not None:
+                    due.status = ACTIVE
+                    self._cancels[due.id] = threading.Event()
+                    self._save()
+                    threading.Thread(
+                        target=self._run, args=(due, self._cancels[due.id]),
+                        name=f"schedule-{due.id}", daemon=True,
+                    ).start()
+                    continue
+                self._cond.wait(wait)
+
+    def _missed(self, s: Schedule) -> None:
+        log.warning("Schedule %s missed its fire time %s", s.id, dt.datetime.fromtimestamp(s.fire_at))
+        s.runs.append({"fire_at": s.fire_at, "status": MISSED})
+        self._rearm(s, MISSED)
+        self._save()
+
+    def _rearm(self, s: Schedule, status: str) -> None:
+        del s.runs[:-MAX_RUNS]
+        if s.repeat_days and s.id in self._schedules:
+            while s.fire_at < time.time():
+                s.fire_at += s.repeat_days * 86400
+            s.status = PENDING
+        else:
+            s.status = status
+
+    def _run(self, s: Schedule, cancel: threading.Event) -> None:
+        run: dict = {"fire_at": s.fire_at}
+        try:
+            with tracing.run():
+                self._prewarm_and_fire(s, cancel, run)
+        except Exception as e:
+            log.exception("Schedule %s failed", s.id)
+            run["error"] = f"{type(e).__name__}: {e}"
+        with self._cond:
+            self._cancels.pop(s.id, None)
+            run.setdefault("status", DONE if "error" not in run else FAILED)
+            s.runs.append(run)
+            self._rearm(s, run["status"])
+            self._save()
+            self._cond.notify_all()
+
+    def _prewarm_and_fire(self, s: Schedule, cancel: threading.Event, run: dict) -> None:
+        fire_day = dt.date.fromtimestamp(s.fire_at)
+        expansion = expand_dates(s.dates, s.building, today=fire_day)
+        if expansion.skipped:
+            run["skipped"] = expansion.skipped
+        account = s.account or account_name()
+        building = get_building_index().canonical(s.building)
+        # Dates booked since the schedule was made need no device at all
+        already = get_ledger().confirmed_dates(account, building, expansion.dates)
+        results: Dict[str, BookingResult] = {d: BookingResult(d, ALREADY_BOOKED, building) for d in already}
+        todo = [d for d in expansion.dates if d not in already]
+        if not todo:
+            run["results"] = [results[d].to_dict() for d in expansion.dates]
+            run["status"] = DONE
+            return
+        first = todo[0]
+        first_date = dt.date.fromisoformat(first)
+        dispatcher = self._dispatcher or get_dispatcher()
+        client = f"schedule-{s.id}"
+
+        t0 = time.monotonic()
+        rest = todo
+        with dispatcher.lease(client, udid=s.udid, purpose=f"schedule {s.id}") as (udid, driver):
+            prewarmed = True
+            with tracing.span("schedule_prewarm", selector=first, schedule=s.id):
+                try:
+                    ensure_app(driver)
+                    open_date_picker(driver, first_date)
+                except Exception as e:
+                    log.warning("Schedule %s pre-warm failed, will book from home: %s", s.id, e)
+                    prewarmed = False
+                    return_home(driver)
+            run["prewarm_s"] = round(time.monotonic() - t0, 3)
+            run["prewarmed"] = prewarmed
+
+            if not sleep_until(s.fire_at, cancel):
+                run["status"] = REMOVED
+                return_home(driver)
+                return
+            fired = time.time()
+            run["fired_at"] = fired
+            run["jitter_ms"] = round((fired - s.fire_at) * 1000, 2)
+            log.info("Schedule %s fired %+.1f ms from target", s.id, run["jitter_ms"])
+
+            if prewarmed:
+                # Other requests for this desk join the fire instead of booking it on another device
+                with dispatcher.claim(first, building, account, udid) as claim:
+                    if claim is not None:
+                        with tracing.span("schedule_fire", selector=first, schedule=s.id, jitter_ms=run["jitter_ms"]):
+                            result, error = attempt_date(driver, first_date, building, account, book=finish_booking)
+                        claim.result = result
+                        building = result.building
+                        if error is not None:
+                            # The day may not have been tappable yet; the queued booking below tries again from home
+                            log.warning("Schedule %s fast path failed for %s: %s", s.id, first, error)
+                        else:
+                            if result.status == BOOKED:
+                                run["first_booked_after_ms"] = round((time.time() - fired) * 1000)
+                            result.device = udid
+                            results[first] = result
+                            rest = todo[1:]
+                return_home(driver)
+        # The rest go through the device queue like any other request
+        if rest and not cancel.is_set():
+            results.update(dispatcher.book(rest, building, client=client, cancel_event=cancel, account=account))
+
+        run["results"] = [results[d].to_dict() for d in expansion.dates if d in results]
+
+    def _save(self) -> None:
+        data = json.dumps([asdict(s) for s in self._schedules.values()], indent=1)
+        try:
+            write_atomic(self.path, data)
+        except OSError as e:
+            log.warning("Could not save schedules: %s", e)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                items = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable schedules %s: %s", self.path, e)
+            return
+        for item in items:
+            s = Schedule(**item)
+            # A run interrupted by a restart is picked up again if still in time
+            if s.status == ACTIVE:
+                s.status = PENDING
+            self._schedules[s.id] = s
+
+
+_scheduler: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    """Process-wide scheduler, started on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler().start()
+        return _scheduler
@@ -0,0 +1,150 @@
+"""
+Screen fingerprinting for the WeWork app.
+
+`detect_screen` classifies a page-source snapshot into one of the screens
+the booking flow passes through, and `step_towards_home` performs the one
+action that moves each screen a step closer to home. Recovery therefore
+costs a back press or two instead of a terminate/activate cold start.
+"""
+from __future__ import annotations
+import re
+
+from appium.webdriver.common.appiumby import AppiumBy
+
+from automation.driver import APP_PACKAGE
+from automation.locator import Snapshot, tap_node, tap_sequence
+
+HOME = "home"
+DESK_SHEET = "desk_sheet"
+DATE_PICKER = "date_picker"
+BUILDING_LIST = "building_list"
+CONFIRMATION = "confirmation"
+BOOKED = "booked"
+BOOKINGS_LIST = "bookings_list"
+BOOKING_DETAIL = "booking_detail"
+CANCEL_DIALOG = "cancel_dialog"
+ERROR_DIALOG = "error_dialog"
+OTHER_APP = "other_app"
+UNKNOWN = "unknown"
+
+# Building cards read like '86\nTwo Horizon Center\n4.6\n5th Floor\n2.51 km'
+BUILDING_CARD_RE = re.compile(r"\n\d+(?:\.\d+)?\s*km$")
+
+_ERROR_RIDS = ("android:id/alertTitle", "android:id/message")
+_ERROR_PHRASES = ("something went wrong", "try again", "no internet")
+_DISMISS_LABELS = ("OK", "Ok", "Okay", "Close", "Dismiss", "Try again", "Retry")
+# Bottom navigation tabs
+HOME_TAB = "Home"
+BOOKINGS_TAB = "Bookings"
+# Bookings list tabs, booking detail and cancel confirmation
+UPCOMING_TAB = "Upcoming"
+PAST_TAB = "Past"
+CANCEL_BOOKING = "Cancel booking"
+CONFIRM_CANCEL = "Yes, cancel"
+# Wording only the booked sheet has ('Desk booked'); other sheets also sit on a Scrim
+_BOOKED_RE = re.compile(r"\bbooked\b", re.IGNORECASE)
+# The booked page's back button, under the confirmation sheet
+_BACK_BUTTON = 'new UiSelector().className("android.widget.Button").instance(0)'
+# Pause between the Scrim tap and the back button tap, for the sheet to close
+DISMISS_GAP_MS = 300
+
+
+def _has_desc(snap: Snapshot, desc: str) -> bool:
+    return snap.find(AppiumBy.ACCESSIBILITY_ID, desc) is not None
+
+
+def _is_error_dialog(snap: Snapshot) -> bool:
+    if any(snap.by_rid.get(rid) for rid in _ERROR_RIDS):
+        return True
+    for n in snap.nodes:
+        label = (n.desc or n.text).lower()
+        if label and len(label) < 120 and any(p in label for p in _ERROR_PHRASES):
+            return True
+    return False
+
+
+def _is_booked(snap: Snapshot) -> bool:
+    if not _has_desc(snap, "Scrim") or _has_desc(snap, "Book a desk"):
+        return False
+    return any(n.visible and _BOOKED_RE.search(n.desc or n.text or "") for n in snap.nodes)
+
+
+def detect_screen(snap: Snapshot) -> str:
+    """
+    Classify a snapshot. Overlays are checked before the screens they sit
+    on, because the page source still contains the covered screen's nodes.
+    """
+    if snap.package and snap.package != APP_PACKAGE:
+        return OTHER_APP
+    if _is_error_dialog(snap):
+        return ERROR_DIALOG
+    if _is_booked(snap):
+        return BOOKED
+    if _has_desc(snap, CONFIRM_CANCEL):
+        return CANCEL_DIALOG
+    if _has_desc(snap, CANCEL_BOOKING):
+        return BOOKING_DETAIL
+    if _has_desc(snap, UPCOMING_TAB) and _has_desc(snap, PAST_TAB):
+        return BOOKINGS_LIST
+    if _has_desc(snap, "Book a desk"):
+        return CONFIRMATION
+    if any(BUILDING_CARD_RE.search(d) for d in snap.by_desc):
+        return BUILDING_LIST
+    if _has_desc(snap, "Next month") or _has_desc(snap, "Confirm and proceed"):
+        return DATE_PICKER
+    if snap.descs_containing("All day"):
+        return DESK_SHEET
+    if _has_desc(snap, "Desk") and _has_desc(snap, "Bookings"):
+        return HOME
+    return UNKNOWN
+
+
+def _dismiss_button(snap: Snapshot):
+    for label in _DISMISS_LABELS:
+        node = snap.find(AppiumBy.ACCESSIBILITY_ID, label)
+        if node is not None:
+            return node
+        for n in snap.nodes:
+            if n.text == label and n.visible and n.enabled:
+                return n
+    return None
+
+
+def step_towards_home(driver, screen: str, snap: Snapshot) -> bool:
+    """
+    Do the single action that moves `screen` one step closer to home.
+    Returns False when there is no known path (caller should relaunch).
+    """
+    if screen == BOOKED:
+        # Same dismissal the flow has always used: close the sheet, then the
+        # page's back button. Both taps go in one actions payload; the walk
+        # checks where they landed.
+        points = [snap.find(AppiumBy.ACCESSIBILITY_ID, "Scrim").center]
+        back = snap.find(AppiumBy.ANDROID_UIAUTOMATOR, _BACK_BUTTON)
+        if back is not None:
+            points.append(back.center)
+        tap_sequence(driver, points, DISMISS_GAP_MS)
+        return True
+    if screen == ERROR_DIALOG:
+        button = _dismiss_button(snap)
+        if button is not None:
+            tap_node(driver, button)
+        else:
+            driver.back()
+        return True
+    if screen == BOOKINGS_LIST:
+        # A tab root: back could leave the app, the Home tab cannot
+        tab = snap.find(AppiumBy.ACCESSIBILITY_ID, HOME_TAB)
+        if tab is not None:
+            tap_node(driver, tab)
+        else:
+            driver.back()
+        return True
+    if screen in (CONFIRMATION, BUILDING_LIST, DATE_PICKER, DESK_SHEET, BOOKING_DETAIL, CANCEL_DIALOG):
+        driver.back()
+        return True
+    if screen == OTHER_APP:
+        driver.activate_app(APP_PACKAGE)
+        return True
+    return False
+
@@ -0,0 +1,199 @@
+from __future__ import annotations
+import atexit
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+from appium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+from automation.devices import DEVICE, get_registry
+from automation.driver import NEW_COMMAND_TIMEOUT, SYSTEM_PORT_BASE, create_driver, get_udid
+
+log = logging.getLogger(__name__)
+
+# Ping idle sessions well before Appium's newCommandTimeout reaps them.
+KEEPALIVE_INTERVAL = NEW_COMMAND_TIMEOUT / 3
+
+
+class _Slot:
+    def __init__(self, udid: str, system_port: int):
+        self.udid = udid
+        self.system_port = system_port
+        self.driver: Optional[webdriver.Remote] = None
+        self.lock = threading.Lock()
+        self.last_used = 0.0
+        # Set when the device leaves adb's `device` state; the session is dropped once unleased
+        self.gone = False
+
+
+class SessionPool:
+    """
+    Keeps one warm Appium session per device and hands it out to callers.
+
+    Sessions are health-checked before every lease, pinged while idle so
+    newCommandTimeout never expires, and rebuilt when they die. A device's
+    session is leased to one caller at a time; other callers block until it
+    is returned. Each device gets its own UiAutomator2 systemPort so
+    sessions on several devices can run side by side.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[..., webdriver.Remote] = create_driver,
+        keepalive_interval: float = KEEPALIVE_INTERVAL,
+    ):
+        self._factory = factory
+        self._keepalive_interval = keepalive_interval
+        self._slots: Dict[str, _Slot] = {}
+        self._slots_lock = threading.Lock()
+        # systemPort per device, kept across reconnects so a flapping device never takes a new one
+        self._ports: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._keepalive_thread: Optional[threading.Thread] = None
+
+    # -------------------------
+    # PUBLIC API
+    # -------------------------
+
+    @contextmanager
+    def session(self, udid: Optional[str] = None) -> Iterator[webdriver.Remote]:
+        """Lease the warm session for `udid` (first connected device by default)."""
+        slot = self._slot(udid or get_udid())
+        with slot.lock:
+            driver = self._ensure_alive(slot)
+            try:
+                yield driver
+            except WebDriverException:
+                # The flow failed inside the driver; drop the session if it died with it
+                if not _is_healthy(driver):
+                    self._discard(slot)
+                raise
+            finally:
+                slot.last_used = time.monotonic()
+                if slot.gone:
+                    self._discard(slot)
+
+    def warm(self, udid: Optional[str] = None) -> None:
+        """Create the session for `udid` ahead of the first tool call."""
+        slot = self._slot(udid or get_udid())
+        with slot.lock:
+            self._ensure_alive(slot)
+            slot.last_used = time.monotonic()
+
+    def close(self) -> None:
+        self._stop.set()
+        with self._slots_lock:
+            slots = list(self._slots.values())
+            self._slots.clear()
+        for slot in slots:
+            with slot.lock:
+                self._discard(slot)
+
+    def device_changed(self, udid: str, old_state: Optional[str], new_state: Optional[str]) -> None:
+        """
+        Registry listener (see automation.devices): forget a device as soon as
+        it disconnects or goes offline. An idle session is quit at once; a
+        leased one when its caller returns it.
+        """
+        if new_state == DEVICE:
+            return
+        with self._slots_lock:
+            slot = self._slots.pop(udid, None)
+        if slot is None:
+            return
+        log.warning("Device %s is %s, dropping its Appium session", udid, new_state or "disconnected")
+        slot.gone = True
+        if slot.lock.acquire(blocking=False):
+            try:
+                self._discard(slot)
+            finally:
+                slot.lock.release()
+
+    # -------------------------
+    # INTERNALS
+    # -------------------------
+
+    def _slot(self, udid: str) -> _Slot:
+        with self._slots_lock:
+            slot = self._slots.get(udid)
+            if slot is None:
+                port = self._ports.get(udid)
+                if port is None:
+                    port = self._ports[udid] = SYSTEM_PORT_BASE + len(self._ports)
+                slot = self._slots[udid] = _Slot(udid, port)
+            self._start_keepalive()
+            return slot
+
+    def _ensure_alive(self, slot: _Slot) -> webdriver.Remote:
+        if slot.gone:
+            raise RuntimeError(f"Device {slot.udid} is no longer connected")
+        if slot.driver is not None and not _is_healthy(slot.driver):
+            log.warning("Appium session for %s is dead, rebuilding", slot.udid)
+            self._discard(slot)
+        if slot.driver is None:
+            slot.driver = self._factory(slot.udid, system_port=slot.system_port)
+        return slot.driver
+
+    def _discard(self, slot: _Slot) -> None:
+        driver, slot.driver = slot.driver, None
+        if driver is None:
+            return
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def _start_keepalive(self) -> None:
+        if self._keepalive_thread is not None:
+            return
+        self._keepalive_thread = threading.Thread(
+            target=self._keepalive_loop, name="appium-keepalive", daemon=True
+        )
+        self._keepalive_thread.start()
+
+    def _keepalive_loop(self) -> None:
+        while not self._stop.wait(self._keepalive_interval / 2):
+            with self._slots_lock:
+                slots = list(self._slots.values())
+            for slot in slots:
+                # Leased sessions are kept alive by the caller's own commands
+                if not slot.lock.acquire(blocking=False):
+                    continue
+                try:
+                    if slot.driver is None:
+                        continue
+                    if time.monotonic() - slot.last_used < self._keepalive_interval:
+                        continue
+                    try:
+                        self._ensure_alive(slot)
+                    except Exception as e:
+                        log.warning("Could not rebuild Appium session for %s: %s", slot.udid, e)
+                    slot.last_used = time.monotonic()
+                finally:
+                    slot.lock.release()
+
+
+def _is_healthy(driver: webdriver.Remote) -> bool:
+    try:
+        driver.current_package
+        return True
+    except WebDriverException:
+        return False
+
+
+_pool: Optional[SessionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SessionPool:
+    """Process-wide session pool shared by all MCP tool calls."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SessionPool()
+            get_registry().add_listener(_pool.device_changed)
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,37 @@
+import contextlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Union
+
+# Override with WEWORK_STATE_DIR to keep learned data somewhere else (e.g. a Docker volume)
+STATE_DIR_ENV = "WEWORK_STATE_DIR"
+DEFAULT_STATE_DIR = Path.home() / ".wework-automation"
+
+
+def state_dir() -> Path:
+    """
+    Directory for data the automation learns and keeps across runs.
+    """
+    path = Path(os.environ.get(STATE_DIR_ENV) or DEFAULT_STATE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def write_atomic(path: Union[str, Path], text: str) -> None:
+    """
+    Replace the file at `path` with `text` in one step, so a reader sees
+    either the old contents or the new ones. Every write goes through its
+    own temp file next to `path`; concurrent writers never move each
+    other's file away, and the last one to finish wins.
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
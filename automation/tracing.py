@@ -0,0 +1,200 @@
+"""
+Structured per-step tracing for the booking flow.
+
+Every instrumented step (wait_click, swipe, create_driver, launch_app,
+select_building, ...) emits one JSON span with its duration, retries,
+selector and outcome. Spans go to a rotating JSONL file in the state
+directory, never to stdout, which is the MCP stdio channel.
+"""
+from __future__ import annotations
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Iterator, List, Optional
+
+from automation.state import state_dir
+
+TRACE_FILE = "trace.jsonl"
+TRACE_MAX_BYTES = 5 * 1024 * 1024
+TRACE_BACKUPS = 3
+# Latest span records kept in memory for failure artifacts (see automation.artifacts)
+RECENT_SPANS = 300
+
+_current_run: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_run", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("trace_span", default=None)
+
+_recent: deque = deque(maxlen=RECENT_SPANS)
+_logger: Optional[logging.Logger] = None
+_logger_lock = threading.Lock()
+
+
+def _trace_logger() -> logging.Logger:
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            logger = logging.getLogger("wework.trace")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = RotatingFileHandler(
+                state_dir() / TRACE_FILE, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUPS, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            _logger = logger
+        return _logger
+
+
+class Span:
+    def __init__(self, step: str, selector: Optional[str], fields: dict):
+        self.step = step
+        self.selector = selector
+        self.fields = fields
+        self.retries = 0
+        self.outcome = "ok"
+        self.error: Optional[str] = None
+
+    def set(self, **fields) -> None:
+        self.fields.update(fields)
+
+
+@contextmanager
+def run(run_id: Optional[str] = None) -> Iterator[str]:
+    """Group the spans emitted inside the block under one run id."""
+    run_id = run_id or uuid.uuid4().hex[:12]
+    token = _current_run.set(run_id)
+    try:
+        yield run_id
+    finally:
+        _current_run.reset(token)
+
+
+def current_run() -> Optional[str]:
+    return _current_run.get()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(step: str, selector: Optional[str] = None, **fields) -> Iterator[Span]:
+    s = Span(step, selector, fields)
+    token = _current_span.set(s)
+    start = time.time()
+    t0 = time.perf_counter()
+    try:
+        yield s
+    except BaseException as e:
+        s.outcome = "error"
+        s.error = f"{type(e).__name__}: {str(e).strip()[:300]}"
+        raise
+    finally:
+        _current_span.reset(token)
+        record = {
+            "ts": start,
+            "run": _current_run.get(),
+            "step": step,
+            "selector": selector,
+            "duration_ms": round((time.perf_counter() - t0) * 1000, 2),
+            "retries": s.retries,
+            "outcome": s.outcome,
+        }
+        if s.error:
+            record["error"] = s.error
+        record.update(s.fields)
+        _recent.append(record)
+        try:
+            _trace_logger().info(json.dumps(record, default=str))
+        except OSError:
+            pass
+
+
+def note_retry() -> None:
+    """Count one extra poll/attempt against the innermost open span."""
+    s = _current_span.get()
+    if s is not None:
+        s.retries += 1
+
+
+# =========================
+# QUERY
+# =========================
+
+def recent_spans(run_id: Optional[str] = None, limit: int = 100) -> List[dict]:
+    """Latest finished spans from memory, oldest first; only `run_id`'s when given."""
+    spans = [r for r in list(_recent) if run_id is None or r.get("run") == run_id]
+    return spans[-limit:]
+
+
+def _read_spans() -> List[dict]:
+    path = state_dir() / TRACE_FILE
+    files = [f"{path}.{i}" for i in range(TRACE_BACKUPS, 0, -1)] + [str(path)]
+    spans = []
+    for f in files:
+        if not os.path.exists(f):
+            continue
+        with open(f, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue
+    return spans
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(last_runs: int = 20) -> Dict[str, object]:
+    """
+    p50/p95/p99 duration, retries and error counts per step over the most
+    recent `last_runs` runs (0 means all). Spans outside a run (e.g. session
+    creation in the pool) are included when they fall inside that window.
+    """
+    spans = _read_spans()
+    runs: List[str] = []
+    first_ts: Dict[str, float] = {}
+    for s in spans:
+        r = s.get("run")
+        if r and r not in first_ts:
+            first_ts[r] = s.get("ts", 0)
+            runs.append(r)
+    if 0 < last_runs < len(runs):
+        recent = set(runs[-last_runs:])
+        # Run-less spans count from the last span of the run before the window
+        before = runs[-last_runs - 1]
+        since = max(s.get("ts", 0) for s in spans if s.get("run") == before)
+    else:
+        recent, since = set(runs), 0.0
+
+    by_step: Dict[str, List[dict]] = {}
+    for s in spans:
+        r = s.get("run")
+        if (r in recent) or (r is None and s.get("ts", 0) >= since):
+            by_step.setdefault(s["step"], []).append(s)
+
+    steps = {}
+    for step, items in sorted(by_step.items()):
+        durations = sorted(i["duration_ms"] for i in items)
+        steps[step] = {
+            "count": len(items),
+            "errors": sum(1 for i in items if i.get("outcome") == "error"),
+            "retries": sum(i.get("retries", 0) for i in items),
+            "p50_ms": round(_percentile(durations, 50), 1),
+            "p95_ms": round(_percentile(durations, 95), 1),
+            "p99_ms": round(_percentile(durations, 99), 1),
+            "total_ms": round(sum(durations), 1),
+        }
+    return {"runs": len(recent), "steps": steps}
@@ -0,0 +1,169 @@
+from __future__ import annotations
+import atexit
+import bisect
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, TypeVar
+
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+)
+
+from automation.state import state_dir, write_atomic
+from automation.tracing import note_retry
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Histogram bucket upper bounds in seconds (roughly log-spaced); the last bucket is open-ended
+BUCKETS = [0.025, 0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 60.0]
+
+# Polling: start fast, back off geometrically, never slower than Selenium's default
+FIRST_POLL = 0.05
+POLL_BACKOFF = 1.5
+MAX_POLL = 0.5
+
+# Learned timeout = p99 * HEADROOM, clamped; until MIN_SAMPLES are seen the caller's default applies
+MIN_SAMPLES = 5
+HEADROOM = 3.0
+MIN_TIMEOUT = 3.0
+MAX_TIMEOUT = 60.0
+
+STATS_FILE = "latency.json"
+
+
+class LatencyHistogram:
+    def __init__(self, counts: Optional[List[int]] = None):
+        self.counts = counts if counts and len(counts) == len(BUCKETS) + 1 else [0] * (len(BUCKETS) + 1)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts)
+
+    def add(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket holding the p-th percentile (p in 0..100)."""
+        total = self.total
+        if not total:
+            return 0.0
+        rank = total * p / 100
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else MAX_TIMEOUT
+        return MAX_TIMEOUT
+
+
+class LatencyStats:
+    """
+    Per-step latency histograms, persisted as JSON so a new process starts
+    with the timeouts learned by earlier runs.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or str(state_dir() / STATS_FILE)
+        self._hists: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def record(self, step: str, seconds: float) -> None:
+        with self._lock:
+            self._hists.setdefault(step, LatencyHistogram()).add(seconds)
+            self._dirty = True
+
+    def timeout_for(self, step: str, default: float) -> float:
+        with self._lock:
+            hist = self._hists.get(step)
+            if hist is None or hist.total < MIN_SAMPLES:
+                return default
+            p99 = hist.percentile(99)
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, p99 * HEADROOM))
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                step: {
+                    "samples": h.total,
+                    "p50": h.percentile(50),
+                    "p99": h.percentile(99),
+                }
+                for step, h in self._hists.items()
+            }
+
+    def flush(self) -> None:
+        # Written under the lock, so an older snapshot never replaces a newer one
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"buckets": BUCKETS, "steps": {k: h.counts for k, h in self._hists.items()}}
+            try:
+                write_atomic(self.path, json.dumps(data))
+                self._dirty = False
+            except OSError as e:
+                log.warning("Could not save latency stats: %s", e)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable latency stats %s: %s", self.path, e)
+            return
+        if data.get("buckets") != BUCKETS:
+            # Bucket layout changed; old counts would land in the wrong buckets
+            return
+        self._hists = {k: LatencyHistogram(v) for k, v in data.get("steps", {}).items()}
+
+
+_stats: Optional[LatencyStats] = None
+_stats_lock = threading.Lock()
+
+
+def get_stats() -> LatencyStats:
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = LatencyStats()
+            atexit.register(_stats.flush)
+        return _stats
+
+
+def adaptive_wait(driver, condition: Callable[..., T], step: str, default_timeout: float) -> T:
+    """
+    Poll `condition(driver)` until it returns something truthy.
+
+    Polls every 50 ms at first and backs off towards 0.5 s. The timeout comes
+    from the step's learned p99 latency once enough samples exist, and from
+    `default_timeout` before that. Timeouts are recorded too, so a step whose
+    learned timeout was too tight widens it on the next run.
+    """
+    stats = get_stats()
+    timeout = stats.timeout_for(step, default_timeout)
+    start = time.monotonic()
+    interval = FIRST_POLL
+    while True:
+        try:
+            value = condition(driver)
+            if value:
+                stats.record(step, time.monotonic() - start)
+                return value
+        except (NoSuchElementException, StaleElementReferenceException):
+            pass
+        elapsed = time.monotonic() - start
+        if elapsed >= timeout:
+            stats.record(step, elapsed)
+            raise TimeoutException(f"'{step}' not ready after {timeout:.1f}s")
+        note_retry()
+        time.sleep(min(interval, timeout - elapsed))
+        interval = min(interval * POLL_BACKOFF, MAX_POLL)
@@ -1,145 +1,514 @@
 from __future__ import annotations
 import calendar
 import datetime as dt
-from typing import List
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
 
-from appium import webdriver
-from appium.options.android import UiAutomator2Options
 from appium.webdriver.common.appiumby import AppiumBy
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
-from selenium.webdriver.common.actions.pointer_input import PointerInput
-from selenium.webdriver.common.actions.action_builder import ActionBuilder
-
-from automation.driver import create_driver
-
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from automation import tracing
+from automation.artifacts import capture_failure
+from automation.availability import get_availability_cache
+from automation.bookings import get_bookings_cache, upcoming_from_home
+from automation.buildings import BuildingNotFound, cards_in, get_building_index, normalize
+from automation.driver import APP_PACKAGE, create_driver
+from automation.gestures import SwipeProfile, perform_swipe, swipe_to_book
+from automation.ledger import CONFIRMED, account_name, get_ledger
+from automation.locator import Snapshot, scroll_down, take_snapshot, tap_node, tap_repeat
+from automation.planner import plan_bookings
+from automation.results import ALREADY_BOOKED, BOOKED, FAILED, BookingResult, ResultCallback
+from automation.retry import RetryPolicy, pause
+from automation.screens import BOOKED as BOOKED_SCREEN
+from automation.screens import (
+    BUILDING_CARD_RE, BUILDING_LIST, CONFIRMATION, DATE_PICKER, DESK_SHEET, ERROR_DIALOG, HOME, OTHER_APP, UNKNOWN,
+    detect_screen, step_towards_home,
+)
+from automation.waits import adaptive_wait, get_stats
+
+log = logging.getLogger(__name__)
 
 # =========================
 # CONFIG
 # =========================
 
-APPIUM_SERVER = "http://127.0.0.1:4723"
-
-UDID = "UORCQC6HEAZHRCN7"
-
-APP_PACKAGE = "in.co.wework.spacecraft"
-APP_ACTIVITY = "in.co.wework.spacecraft.SpacecraftActivity"
+# Seconds after the first pass over the plan during which failed dates are tried again
+RETRY_BUDGET_S = float(os.environ.get("WEWORK_RETRY_BUDGET_S", "180"))
+# Passes through the booking stages one date may get in a run
+DATE_ATTEMPTS = 3
+DATE_RETRY_POLICY = RetryPolicy(attempts=DATE_ATTEMPTS, base_s=1.0)
 
+# Pause between month presses sent as one actions payload: the picker pages
+# to the next month before the next press lands
+MONTH_TAP_GAP_MS = 300
+# How long the check after the presses waits for the picker to show its days
+PICKER_SETTLE_TIMEOUT = 2.0
 
 
 # =========================
 # HELPERS
 # =========================
 
-def wait_click(driver, by, value, timeout=20):
-    el = WebDriverWait(driver, timeout).until(
-        EC.element_to_be_clickable((by, value))
-    )
-    el.click()
+def wait_click(driver, by, value, timeout=20, step=None):
+    # `timeout` only applies until the step has learned its own latency (see automation.waits)
+    with tracing.span("wait_click", selector=value, by=by, label=step):
+        el = adaptive_wait(driver, EC.element_to_be_clickable((by, value)), step or value, timeout)
+        el.click()
     return el
 
-def swipe_left_to_right(driver, by, value, duration=1300, steps=6, end_hold_ms=300):
-    # add wait to ensure element is interactable
-    el = WebDriverWait(driver, 20).until(
-        EC.element_to_be_clickable((by, value))
-    )
+def snap_click(driver, by, value, timeout=20, step=None):
+    """
+    Resolve the selector against one page-source snapshot and tap its bounds.
+    Falls back to the server-side wait_click when the snapshot has no match
+    (unsupported selector, or the screen has not rendered yet).
+    """
+    with tracing.span("snap_click", selector=value, by=by, label=step) as span:
+        node = take_snapshot(driver).find(by, value)
+        if node is not None:
+            tap_node(driver, node)
+            span.set(via="snapshot")
+            return node
+        span.set(via="fallback")
+    return wait_click(driver, by, value, timeout, step=step)
 
-    rect = el.rect
+def swipe_left_to_right(driver, by, value, duration=1300, steps=6, end_hold_ms=300):
+    """Unverified fixed-profile swipe; the booking flow uses automation.gestures.swipe_to_book."""
+    with tracing.span("swipe", selector=value, swipe_ms=duration, steps=steps):
+        # add wait to ensure element is interactable
+        el = adaptive_wait(driver, EC.element_to_be_clickable((by, value)), value, 20)
+        perform_swipe(driver, el.rect, SwipeProfile(duration, steps, end_hold_ms))
 
-    start_x = rect["x"] + int(rect["width"] * 0.05)
 
-    # End slightly BEYOND the right edge (important)
-    end_x = rect["x"] + rect["width"] + 5  # near right edge
+def month_diff(today: dt.date, target: dt.date) -> int:
+    return (target.year - today.year) * 12 + (target.month - today.month)
 
-    y = rect["y"] + rect["height"] // 2               # vertical center
 
-    finger = PointerInput("touch", "finger")
-    actions = ActionBuilder(driver, mouse=finger)
+def date_accessibility_label(date: dt.date) -> str:
+    weekday = calendar.day_name[date.weekday()]
+    month = calendar.month_name[date.month]
+    return f"{date.day}, {weekday}, {month} {date.day}, {date.year}"
 
-    actions.pointer_action.move_to_location(start_x, y)
-    actions.pointer_action.pointer_down()
 
-    step_pause = (duration / steps) / 1000  # ms → seconds
-    delta = (end_x - start_x) / steps
+_DAY_LABEL_RE = re.compile(r"^\d+, \w+, (\w+) \d+, (\d{4})$")
+_MONTH_NUMBERS = {name: i for i, name in enumerate(calendar.month_name) if name}
 
-    current_x = start_x
-    for _ in range(steps):
-        current_x += delta
-        actions.pointer_action.pause(step_pause)
-        actions.pointer_action.move_to_location(int(current_x), y)
 
-    actions.pointer_action.pause(end_hold_ms / 1000)
+def displayed_month(snap: Snapshot) -> Optional[dt.date]:
+    """
+    First day of the month the date picker is showing, read from the day
+    labels in the snapshot (leading/trailing days of adjacent months are
+    outvoted). None when no day labels are on screen.
+    """
+    months = Counter()
+    for desc in snap.by_desc:
+        m = _DAY_LABEL_RE.match(desc)
+        if m and m.group(1) in _MONTH_NUMBERS:
+            months[(int(m.group(2)), _MONTH_NUMBERS[m.group(1)])] += 1
+    if not months:
+        return None
+    year, month = months.most_common(1)[0][0]
+    return dt.date(year, month, 1)
 
-    actions.pointer_action.pointer_up()
-    actions.perform()
 
+def launch_app(driver):
+    with tracing.span("launch_app"):
+        driver.terminate_app(APP_PACKAGE)
+        driver.activate_app(APP_PACKAGE)
 
 
-def month_diff(today: dt.date, target: dt.date) -> int:
-    return (target.year - today.year) * 12 + (target.month - today.month)
+MAX_RECOVERY_STEPS = 6
+# How long to wait for a recovery action to change the screen before acting again
+RECOVERY_SETTLE_TIMEOUT = 3.0
 
 
-def date_accessibility_label(date: dt.date) -> str:
-    weekday = calendar.day_name[date.weekday()]
-    month = calendar.month_name[date.month]
-    return f"{date.day}, {weekday}, {month} {date.day}, {date.year}"
+def _wait_screen_change(driver, previous: str):
+    deadline = time.monotonic() + RECOVERY_SETTLE_TIMEOUT
+    while True:
+        snap = take_snapshot(driver)
+        screen = detect_screen(snap)
+        if screen != previous or time.monotonic() >= deadline:
+            return snap, screen
+        time.sleep(0.1)
 
 
-def launch_app(driver):
-    driver.terminate_app(APP_PACKAGE)
-    driver.activate_app(APP_PACKAGE)
-
-
-def select_building(driver, building_name: str):
-    # Preferred dynamic selector
+def return_home(driver) -> str:
+    """
+    Walk back to the home screen from wherever the app is, one fingerprinted
+    screen at a time (see automation.screens). A terminate/activate cold start
+    is only the last resort, when the screen is unknown or the walk stalls.
+    Returns "home", "navigated" or "relaunched".
+    """
     try:
+        snap = take_snapshot(driver)
+        screen = detect_screen(snap)
+        for step in range(MAX_RECOVERY_STEPS):
+            if screen == HOME:
+                return "home" if step == 0 else "navigated"
+            if not step_towards_home(driver, screen, snap):
+                break
+            snap, screen = _wait_screen_change(driver, screen)
+    except WebDriverException:
+        pass
+    launch_app(driver)
+    return "relaunched"
+
+
+def reconcile_ledger(driver, account: str):
+    """
+    One-pass sync of the ledger with the home screen's UPCOMING BOOKINGS
+    section. Costs a single page-source dump; skipped when the section is
+    not on screen.
+    """
+    entries = upcoming_from_home(take_snapshot(driver))
+    if entries:
+        get_ledger().reconcile(account, [(e.building, e.date.isoformat()) for e in entries])
+
+
+def ensure_app(driver):
+    """
+    Bring a reused session to the app's home screen.
+    Only does the terminate/activate cycle when the app cannot be walked back.
+    Returns how it got there (see return_home).
+    """
+    return return_home(driver)
+
+
+def _centre_list(driver) -> Optional[Snapshot]:
+    snap = take_snapshot(driver)
+    return snap if cards_in(snap) else None
+
+
+def _tap_card(driver, snap: Snapshot, name: str) -> bool:
+    for node in snap.descs_containing(name):
+        if BUILDING_CARD_RE.search(node.desc):
+            tap_node(driver, node)
+            return True
+    return False
+
+
+def select_building(driver, building_name: str) -> str:
+    """
+    Pick the building from the centre list using the cached building index
+    (see automation.buildings). The whole list is only scrolled when the
+    index is stale and the name is not on the first page. A card off the
+    first page is reached by scrolling straight to the page the index
+    recorded for it. Returns the card's name, the centre's canonical name;
+    an unknown name raises BuildingNotFound with suggestions.
+    """
+    with tracing.span("select_building", selector=building_name) as span:
+        index = get_building_index()
+        snap = adaptive_wait(driver, _centre_list, "building list", 30)
+        for card in cards_in(snap):
+            index.add(card)
+
+        if index.lookup(building_name) is None and not index.fresh:
+            index.scan(driver)
+            snap = None
+            span.set(scanned=True)
+        card = index.resolve(building_name)
+        span.set(building=card.name)
+
+        if snap is not None:
+            if _tap_card(driver, snap, card.name):
+                span.set(via="snapshot")
+                return card.name
+            if card.page:
+                # The list is still at the top: scroll to the card's page and look once
+                for _ in range(card.page):
+                    scroll_down(driver, snap)
+                if _tap_card(driver, take_snapshot(driver), card.name):
+                    span.set(via="page", page=card.page)
+                    return card.name
+
+        # Not where the index put it: let UiAutomator scroll it into view
+        span.set(via="scroll")
         wait_click(
             driver,
             AppiumBy.ANDROID_UIAUTOMATOR,
-            f'new UiSelector().descriptionContains("{building_name}")',
-            timeout=30
+            'new UiScrollable(new UiSelector().scrollable(true))'
+            f'.scrollIntoView(new UiSelector().descriptionContains("{card.name}"))',
+            timeout=30,
+            step="building"
         )
-        return
-    except TimeoutException:
-        raise RuntimeError(f"Building '{building_name}' not found")
+        return card.name
 
 
 # =========================
 # CORE FLOW
 # =========================
 
-def book_single_date(driver, target_date: dt.date, building_name: str):
-    today = dt.date.today()
+class StageFailed(RuntimeError):
+    """A booking stage used up its retry policy."""
 
-    # Desk
-    wait_click(driver, AppiumBy.ACCESSIBILITY_ID, "Desk")
+    def __init__(self, stage: str, attempts: int, error: Exception, artifact: Optional[str] = None):
+        self.stage = stage
+        self.attempts = attempts
+        # Failure artifact of the last attempt (see automation.artifacts)
+        self.artifact = artifact
+        super().__init__(f"{stage} failed after {attempts} attempt(s): {type(error).__name__}: {str(error).strip()}")
 
-    # Open date picker (dynamic)
-    wait_click(
-        driver,
-        AppiumBy.ANDROID_UIAUTOMATOR,
-        'new UiSelector().descriptionContains("All day")'
-    )
 
-    # Navigate months
-    diff = month_diff(today.replace(day=1), target_date.replace(day=1))
-    for _ in range(max(0, diff)):
-        wait_click(driver, AppiumBy.ACCESSIBILITY_ID, "Next month")
+def _tap_desk(driver, target_date: dt.date, building_name: str):
+    snap_click(driver, AppiumBy.ACCESSIBILITY_ID, "Desk")
 
-    # Select day
-    day_label = date_accessibility_label(target_date)
-    wait_click(driver, AppiumBy.ACCESSIBILITY_ID, day_label)
 
-    # Confirm date
-    wait_click(driver, AppiumBy.ACCESSIBILITY_ID, "Confirm and proceed")
+def _open_picker(driver, target_date: dt.date, building_name: str):
+    snap_click(
+        driver,
+        AppiumBy.ANDROID_UIAUTOMATOR,
+        'new UiSelector().descriptionContains("All day")',
+        step="All day"
+    )
 
-    # Select building
-    select_building(driver, building_name)
 
-    # Final booking
-    # wait_click(driver, AppiumBy.ACCESSIBILITY_ID, "Book a desk")
-    swipe_left_to_right(driver, AppiumBy.ACCESSIBILITY_ID, "Book a desk")
+def _settled_picker(driver, timeout: float):
+    """(snapshot, month shown) once the date picker shows its days; month is None on timeout."""
+    deadline = time.monotonic() + timeout
+    while True:
+        snap = take_snapshot(driver)
+        shown = displayed_month(snap)
+        if shown is not None or time.monotonic() >= deadline:
+            return snap, shown
+        time.sleep(0.1)
+
+
+def _pick_month(driver, target_date: dt.date, building_name: str):
+    # Navigate from whatever month the picker is showing, so a repeat is a no-op
+    target = target_date.replace(day=1)
+    snap, shown = _settled_picker(driver, PICKER_SETTLE_TIMEOUT)
+    diff = month_diff(shown or dt.date.today().replace(day=1), target)
+    label = "Next month" if diff > 0 else "Previous month"
+    button = snap.find(AppiumBy.ACCESSIBILITY_ID, label) if diff else None
+    if button is not None:
+        # Every press in one actions payload, then a single check of where the picker landed
+        with tracing.span("tap_batch", selector=label, taps=abs(diff)) as span:
+            tap_repeat(driver, button, abs(diff), MONTH_TAP_GAP_MS, settle_ms=MONTH_TAP_GAP_MS)
+            _, landed = _settled_picker(driver, PICKER_SETTLE_TIMEOUT)
+            if landed is None:
+                raise TimeoutException("Date picker did not show a month after paging")
+            diff = month_diff(landed, target)
+            span.set(missed=diff)
+    # Presses the batch lost, or all of them when the arrow was not in the snapshot
+    for _ in range(max(0, diff)):
+        snap_click(driver, AppiumBy.ACCESSIBILITY_ID, "Next month")
+    for _ in range(max(0, -diff)):
+        snap_click(driver, AppiumBy.ACCESSIBILITY_ID, "Previous month")
+
+
+def _pick_day(driver, target_date: dt.date, building_name: str):
+    snap_click(driver, AppiumBy.ACCESSIBILITY_ID, date_accessibility_label(target_date), step="day")
+    snap_click(driver, AppiumBy.ACCESSIBILITY_ID, "Confirm and proceed")
+
+
+def _pick_building(driver, target_date: dt.date, building_name: str) -> str:
+    return select_building(driver, building_name)
+
+
+def _swipe(driver, target_date: dt.date, building_name: str):
+    # Calibrated swipe, verified against the booked sheet
+    swipe_to_book(driver, "Book a desk")
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    # Screen the stage runs from; a retry resumes at the first stage matching the screen the app is on
+    screen: str
+    # May return the building's canonical name (select_building); later stages get that instead
+    run: Callable[[object, dt.date, str], Optional[str]]
+    policy: RetryPolicy
+
+
+TAP_POLICY = RetryPolicy(attempts=3, base_s=0.3)
+BUILDING_POLICY = RetryPolicy(attempts=3, base_s=0.5)
+# swipe_to_book already climbs the gesture ladder; a retry here is for a swipe that never started
+SWIPE_POLICY = RetryPolicy(attempts=2, base_s=0.5)
+
+STAGES = (
+    Stage("desk", HOME, _tap_desk, TAP_POLICY),
+    Stage("date_picker", DESK_SHEET, _open_picker, TAP_POLICY),
+    Stage("month", DATE_PICKER, _pick_month, TAP_POLICY),
+    Stage("day", DATE_PICKER, _pick_day, TAP_POLICY),
+    Stage("building", BUILDING_LIST, _pick_building, BUILDING_POLICY),
+    Stage("swipe", CONFIRMATION, _swipe, SWIPE_POLICY),
+)
+_FIRST_PICKER_STAGE = 3
+_MONTH_STAGE = _FIRST_PICKER_STAGE - 1
+_SWIPE_STAGE = len(STAGES) - 1
+# Errors a retry cannot fix
+PERMANENT_ERRORS = (BuildingNotFound,)
+
+
+def _settled_screen(driver) -> str:
+    """Screen the app is on once any transition has finished rendering."""
+    deadline = time.monotonic() + RECOVERY_SETTLE_TIMEOUT
+    while True:
+        snap = take_snapshot(driver)
+        screen = detect_screen(snap)
+        if screen not in (ERROR_DIALOG, OTHER_APP, UNKNOWN) or time.monotonic() >= deadline:
+            return screen
+        if screen != UNKNOWN:
+            # Clear the overlay and look again
+            step_towards_home(driver, screen, snap)
+        time.sleep(0.1)
+
+
+def _resume_index(driver, reached: int) -> int:
+    """
+    Index of the stage to run next, judged from the screen; len(STAGES)
+    when booked. The booked sheet only counts once this attempt has
+    started the swipe (`reached`: furthest stage started); before that it
+    is some earlier booking's, and the date starts again from home.
+    """
+    screen = _settled_screen(driver)
+    if screen == BOOKED_SCREEN and reached >= _SWIPE_STAGE:
+        return len(STAGES)
+    for i, stage in enumerate(STAGES):
+        if stage.screen == screen:
+            return i
+    return_home(driver)
+    return 0
+
+
+def run_stages(driver, target_date: dt.date, building_name: str, first: int = 0, stop: int = len(STAGES),
+               cancel_event=None):
+    """
+    Run STAGES[first:stop] for one date. A stage that raises is retried under
+    its own policy, resuming at the stage that matches the screen the app
+    actually ended up on: a failed swipe is retried on the confirmation
+    sheet, not from Desk. Raises StageFailed once a stage has used up its
+    attempts, or the first error when cancelled or not retryable. Returns
+    the building name, canonical once the building stage has run.
+    """
+    failures: Dict[str, int] = {}
+    i = first
+    reached = first
+    while i < stop:
+        reached = max(reached, i)
+        stage = STAGES[i]
+        try:
+            with tracing.span("stage", selector=stage.name, attempt=failures.get(stage.name, 0) + 1):
+                resolved = stage.run(driver, target_date, building_name)
+        except Exception as e:
+            n = failures[stage.name] = failures.get(stage.name, 0) + 1
+            final = isinstance(e, PERMANENT_ERRORS) or n >= stage.policy.attempts
+            captured = time.monotonic()
+            # A screenshot is a slow round trip; only a failure nothing retries gets one
+            artifact = capture_failure(
+                driver, e, screenshot=final, date=target_date.isoformat(), building=building_name,
+                stage=stage.name, attempt=n,
+            )
+            if isinstance(e, PERMANENT_ERRORS):
+                raise
+            if n >= stage.policy.attempts:
+                raise StageFailed(stage.name, n, e, artifact) from e
+            tracing.note_retry()
+            log.info("Stage %s failed for %s (attempt %d), retrying: %s", stage.name, target_date, n, str(e).strip())
+            # The capture's round trips count against the backoff
+            if not pause(stage.policy.delay(n) - (time.monotonic() - captured), cancel_event):
+                raise
+            i = _resume_index(driver, reached)
+            if i > stop:
+                raise
+        else:
+            building_name = resolved or building_name
+            i += 1
+    return building_name
+
+
+def open_date_picker(driver, target_date: dt.date, cancel_event=None):
+    """From home: open the desk sheet and the date picker, showing target_date's month."""
+    run_stages(driver, target_date, "", stop=_FIRST_PICKER_STAGE, cancel_event=cancel_event)
+
+
+def finish_booking(driver, target_date: dt.date, building_name: str, cancel_event=None) -> str:
+    """
+    From the date picker on target_date's month: pick the day and building,
+    then swipe to book. Returns the building's canonical name.
+    """
+    return run_stages(driver, target_date, building_name, first=_FIRST_PICKER_STAGE, cancel_event=cancel_event)
+
+
+def book_single_date(driver, target_date: dt.date, building_name: str, cancel_event=None) -> str:
+    return run_stages(driver, target_date, building_name, cancel_event=cancel_event)
+
+
+def check_day(driver, target_date: dt.date, cancel_event=None) -> Optional[Snapshot]:
+    """
+    From the date picker: page to target_date's month and pick the day,
+    stopping on the centre list without booking. Returns the list's first
+    snapshot, or None when the picker shows the day disabled. driver.back()
+    returns to the picker for the next day.
+    """
+    run_stages(driver, target_date, "", first=_MONTH_STAGE, stop=_FIRST_PICKER_STAGE, cancel_event=cancel_event)
+    snap, _ = _settled_picker(driver, PICKER_SETTLE_TIMEOUT)
+    days = snap.by_desc.get(date_accessibility_label(target_date), [])
+    if days and not any(n.enabled for n in days):
+        return None
+    run_stages(driver, target_date, "", first=_FIRST_PICKER_STAGE, stop=_FIRST_PICKER_STAGE + 1,
+               cancel_event=cancel_event)
+    return adaptive_wait(driver, _centre_list, "building list", 30)
+
+
+def _ledger_name(ledger, account: str, given: str, resolved: str, date: str) -> str:
+    """The centre's own name for the ledger; a row written under the name as given is dropped."""
+    if normalize(resolved) != normalize(given):
+        ledger.discard(account, given, date)
+    return resolved
+
+
+def attempt_date(
+    driver,
+    target_date: dt.date,
+    building_name: str,
+    account: str,
+    attempt: int = 1,
+    cancel_event=None,
+    book: Callable[..., str] = book_single_date,
+) -> Tuple[BookingResult, Optional[Exception]]:
+    """
+    One attempt at one date, with its ledger and cache bookkeeping; used by
+    book_desks and the scheduler's fire. A date the ledger holds as
+    confirmed is ALREADY_BOOKED without UI work. Otherwise the attempt is
+    recorded, `book` runs the stages (book_single_date from home,
+    finish_booking from a picker already on the month) and the outcome is
+    recorded under the centre's canonical name (result.building). A
+    booking also drops the date from the availability and bookings
+    caches. Returns the result and, for a failure, its error.
+    """
+    d = target_date.isoformat()
+    ledger = get_ledger()
+    if ledger.status(account, building_name, d) == CONFIRMED:
+        return BookingResult(d, ALREADY_BOOKED, building_name, attempts=attempt - 1), None
+    log.info("Booking desk for %s (attempt %d)", d, attempt)
+    start = time.monotonic()
+    ledger.mark_attempted(account, building_name, d)
+    try:
+        with tracing.span("book_date", selector=d, building=building_name, attempt=attempt):
+            booked_as = book(driver, target_date, building_name, cancel_event=cancel_event)
+    except Exception as e:
+        log.warning("Failed for %s: %s", d, e)
+        name = _ledger_name(ledger, account, building_name, get_building_index().canonical(building_name), d)
+        ledger.mark_failed(account, name, d, str(e))
+        return BookingResult(
+            d, FAILED, name, time.monotonic() - start,
+            error=f"{type(e).__name__}: {str(e).strip()}", screen=_current_screen(driver),
+            attempts=attempt, stage=getattr(e, "stage", None), artifact=getattr(e, "artifact", None),
+        ), e
+    log.info("Booked %s", d)
+    name = _ledger_name(ledger, account, building_name, booked_as, d)
+    ledger.mark_confirmed(account, name, d)
+    # One desk fewer that day, one more booking in the app's list
+    get_availability_cache().forget(d)
+    get_bookings_cache().invalidate()
+    return BookingResult(d, BOOKED, name, time.monotonic() - start, screen=BOOKED_SCREEN, attempts=attempt), None
 
 
 # =========================
@@ -148,30 +517,119 @@ def book_single_date(driver, target_date: dt.date, building_name: str):
 
 def book_desks(
     dates: List[str],
-    building_name: str
-):
-    driver = create_driver()
-
-    try:
-        launch_app(driver)
-
-        for d in dates:
-            try:
-                print(f"📅 Booking desk for {d}")
-                target = dt.date.fromisoformat(d)
-                book_single_date(driver, target, building_name)
-                print(f"✅ Booked {d}")
-
-                # going back to the homepage
-                wait_click(driver, AppiumBy.ACCESSIBILITY_ID, "Scrim")
-                wait_click(driver, AppiumBy.ANDROID_UIAUTOMATOR, "new UiSelector().className(\"android.widget.Button\").instance(0)")
-
-            except Exception as e:
-                print(f"❌ Failed for {d}: {e}")
+    building_name: str,
+    driver=None,
+    cancel_event=None,
+    account=None,
+    on_result: Optional[ResultCallback] = None,
+    retry_budget_s: float = RETRY_BUDGET_S,
+    reconcile: bool = True,
+) -> Dict[str, BookingResult]:
+    """
+    Book each date in turn. Pass a leased `driver` (see automation.session_pool)
+    to reuse a warm session; otherwise a session is created and quit here.
+    Setting `cancel_event` stops the run before the next date starts.
+    Dates are booked in the order chosen by automation.planner. Every attempt
+    is recorded in the booking ledger under the centre's canonical name
+    (BuildingIndex.canonical, then what select_building resolved), and
+    dates it already holds as confirmed are reported as already booked
+    without touching the UI.
+    Each step of a date is retried on its own (see run_stages); a date that
+    still fails goes to the back of the queue and is tried again, up to
+    DATE_ATTEMPTS times, while `retry_budget_s` after the first pass lasts.
+    Each run is traced under one run id (see automation.tracing).
+    `reconcile=False` skips the ledger sync with the home screen, for callers
+    that just did it on the same session.
+    `on_result` is called with each date's BookingResult as soon as its
+    final outcome is known. Returns {date: BookingResult} for every date attempted.
+    """
+    results: Dict[str, BookingResult] = {}
+    account = account or account_name()
+    building = get_building_index().canonical(building_name)
+    plan = plan_bookings((d, building) for d in dates)
+    log.info("Plan: %s", plan.describe())
+    owns_driver = driver is None
+
+    def _report(result: BookingResult) -> None:
+        results[result.date] = result
+        if on_result is not None:
+            on_result(result)
+
+    def _cancelled() -> bool:
+        return cancel_event is not None and cancel_event.is_set()
+
+    with tracing.run() as run_id:
+        log.info("Booking run %s", run_id)
+        if owns_driver:
+            driver = create_driver()
+
+        # Failed dates waiting for another pass, with their latest result
+        retry: Dict[str, BookingResult] = {}
+        try:
+            if owns_driver:
                 launch_app(driver)
+            else:
+                ensure_app(driver)
+            if reconcile:
+                try:
+                    reconcile_ledger(driver, account)
+                except WebDriverException as e:
+                    log.warning("Ledger reconciliation skipped: %s", e)
+
+            queue = list(plan.items)
+            attempts: Dict[str, int] = {}
+            retry_deadline = None
+            while queue:
+                item = queue.pop(0)
+                d = item.date.isoformat()
+                if _cancelled():
+                    log.info("Cancelled before %s", d)
+                    break
+                attempts[d] = attempts.get(d, 0) + 1
+                result, error = attempt_date(driver, item.date, building, account, attempts[d], cancel_event)
+                building = result.building
+                if result.status == ALREADY_BOOKED:
+                    log.info("Already booked %s", d)
+                    retry.pop(d, None)
+                    _report(result)
+                    continue
+                if error is not None and not isinstance(error, PERMANENT_ERRORS) and attempts[d] < DATE_ATTEMPTS:
+                    retry[d] = result
+                else:
+                    retry.pop(d, None)
+                    _report(result)
 
-    finally:
-        driver.quit()
+                # going back to the homepage
+                return_home(driver)
+
+                if not queue and retry:
+                    # End of a pass: go round again for the failed dates while the budget lasts
+                    if retry_deadline is None:
+                        retry_deadline = time.monotonic() + retry_budget_s
+                    if time.monotonic() >= retry_deadline:
+                        log.info("Retry budget used up; %d date(s) left failed", len(retry))
+                        break
+                    if not pause(DATE_RETRY_POLICY.delay(max(attempts[x] for x in retry)), cancel_event):
+                        break
+                    queue = [i for i in plan.items if i.date.isoformat() in retry]
+                    log.info("Retrying %d failed date(s)", len(queue))
+
+        finally:
+            # Dates still waiting for a retry end up failed
+            for result in retry.values():
+                _report(result)
+            get_stats().flush()
+            if owns_driver:
+                driver.quit()
+
+    return results
+
+
+def _current_screen(driver) -> Optional[str]:
+    try:
+        return detect_screen(take_snapshot(driver))
+    except WebDriverException:
+        return None
 
 
 # =========================
@@ -179,6 +637,7 @@ def book_desks(
 # =========================
 
 if __name__ == "__main__":
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
     book_desks(
         dates=[
             # "2026-02-11"
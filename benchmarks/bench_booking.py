@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+End-to-end booking benchmark against the local fake Appium server
+(devtools/fake_appium.py); no phone, Appium or app needed.
+
+Dates are booked through the dispatcher (automation.dispatcher), as the
+MCP tools do. Reports session bootstrap time, time-to-first-booking,
+throughput, per-step wait latency (automation.waits) and Appium commands
+per booking.
+
+Usage:
+  python benchmarks/bench_booking.py --dates 5 --latency 0.02 --render-delay 0.2
+  python benchmarks/bench_booking.py --dates 6 --devices 3 --fault-rate 0.05
+  python benchmarks/bench_booking.py --dates 4 --ahead-days 75
+"""
+import argparse
+import datetime as dt
+import functools
+import os
+import sys
+import tempfile
+import time
+
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+from devtools.fake_appium import FakeAppiumServer, FakeConfig
+
+
+def upcoming_dates(n: int, start: dt.date) -> list:
+    dates, d = [], start
+    while len(dates) < n:
+        d += dt.timedelta(days=1)
+        if d.weekday() != 6:
+            dates.append(d.isoformat())
+    return dates
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dates", type=int, default=5, help="number of dates to book")
+    parser.add_argument("--devices", type=int, default=1, help="fake devices the dispatcher books on")
+    parser.add_argument("--ahead-days", type=int, default=0, help="book from this many days ahead (month paging)")
+    parser.add_argument("--building", default="Two Horizon Center")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per Appium command")
+    parser.add_argument("--render-delay", type=float, default=0.2, help="seconds before a new screen renders")
+    parser.add_argument("--fault-rate", type=float, default=0.0)
+    parser.add_argument("--gesture-time-scale", type=float, default=1.0)
+    parser.add_argument("--session-startup", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # Learned latencies, ledger and caches go to a throwaway dir unless one is given
+    os.environ.setdefault("WEWORK_STATE_DIR", tempfile.mkdtemp(prefix="wework-bench-"))
+
+    from automation.dispatcher import Dispatcher
+    from automation.driver import create_driver
+    from automation.results import BOOKED
+    from automation.session_pool import SessionPool
+    from automation.waits import get_stats
+
+    config = FakeConfig(
+        latency=args.latency, render_delay=args.render_delay, fault_rate=args.fault_rate,
+        gesture_time_scale=args.gesture_time_scale, session_startup=args.session_startup, seed=args.seed,
+    )
+    dates = upcoming_dates(args.dates, dt.date.today() + dt.timedelta(days=args.ahead_days))
+
+    with FakeAppiumServer(config) as fake:
+        pool = SessionPool(factory=functools.partial(create_driver, server_url=fake.url))
+        udids = [f"fake-{i}" for i in range(args.devices)]
+
+        t0 = time.perf_counter()
+        for udid in udids:
+            pool.warm(udid)
+        bootstrap = time.perf_counter() - t0
+
+        # Booking timestamps are recorded relative to the fake server's start
+        run_start = time.monotonic() - fake.started_at
+        t1 = time.perf_counter()
+        results = Dispatcher(pool=pool, udids=udids).book(dates, args.building)
+        total = time.perf_counter() - t1
+        first_booking = min(b["at"] for b in fake.bookings) - run_start if fake.bookings else None
+        pool.close()
+
+    booked = sum(1 for r in results.values() if r.status == BOOKED)
+    commands = sum(fake.command_counts.values())
+    print()
+    print(f"dates requested      {len(dates)} on {args.devices} device(s)")
+    print(f"booked               {booked}/{len(dates)}")
+    print(f"session bootstrap    {bootstrap:8.2f} s")
+    print(f"booking wall time    {total:8.2f} s")
+    if first_booking is not None:
+        print(f"time to 1st booking  {first_booking:8.2f} s")
+    print(f"throughput           {booked / total * 60 if total else 0:8.1f} bookings/min")
+    print(f"commands / booking   {commands / max(booked, 1):8.1f}")
+    print()
+    print(f"{'step':<24}{'samples':>8}{'p50 (s)':>10}{'p99 (s)':>10}")
+    for step, s in sorted(get_stats().snapshot().items()):
+        print(f"{step[:24]:<24}{s['samples']:>8}{s['p50']:>10.3f}{s['p99']:>10.3f}")
+    print()
+    print("commands:", {k: v for k, v in fake.command_counts.items() if v})
+    failed = {d: r.error for d, r in results.items() if r.status != BOOKED}
+    if failed:
+        print("failed:", failed)
+
+
+if __name__ == "__main__":
+    main()
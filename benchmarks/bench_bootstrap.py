@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Compare Appium capability profiles (automation.bootstrap) by time from
+new-session request to the app ready on its home screen.
+
+Runs each profile --runs times, prints the server-side phases of session
+creation (Appium event timings) and recommends the fastest profile that
+worked on every run. --save stores the recommendation for the device, so
+create_driver uses it from then on.
+
+Without --server-url the local fake Appium server is used, with modelled
+startup phases (see devtools/fake_appium.py); --fresh-device starts it with
+the UiAutomator2 server not yet installed.
+
+Usage:
+  python benchmarks/bench_bootstrap.py --runs 3
+  python benchmarks/bench_bootstrap.py --server-url http://127.0.0.1:4723 --udid R58M12345 --save
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+from devtools.fake_appium import FakeAppiumServer, FakeConfig
+
+
+def run_profiles(profiles, runs, udid, server_url):
+    from automation.bootstrap import profile_session
+
+    reports = []
+    # Interleaved so drift on the device (thermal, other apps) hits every profile alike
+    for _ in range(runs):
+        for name in profiles:
+            reports.append(profile_session(name, udid=udid, server_url=server_url))
+    return reports
+
+
+def print_reports(profiles, reports) -> None:
+    print(f"{'profile':<13}{'ok':>6}{'session (s)':>13}{'ready (s)':>11}{'total (s)':>11}   median over runs")
+    for name in profiles:
+        runs = [r for r in reports if r.profile == name]
+        ok = sum(r.ok for r in runs)
+        med = lambda attr: statistics.median(getattr(r, attr) for r in runs)
+        print(f"{name:<13}{f'{ok}/{len(runs)}':>6}{med('session_s'):>13.3f}{med('ready_s'):>11.3f}{med('total_s'):>11.3f}")
+    print()
+    for name in profiles:
+        runs = [r for r in reports if r.profile == name]
+        phases = {}
+        for r in runs:
+            for event, seconds in r.phases:
+                phases.setdefault(event, []).append(seconds)
+        if phases:
+            print(f"{name}: " + ", ".join(f"{e} {statistics.median(v):.3f}s" for e, v in phases.items()))
+        for err in sorted({r.error for r in runs if r.error}):
+            print(f"{name}: failed: {err[:160]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--profiles", default="", help="comma-separated profile names (default: all)")
+    parser.add_argument("--server-url", help="real Appium server; the fake is used when omitted")
+    parser.add_argument("--udid", help="device to profile (default: first attached; 'fake-0' on the fake)")
+    parser.add_argument("--save", action="store_true", help="store the recommendation for the device")
+    # Fake server model
+    parser.add_argument("--session-startup", type=float, default=0.3)
+    parser.add_argument("--server-install", type=float, default=1.2)
+    parser.add_argument("--device-init", type=float, default=0.8)
+    parser.add_argument("--app-launch", type=float, default=0.6)
+    parser.add_argument("--fresh-device", action="store_true", help="fake starts without the UiAutomator2 server")
+    args = parser.parse_args()
+
+    os.environ.setdefault("WEWORK_STATE_DIR", tempfile.mkdtemp(prefix="wework-bench-"))
+
+    from automation.bootstrap import PROFILES, recommend, save_recommendation
+    from automation.driver import get_udid
+
+    profiles = [p for p in args.profiles.split(",") if p] or list(PROFILES)
+    if args.server_url:
+        udid = args.udid or get_udid()
+        reports = run_profiles(profiles, args.runs, udid, args.server_url)
+    else:
+        udid = args.udid or "fake-0"
+        config = FakeConfig(
+            session_startup=args.session_startup, server_install_s=args.server_install,
+            device_init_s=args.device_init, app_launch_s=args.app_launch,
+            server_installed=not args.fresh_device,
+        )
+        with FakeAppiumServer(config) as fake:
+            reports = run_profiles(profiles, args.runs, udid, fake.url)
+
+    print_reports(profiles, reports)
+    best = recommend(reports)
+    print()
+    if best is None:
+        print("no profile worked on every run")
+        return
+    total = statistics.median(r.total_s for r in reports if r.profile == best)
+    print(f"recommended profile for {udid}: {best} ({total:.3f} s to ready)")
+    if args.save:
+        save_recommendation(udid, best, round(total, 3))
+        print(f"saved; create_driver will use '{best}' for {udid}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Several agents booking at once on a small device pool, against the local
+fake Appium server.
+
+Each client asks for its own dates plus some that overlap with the other
+clients, all at the same moment; agent-0 also asks for a long range
+(--heavy). The dispatcher (automation.dispatcher) is compared with each
+client leasing one device for its whole request and booking its dates
+there with book_desks, with no shared queue. The comparison covers wall
+time, booking flows actually run on the devices, and when each client got
+its last result.
+
+Usage:
+  python benchmarks/bench_dispatch.py --clients 4 --devices 2 --dates 2 --shared 1 --heavy 10
+"""
+import argparse
+import datetime as dt
+import functools
+import os
+import sys
+import tempfile
+import threading
+import time
+
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+from devtools.fake_appium import FakeAppiumServer, FakeConfig
+
+
+def working_days(n: int, start: dt.date) -> list:
+    dates, d = [], start
+    while len(dates) < n:
+        d += dt.timedelta(days=1)
+        if d.weekday() != 6:
+            dates.append(d.isoformat())
+    return dates
+
+
+def run_clients(requests, book) -> dict:
+    """Start every client at once; returns client -> seconds to its last result."""
+    finished = {}
+    start = time.perf_counter()
+
+    def _client(name, dates):
+        book(name, dates)
+        finished[name] = time.perf_counter() - start
+
+    threads = [threading.Thread(target=_client, args=item) for item in requests.items()]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return finished
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--devices", type=int, default=2)
+    parser.add_argument("--dates", type=int, default=2, help="dates only this client asks for")
+    parser.add_argument("--shared", type=int, default=1, help="dates every client asks for")
+    parser.add_argument("--heavy", type=int, default=10, help="extra dates agent-0 asks for")
+    parser.add_argument("--building", default="Two Horizon Center")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--render-delay", type=float, default=0.1)
+    parser.add_argument("--gesture-time-scale", type=float, default=0.1)
+    args = parser.parse_args()
+
+    os.environ.setdefault("WEWORK_STATE_DIR", tempfile.mkdtemp(prefix="wework-bench-"))
+    unique = args.clients * args.dates + args.shared + args.heavy
+    # Each mode books its own dates, so the ledger starts empty for both
+    all_days = working_days(2 * unique, dt.date.today())
+
+    for n, mode in enumerate(("independent", "dispatcher")):
+        days = all_days[n * unique:(n + 1) * unique]
+        shared = days[:args.shared]
+        requests = {
+            f"agent-{i}": shared + days[args.shared + i * args.dates: args.shared + (i + 1) * args.dates]
+            for i in range(args.clients)
+        }
+        requests["agent-0"] += days[unique - args.heavy:]
+
+        from automation.dispatcher import Dispatcher
+        from automation.driver import create_driver
+        from automation.session_pool import SessionPool
+        from automation.wework_flow import book_desks
+
+        config = FakeConfig(
+            latency=args.latency, render_delay=args.render_delay, gesture_time_scale=args.gesture_time_scale,
+        )
+        with FakeAppiumServer(config) as fake:
+            pool = SessionPool(factory=functools.partial(create_driver, server_url=fake.url))
+            udids = [f"fake-{i}" for i in range(args.devices)]
+            for udid in udids:
+                pool.warm(udid)
+            if mode == "dispatcher":
+                dispatcher = Dispatcher(pool=pool, udids=udids)
+                book = lambda client, dates: dispatcher.book(dates, args.building, client=client)
+            else:
+                def book(client, dates):
+                    # Clients take devices in order and wait for the lease of one already in use
+                    udid = udids[int(client.split("-")[1]) % len(udids)]
+                    with pool.session(udid) as driver:
+                        book_desks(dates, args.building, driver=driver)
+            t0 = time.perf_counter()
+            finished = run_clients(requests, book)
+            wall = time.perf_counter() - t0
+            flows = len(fake.bookings)
+            pool.close()
+
+        print(f"\n{mode}")
+        print(f"  wall time            {wall:8.2f} s")
+        print(f"  booking flows run    {flows:8d} for {unique} distinct dates")
+        print(f"  client done (s)      " + "  ".join(f"{c}={s:.1f}" for c, s in sorted(finished.items())))
+        if mode == "dispatcher":
+            stats = dispatcher.stats()
+            print(f"  shared requests      {stats['coalesced']:8d}")
+            print(f"  queue wait p50/p95   {stats['wait_s']['p50']:.2f} / {stats['wait_s']['p95']:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
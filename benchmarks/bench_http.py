@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Load test for the MCP server on the streamable HTTP transport: N clients
+connect to one server process at once and each books its own dates (plus
+a few every client asks for) with wework_book_desks, against the local
+fake Appium server.
+
+While the bookings run, a probe client keeps calling wework_queue. Its
+latency shows whether the event loop stays free for other clients while
+the tool threads and device workers are busy. Progress notifications
+received per client are counted too; they are streamed back over SSE.
+
+Usage:
+  python benchmarks/bench_http.py --clients 8 --devices 2 --dates 2 --shared 1
+"""
+import argparse
+import asyncio
+import datetime as dt
+import functools
+import json
+import logging
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+from devtools.fake_appium import FakeAppiumServer, FakeConfig
+
+
+def working_days(n: int, start: dt.date) -> list:
+    dates, d = [], start
+    while len(dates) < n:
+        d += dt.timedelta(days=1)
+        if d.weekday() != 6:
+            dates.append(d.isoformat())
+    return dates
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int):
+    """The MCP server's HTTP app under uvicorn, on a thread of this process."""
+    import uvicorn
+    from app_mcp import server
+
+    server.configure_http("127.0.0.1", port)
+    # Per-request INFO logs from the SDK and httpx would drown the report
+    logging.getLogger().setLevel(logging.WARNING)
+    config = uvicorn.Config(server.mcp.streamable_http_app(), host="127.0.0.1", port=port, log_level="warning")
+    httpd = uvicorn.Server(config)
+    threading.Thread(target=httpd.run, name="mcp-http", daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not httpd.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("MCP server did not start")
+        time.sleep(0.05)
+    return httpd
+
+
+async def run_load(url: str, requests: dict, building: str, probe_interval: float) -> dict:
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    start = time.perf_counter()
+    done = {}
+    progress = {}
+    results = {}
+    probes = []
+    stop = asyncio.Event()
+
+    async def client(name, dates):
+        progress[name] = 0
+
+        async def on_progress(current, total, message):
+            progress[name] += 1
+
+        async with streamablehttp_client(url, sse_read_timeout=600) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                result = await session.call_tool(
+                    "wework_book_desks", {"dates": dates, "building": building},
+                    read_timeout_seconds=dt.timedelta(seconds=600), progress_callback=on_progress,
+                )
+        done[name] = time.perf_counter() - start
+        text = result.content[0].text if result.content else "{}"
+        try:
+            results[name] = json.loads(text)
+        except ValueError:
+            results[name] = {"error": text}
+
+    async def probe():
+        async with streamablehttp_client(url) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                while not stop.is_set():
+                    t0 = time.perf_counter()
+                    await session.call_tool("wework_queue", {})
+                    probes.append(time.perf_counter() - t0)
+                    await asyncio.sleep(probe_interval)
+
+    prober = asyncio.create_task(probe())
+    await asyncio.gather(*(client(name, dates) for name, dates in requests.items()))
+    stop.set()
+    await prober
+    return {
+        "wall": time.perf_counter() - start, "done": done, "progress": progress,
+        "results": results, "probes": probes,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--devices", type=int, default=2)
+    parser.add_argument("--dates", type=int, default=2, help="dates only this client asks for")
+    parser.add_argument("--shared", type=int, default=1, help="dates every client asks for")
+    parser.add_argument("--building", default="Two Horizon Center")
+    parser.add_argument("--probe-interval", type=float, default=0.2)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--render-delay", type=float, default=0.1)
+    parser.add_argument("--gesture-time-scale", type=float, default=0.1)
+    args = parser.parse_args()
+
+    os.environ.setdefault("WEWORK_STATE_DIR", tempfile.mkdtemp(prefix="wework-bench-"))
+    unique = args.clients * args.dates + args.shared
+    days = working_days(unique, dt.date.today())
+    shared = days[:args.shared]
+    requests = {
+        f"agent-{i}": shared + days[args.shared + i * args.dates: args.shared + (i + 1) * args.dates]
+        for i in range(args.clients)
+    }
+
+    from automation import dispatcher
+    from automation.driver import create_driver
+    from automation.session_pool import SessionPool
+
+    config = FakeConfig(latency=args.latency, render_delay=args.render_delay, gesture_time_scale=args.gesture_time_scale)
+    with FakeAppiumServer(config) as fake:
+        pool = SessionPool(factory=functools.partial(create_driver, server_url=fake.url))
+        udids = [f"fake-{i}" for i in range(args.devices)]
+        for udid in udids:
+            pool.warm(udid)
+        # The tools book through the process-wide dispatcher; point it at the fake devices
+        dispatcher._dispatcher = dispatcher.Dispatcher(pool=pool, udids=udids)
+
+        port = free_port()
+        httpd = start_server(port)
+        try:
+            report = asyncio.run(run_load(f"http://127.0.0.1:{port}/mcp", requests, args.building, args.probe_interval))
+        finally:
+            httpd.should_exit = True
+        flows = len(fake.bookings)
+        stats = dispatcher._dispatcher.stats()
+        pool.close()
+
+    booked = sum(
+        1 for r in report["results"].values() for d in r.get("results", []) if d.get("status") in ("booked", "already_booked")
+    )
+    asked = sum(len(d) for d in requests.values())
+    probes = sorted(report["probes"])
+    print(f"clients                 {args.clients} over streamable HTTP, {args.devices} devices")
+    print(f"wall time            {report['wall']:8.2f} s")
+    print(f"dates booked         {booked:8d} of {asked} asked for ({unique} distinct)")
+    print(f"booking flows run    {flows:8d}")
+    print(f"shared requests      {stats['coalesced']:8d}")
+    print(f"progress messages    {sum(report['progress'].values()):8d}")
+    print(f"client done p50/max  {statistics.median(report['done'].values()):8.2f} / {max(report['done'].values()):.2f} s")
+    if probes:
+        p95 = probes[min(len(probes) - 1, int(len(probes) * 0.95))]
+        print(f"probe latency        p50 {statistics.median(probes) * 1000:.1f} ms  p95 {p95 * 1000:.1f} ms  "
+              f"max {probes[-1] * 1000:.1f} ms  ({len(probes)} calls)")
+
+
+if __name__ == "__main__":
+    main()
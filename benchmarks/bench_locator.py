@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark the page-source snapshot locator against the checked-in ui.xml dump.
+
+Usage:
+  python benchmarks/bench_locator.py [--iterations 2000] [--source ui.xml]
+"""
+import argparse
+import os
+import sys
+import time
+
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+from appium.webdriver.common.appiumby import AppiumBy
+from automation.locator import Snapshot
+
+SELECTORS = [
+    (AppiumBy.ACCESSIBILITY_ID, "Desk"),
+    (AppiumBy.ACCESSIBILITY_ID, "Bookings"),
+    (AppiumBy.ACCESSIBILITY_ID, "View Keycard"),
+    (AppiumBy.ID, "android:id/content"),
+    (AppiumBy.ANDROID_UIAUTOMATOR, 'new UiSelector().descriptionContains("Two Horizon Center")'),
+    (AppiumBy.ANDROID_UIAUTOMATOR, 'new UiSelector().className("android.widget.Button").instance(0)'),
+    (AppiumBy.ACCESSIBILITY_ID, "Does not exist"),
+]
+
+
+def _per_op_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--source", default=os.path.join(_project_root, "ui.xml"))
+    args = parser.parse_args()
+
+    with open(args.source, encoding="utf-8") as f:
+        source = f.read()
+
+    parse_us = _per_op_us(lambda: Snapshot.parse(source), args.iterations)
+    snap = Snapshot.parse(source)
+    print(f"source: {args.source} ({len(source)} bytes, {len(snap.nodes)} nodes)")
+    print(f"{'parse':<80} {parse_us:9.1f} us")
+
+    for by, value in SELECTORS:
+        us = _per_op_us(lambda: snap.find(by, value), args.iterations * 10)
+        node = snap.find(by, value)
+        label = f"{by}={value!r}"
+        print(f"{label[:80]:<80} {us:9.2f} us  -> {node.center if node else 'miss'}")
+
+
+if __name__ == "__main__":
+    main()
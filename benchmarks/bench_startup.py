@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Measure MCP server time-to-handshake for each launcher.
+
+Each launcher is started fresh, sent an `initialize` request on stdin and
+timed until the response arrives. Then `tools/list` is timed, and so is a
+first tool call (`wework_trace`), which pays for any automation imports the
+warm-up thread has not finished yet. For reference it also times a plain
+import of the automation stack, the cost the handshake no longer waits on.
+
+The conda launcher is only measured when a conda install is found.
+
+Usage:
+  python benchmarks/bench_startup.py [--runs 5] [--only module,launcher]
+"""
+import argparse
+import json
+import os
+import select
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TIMEOUT = 60.0
+
+
+def launchers():
+    """name -> (command, working directory)"""
+    found = {
+        "module": ([sys.executable, "-m", "app_mcp.server"], _project_root),
+        # Started from another directory, as MCP clients often do
+        "launcher": ([sys.executable, os.path.join(_project_root, "run_mcp_server.py")], tempfile.gettempdir()),
+    }
+    conda_roots = [os.environ.get("CONDA_ROOT"), "~/miniconda3", "~/anaconda3", "~/opt/miniconda3"]
+    if any(r and os.path.isdir(os.path.expanduser(r)) for r in conda_roots) and shutil.which("bash"):
+        found["conda"] = (["bash", os.path.join(_project_root, "run_mcp_server_with_conda.sh")], tempfile.gettempdir())
+    return found
+
+
+def _request(msg_id, method, params=None):
+    msg = {"jsonrpc": "2.0", "id": msg_id, "method": method}
+    if params is not None:
+        msg["params"] = params
+    return (json.dumps(msg) + "\n").encode()
+
+
+def _read_response(proc, msg_id, deadline):
+    buf = b""
+    while time.monotonic() < deadline:
+        ready, _, _ = select.select([proc.stdout], [], [], max(0.0, deadline - time.monotonic()))
+        if not ready:
+            break
+        chunk = os.read(proc.stdout.fileno(), 65536)
+        if not chunk:
+            break
+        buf += chunk
+        while b"\n" in buf:
+            line, buf = buf.split(b"\n", 1)
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            if msg.get("id") == msg_id:
+                return msg
+    raise TimeoutError(f"no response to request {msg_id}")
+
+
+def measure(cmd, cwd, env):
+    """Seconds from spawn to: initialize response, tools/list response, first tool result."""
+    start = time.monotonic()
+    deadline = start + TIMEOUT
+    proc = subprocess.Popen(
+        cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=cwd, env=env,
+    )
+    try:
+        proc.stdin.write(_request(1, "initialize", {
+            "protocolVersion": "2025-03-26",
+            "capabilities": {},
+            "clientInfo": {"name": "bench_startup", "version": "0"},
+        }))
+        proc.stdin.flush()
+        _read_response(proc, 1, deadline)
+        handshake = time.monotonic() - start
+
+        proc.stdin.write(b'{"jsonrpc": "2.0", "method": "notifications/initialized"}\n')
+        proc.stdin.write(_request(2, "tools/list"))
+        proc.stdin.flush()
+        _read_response(proc, 2, deadline)
+        tools = time.monotonic() - start
+
+        proc.stdin.write(_request(3, "tools/call", {"name": "wework_trace", "arguments": {"last_runs": 1}}))
+        proc.stdin.flush()
+        _read_response(proc, 3, deadline)
+        first_call = time.monotonic() - start
+        return handshake, tools, first_call
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def import_time(env):
+    start = time.monotonic()
+    subprocess.run(
+        [sys.executable, "-c", "import app_mcp.tools.wework"],
+        cwd=_project_root, env=env, check=True,
+    )
+    return time.monotonic() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--only", default="", help="comma-separated launcher names")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("WEWORK_STATE_DIR", tempfile.mkdtemp(prefix="wework-bench-"))
+    # Keep the warm-up thread from reaching a real device or Appium
+    env.setdefault("APPIUM_SERVER_URL", "http://127.0.0.1:9")
+
+    selected = launchers()
+    if args.only:
+        wanted = set(args.only.split(","))
+        selected = {k: v for k, v in selected.items() if k in wanted}
+
+    print(f"{'launcher':<10} {'handshake (s)':>14} {'tools/list (s)':>15} {'1st call (s)':>13}   median of {args.runs}, min in ()")
+    for name, (cmd, cwd) in selected.items():
+        samples = [measure(cmd, cwd, env) for _ in range(args.runs)]
+        cols = []
+        for i in range(3):
+            values = [s[i] for s in samples]
+            cols.append(f"{statistics.median(values):.3f} ({min(values):.3f})")
+        print(f"{name:<10} {cols[0]:>14} {cols[1]:>15} {cols[2]:>13}")
+
+    imports = [import_time(env) for _ in range(args.runs)]
+    print(f"\nautomation stack import in a fresh interpreter: {statistics.median(imports):.3f} s "
+          "(deferred out of the handshake)")
+
+
+if __name__ == "__main__":
+    main()
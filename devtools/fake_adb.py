@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the adb server's host services.
+
+Speaks the adb smart-socket protocol (4-hex-digit length prefix, OKAY/FAIL
+status) for `host:version`, `host:devices` and `host:track-devices`, so
+automation.devices can be exercised without adb or a phone. Devices are
+added, removed and switched between states from the test side, and every
+change is pushed to the open track-devices streams like the real server does.
+
+Usage:
+  python -m devtools.fake_adb --port 5037 --device emulator-5554 --device 192.168.1.20:5555:offline
+  ANDROID_ADB_SERVER_PORT=5037 python -m app_mcp.server
+"""
+from __future__ import annotations
+import argparse
+import socket
+import socketserver
+import sys
+import threading
+from typing import Dict, List, Optional
+
+ADB_VERSION = 41
+
+
+class FakeAdbServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, devices: Optional[Dict[str, str]] = None):
+        self.devices: Dict[str, str] = dict(devices or {})
+        self._lock = threading.Lock()
+        self._trackers: List[socket.socket] = []
+        self.requests: List[str] = []
+        self.server = socketserver.ThreadingTCPServer((host, port), _make_handler(self), bind_and_activate=False)
+        self.server.allow_reuse_address = True
+        self.server.daemon_threads = True
+        self.server.server_bind()
+        self.server.server_activate()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self) -> "FakeAdbServer":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-adb", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.drop_clients()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # -------------------------
+    # DEVICE CONTROL
+    # -------------------------
+
+    def set_device(self, serial: str, state: str = "device") -> None:
+        with self._lock:
+            self.devices[serial] = state
+        self._push()
+
+    def remove_device(self, serial: str) -> None:
+        with self._lock:
+            self.devices.pop(serial, None)
+        self._push()
+
+    def drop_clients(self) -> None:
+        """Close every track-devices stream, as an adb server restart would."""
+        with self._lock:
+            trackers, self._trackers = self._trackers, []
+        for sock in trackers:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    # -------------------------
+    # PROTOCOL
+    # -------------------------
+
+    def device_list(self) -> bytes:
+        with self._lock:
+            text = "".join(f"{serial}\t{state}\n" for serial, state in self.devices.items())
+        data = text.encode()
+        return b"%04x" % len(data) + data
+
+    def _push(self) -> None:
+        payload = self.device_list()
+        with self._lock:
+            trackers = list(self._trackers)
+        for sock in trackers:
+            try:
+                sock.sendall(payload)
+            except OSError:
+                with self._lock:
+                    if sock in self._trackers:
+                        self._trackers.remove(sock)
+
+    def handle(self, sock: socket.socket) -> None:
+        try:
+            length = int(_recv_exact(sock, 4), 16)
+            service = _recv_exact(sock, length).decode()
+        except (ConnectionError, ValueError):
+            return
+        self.requests.append(service)
+        if service == "host:version":
+            sock.sendall(b"OKAY" + b"%04x" % 4 + b"%04x" % ADB_VERSION)
+        elif service == "host:devices":
+            sock.sendall(b"OKAY" + self.device_list())
+        elif service == "host:track-devices":
+            sock.sendall(b"OKAY" + self.device_list())
+            with self._lock:
+                self._trackers.append(sock)
+            # Hold the connection open until the client or drop_clients() closes it
+            while sock.recv(1024):
+                pass
+        else:
+            msg = f"unknown host service '{service}'".encode()
+            sock.sendall(b"FAIL" + b"%04x" % len(msg) + msg)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = b""
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("client closed the connection")
+        buf += chunk
+    return buf
+
+
+def _make_handler(server: FakeAdbServer):
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            try:
+                server.handle(self.request)
+            except OSError:
+                pass
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5037)
+    parser.add_argument(
+        "--device", action="append", default=[],
+        help="serial[:state], repeatable; state defaults to 'device'",
+    )
+    args = parser.parse_args()
+
+    devices = {}
+    for spec in args.device:
+        serial, _, state = spec.rpartition(":")
+        if not serial or state not in ("device", "offline", "unauthorized"):
+            serial, state = spec, "device"
+        devices[serial] = state
+    server = FakeAdbServer(args.host, args.port, devices)
+    print(f"Fake adb server listening on {args.host}:{server.port}", file=sys.stderr)
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,813 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for an Appium server driving the WeWork app.
+
+Implements the slice of the W3C WebDriver / Appium protocol that
+automation.wework_flow uses (sessions, element finds by accessibility id /
+UiAutomator / id / class, click, rect, W3C actions, back, page source,
+screenshot and the `mobile:` app commands) on top of a scripted screen graph:
+home (the checked-in ui.xml) -> desk sheet -> date picker -> centre list ->
+confirmation -> booked sheet, and home -> bookings list -> booking detail ->
+cancel dialog.
+
+Per-command latency, delayed screen rendering and random faults can be
+configured so benchmarks and regression runs behave like a slow or flaky
+device without needing one.
+
+Usage:
+  python -m devtools.fake_appium --port 4723 --latency 0.05 --render-delay 0.3
+  APPIUM_SERVER_URL=http://127.0.0.1:4723 python -m automation.wework_flow
+"""
+from __future__ import annotations
+import argparse
+import base64
+import calendar
+import datetime as dt
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from xml.parsers import expat
+
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+from automation.driver import APP_PACKAGE
+from automation.locator import Snapshot
+
+LAUNCHER_PACKAGE = "com.android.launcher3"
+SCREEN_W, SCREEN_H = 720, 1536
+# Scrolling part of the bookings list, and the height of one row
+BOOKINGS_TOP, BOOKINGS_BOTTOM, BOOKING_ROW_H = 260, 1440, 150
+ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+
+DEFAULT_BUILDINGS = [
+    ("Two Horizon Center", "5th Floor", 4.6, 2.51),
+    ("DLF Cyber Hub", "3rd Floor", 4.4, 4.02),
+    ("WeWork Galaxy", "7th Floor", 4.5, 5.3),
+    ("Platina Tower", "2nd Floor", 4.3, 6.75),
+    ("Blue One Square", "9th Floor", 4.7, 8.1),
+    ("Forum DLF", "4th Floor", 4.2, 9.9),
+    ("Vi-John Tower", "6th Floor", 4.1, 11.4),
+    ("Golf Course Road", "1st Floor", 4.0, 12.8),
+]
+
+# 1x1 transparent PNG
+_PNG = base64.b64encode(bytes.fromhex(
+    "89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+    "0000000d49444154789c6360000002000100ffff03000006000557bfabd40000000049454e44ae426082"
+)).decode()
+
+_SCROLL_INTO_VIEW_RE = re.compile(r"scrollIntoView\((new UiSelector\(\).*)\)\s*;?\s*$")
+
+
+@dataclass
+class FakeConfig:
+    # Seconds added to every command, and per-command overrides (see FakeAppiumServer.COMMANDS)
+    latency: float = 0.0
+    command_latency: Dict[str, float] = field(default_factory=dict)
+    # Seconds a new screen takes to show its elements after a transition
+    render_delay: float = 0.0
+    # Probability that a find/click/actions command fails with an unknown error
+    fault_rate: float = 0.0
+    fault_commands: Tuple[str, ...] = ("find", "click", "actions")
+    # Fraction of W3C pause/move durations actually slept (0 = instant gestures)
+    gesture_time_scale: float = 1.0
+    # Swipes on "Book a desk" shorter than this do not book (models a slow device)
+    min_swipe_ms: int = 0
+    # versionName reported by `dumpsys package`
+    app_version: str = "1.0.0"
+    # Seconds POST /session takes (UiAutomator2 bootstrap)
+    session_startup: float = 0.0
+    # Modelled session-start phases on top of session_startup, each skipped by its capability:
+    # server APK install check (skipServerInstallation), device init (skipDeviceInitialization)
+    # and app launch (autoLaunch=false)
+    server_install_s: float = 0.0
+    device_init_s: float = 0.0
+    app_launch_s: float = 0.0
+    # Whether the UiAutomator2 server starts out installed; skipServerInstallation fails until it is
+    server_installed: bool = True
+    # Whether the date picker reopens on the last month it showed
+    picker_remembers_month: bool = False
+    buildings: List[Tuple[str, str, float, float]] = field(default_factory=lambda: list(DEFAULT_BUILDINGS))
+    home_fixture: str = os.path.join(_project_root, "ui.xml")
+    seed: Optional[int] = None
+
+
+def _node(desc="", text="", rid="", cls="android.view.View", bounds=(0, 0, 0, 0),
+          clickable=False, enabled=True, scrollable=False, action=None, **extra) -> dict:
+    return dict(desc=desc, text=text, rid=rid, cls=cls, bounds=tuple(bounds), clickable=clickable,
+                enabled=enabled, scrollable=scrollable, action=action, **extra)
+
+
+def load_fixture(path: str) -> List[dict]:
+    """Flatten a page-source dump into node dicts (nesting is not needed by the flow)."""
+    nodes: List[dict] = []
+
+    def start(tag, attrs):
+        if tag != "node":
+            return
+        b = [int(v) for v in re.findall(r"-?\d+", attrs.get("bounds", "[0,0][0,0]"))]
+        nodes.append(_node(
+            desc=attrs.get("content-desc", ""), text=attrs.get("text", ""),
+            rid=attrs.get("resource-id", ""), cls=attrs.get("class", ""),
+            bounds=b, clickable=attrs.get("clickable") == "true",
+            enabled=attrs.get("enabled") != "false", scrollable=attrs.get("scrollable") == "true",
+        ))
+
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = start
+    with open(path, "rb") as f:
+        parser.ParseFile(f)
+    return nodes
+
+
+def _booking_desc(booking: dict) -> str:
+    d = booking["date"]
+    return f"Desk\n{d:%a}, {d.day} {d:%b}\n{booking['building']}"
+
+
+def _day_label(d: dt.date) -> str:
+    return f"{d.day}, {calendar.day_name[d.weekday()]}, {calendar.month_name[d.month]} {d.day}, {d.year}"
+
+
+class FakeApp:
+    """App state for one session: current screen plus what has been booked."""
+
+    def __init__(self, server: "FakeAppiumServer"):
+        self.server = server
+        self.config = server.config
+        self.lock = threading.RLock()
+        self.running = True
+        self.stack: List[str] = ["home"]
+        self.changed_at = 0.0
+        today = dt.date.today()
+        self.month = today.replace(day=1)
+        self.last_month = self.month
+        self.selected: Optional[dt.date] = None
+        self.building: Optional[str] = None
+        self.scroll = 0
+        # Booking shown on the booking detail screen
+        self.opened: Optional[dict] = None
+
+    @property
+    def screen(self) -> str:
+        return self.stack[-1] if self.running else "launcher"
+
+    def _go(self, screen: str) -> None:
+        self.stack.append(screen)
+        self.changed_at = time.monotonic()
+
+    def _pop(self) -> None:
+        if len(self.stack) > 1:
+            self.stack.pop()
+            self.changed_at = time.monotonic()
+        else:
+            self.running = False
+
+    # -------------------------
+    # RENDERING
+    # -------------------------
+
+    def nodes(self) -> Tuple[str, List[dict]]:
+        """(package, nodes) of what is currently on screen."""
+        if not self.running:
+            return LAUNCHER_PACKAGE, [
+                _node(cls="android.widget.FrameLayout", bounds=(0, 0, SCREEN_W, SCREEN_H)),
+                _node(desc="WeWork", clickable=True, bounds=(40, 1200, 180, 1340), action=("launch",)),
+            ]
+        if time.monotonic() - self.changed_at < self.config.render_delay:
+            return APP_PACKAGE, [
+                _node(cls="android.widget.FrameLayout", bounds=(0, 0, SCREEN_W, SCREEN_H)),
+                _node(cls="android.widget.ProgressBar", bounds=(320, 720, 400, 800)),
+            ]
+        return APP_PACKAGE, getattr(self, f"_render_{self.screen}")()
+
+    def _render_home(self) -> List[dict]:
+        nodes = [dict(n) for n in self.server.home_nodes]
+        for n in nodes:
+            if n["desc"] == "Desk":
+                n["action"] = ("go", "desk_sheet")
+            elif n["desc"] == "Bookings":
+                n["action"] = ("go", "bookings")
+        y = 1141
+        # The home card only has room for the next few bookings
+        for booking in self.server.bookings_for(self)[:5]:
+            nodes.append(_node(
+                desc=_booking_desc(booking),
+                clickable=True, bounds=(0, y, SCREEN_W, y + 60),
+            ))
+            y += 60
+        return nodes
+
+    def _render_desk_sheet(self) -> List[dict]:
+        today = dt.date.today()
+        return self._render_home() + [
+            _node(desc="Desk booking", bounds=(0, 500, SCREEN_W, 560)),
+            _node(desc=f"{today:%a}, {today.day} {today:%b} · All day", clickable=True,
+                  bounds=(40, 600, 680, 680), action=("go", "date_picker")),
+        ]
+
+    def _render_date_picker(self) -> List[dict]:
+        nodes = [
+            _node(cls="android.widget.FrameLayout", bounds=(0, 0, SCREEN_W, SCREEN_H)),
+            _node(desc=f"{calendar.month_name[self.month.month]} {self.month.year}", bounds=(160, 300, 560, 360)),
+            _node(desc="Previous month", clickable=True, bounds=(40, 300, 120, 360), action=("month", -1)),
+            _node(desc="Next month", clickable=True, bounds=(600, 300, 680, 360), action=("month", 1)),
+        ]
+        first_col = self.month.weekday()
+        days = calendar.monthrange(self.month.year, self.month.month)[1]
+        for i in range(days):
+            d = self.month + dt.timedelta(days=i)
+            col, row = (first_col + i) % 7, (first_col + i) // 7
+            x, y = 40 + col * 92, 400 + row * 92
+            nodes.append(_node(desc=_day_label(d), clickable=True, selected=d == self.selected,
+                               enabled=d >= dt.date.today(), bounds=(x, y, x + 88, y + 88),
+                               action=("day", d.isoformat())))
+        nodes.append(_node(desc="Confirm and proceed", clickable=True, enabled=self.selected is not None,
+                           bounds=(40, 1400, 680, 1480), action=("go", "building_list")))
+        return nodes
+
+    def _render_building_list(self) -> List[dict]:
+        top, bottom, card_h = 200, SCREEN_H - 70, 180
+        nodes = [
+            _node(cls="android.widget.FrameLayout", bounds=(0, 0, SCREEN_W, SCREEN_H)),
+            _node(desc="Select a centre", bounds=(40, 100, 680, 180)),
+            _node(cls="android.widget.ScrollView", scrollable=True, bounds=(0, top, SCREEN_W, bottom)),
+        ]
+        for i, desc in enumerate(self.server.card_descs_for(self.selected)):
+            y = top + i * card_h - self.scroll
+            if y + card_h <= top or y >= bottom:
+                continue
+            nodes.append(_node(desc=desc, clickable=True,
+                               bounds=(30, max(y, top), 690, min(y + card_h - 10, bottom)),
+                               action=("building", self.server.config.buildings[i][0])))
+        return nodes
+
+    def _render_confirmation(self) -> List[dict]:
+        return [
+            _node(cls="android.widget.FrameLayout", bounds=(0, 0, SCREEN_W, SCREEN_H)),
+            _node(cls="android.widget.Button", clickable=True, bounds=(20, 60, 100, 140), action=("back",)),
+            _node(desc=f"{self.building}\n{self.selected:%a}, {self.selected.day} {self.selected:%b}",
+                  bounds=(40, 200, 680, 400)),
+            _node(desc="Book a desk", clickable=True, bounds=(40, 1380, 680, 1480), action=("swipe_target",)),
+        ]
+
+    def _render_booked(self) -> List[dict]:
+        return [
+            _node(cls="android.widget.FrameLayout", bounds=(0, 0, SCREEN_W, SCREEN_H)),
+            _node(cls="android.widget.Button", clickable=True, bounds=(20, 60, 100, 140), action=("home",)),
+            _node(desc="Scrim", clickable=True, bounds=(0, 0, SCREEN_W, 900), action=("home",)),
+            _node(desc="Desk booked", bounds=(40, 960, 680, 1040)),
+        ]
+
+    def _render_bookings(self) -> List[dict]:
+        top, bottom, row_h = BOOKINGS_TOP, BOOKINGS_BOTTOM, BOOKING_ROW_H
+        nodes = [
+            _node(cls="android.widget.FrameLayout", bounds=(0, 0, SCREEN_W, SCREEN_H)),
+            _node(desc="Upcoming", clickable=True, selected=True, bounds=(40, 160, 340, 230)),
+            _node(desc="Past", clickable=True, bounds=(380, 160, 680, 230)),
+            _node(cls="android.widget.ScrollView", scrollable=True, bounds=(0, top, SCREEN_W, bottom)),
+        ]
+        for i, booking in enumerate(self.server.bookings_for(self)):
+            y = top + i * row_h - self.scroll
+            if y + row_h <= top or y >= bottom:
+                continue
+            nodes.append(_node(desc=_booking_desc(booking), clickable=True,
+                               bounds=(30, max(y, top), 690, min(y + row_h - 10, bottom)),
+                               action=("open_booking", i)))
+        for i, tab in enumerate(("Home", "Events", "Bookings", "Profile")):
+            x = 30 + i * 165
+            nodes.append(_node(desc=tab, clickable=True, bounds=(x, 1466, x + 165, SCREEN_H),
+                               action=("home",) if tab == "Home" else None))
+        return nodes
+
+    def _render_booking_detail(self) -> List[dict]:
+        return [
+            _node(cls="android.widget.FrameLayout", bounds=(0, 0, SCREEN_W, SCREEN_H)),
+            _node(cls="android.widget.Button", clickable=True, bounds=(20, 60, 100, 140), action=("back",)),
+            _node(desc=_booking_desc(self.opened), bounds=(40, 200, 680, 400)),
+            _node(desc="Cancel booking", clickable=True, bounds=(40, 1300, 680, 1380), action=("go", "cancel_dialog")),
+        ]
+
+    def _render_cancel_dialog(self) -> List[dict]:
+        return self._render_booking_detail() + [
+            _node(desc="Cancel this booking?", bounds=(60, 600, 660, 680)),
+            _node(desc="Keep booking", clickable=True, bounds=(60, 760, 340, 840), action=("back",)),
+            _node(desc="Yes, cancel", clickable=True, bounds=(380, 760, 660, 840), action=("cancel_booking",)),
+        ]
+
+    # -------------------------
+    # INPUT
+    # -------------------------
+
+    def _hit(self, x: int, y: int) -> Optional[dict]:
+        _, nodes = self.nodes()
+        for n in reversed(nodes):
+            x1, y1, x2, y2 = n["bounds"]
+            if n["clickable"] and n["enabled"] and x1 <= x < x2 and y1 <= y < y2:
+                return n
+        return None
+
+    def tap(self, x: int, y: int) -> None:
+        with self.lock:
+            node = self._hit(x, y)
+            if node is None or node["action"] is None:
+                return
+            kind, *args = node["action"]
+            if kind == "go":
+                if args[0] == "date_picker" and not self.config.picker_remembers_month:
+                    self.month = dt.date.today().replace(day=1)
+                elif args[0] == "date_picker":
+                    self.month = self.last_month
+                if args[0] == "date_picker":
+                    self.selected = None
+                if args[0] in ("building_list", "bookings"):
+                    # Lists open at the top
+                    self.scroll = 0
+                self._go(args[0])
+            elif kind == "month":
+                m = self.month.month - 1 + args[0]
+                self.month = dt.date(self.month.year + m // 12, m % 12 + 1, 1)
+                self.last_month = self.month
+                self.changed_at = time.monotonic()
+            elif kind == "day":
+                self.selected = dt.date.fromisoformat(args[0])
+            elif kind == "building":
+                self.building = args[0]
+                self._go("confirmation")
+            elif kind == "back":
+                self._pop()
+            elif kind == "open_booking":
+                self.opened = self.server.bookings_for(self)[args[0]]
+                self._go("booking_detail")
+            elif kind == "cancel_booking":
+                self.server.cancel_booking(self.opened)
+                # Back to the list, without the dialog and the detail page
+                self.stack = self.stack[:-2]
+                self.changed_at = time.monotonic()
+            elif kind == "home":
+                self.stack = ["home"]
+                self.changed_at = time.monotonic()
+            elif kind == "launch":
+                self.activate()
+
+    def swipe(self, start: Tuple[int, int], end: Tuple[int, int], duration_ms: float) -> None:
+        with self.lock:
+            node = self._hit(*start)
+            if node is None:
+                if self.screen in ("building_list", "bookings"):
+                    self.scroll_by(start[1] - end[1])
+                return
+            if node["action"] == ("swipe_target",):
+                x1, _, x2, _ = node["bounds"]
+                far_enough = end[0] >= x1 + (x2 - x1) * 0.9
+                if far_enough and duration_ms >= self.config.min_swipe_ms and self.selected and self.building:
+                    self.server.record_booking(self, self.selected, self.building)
+                    self._go("booked")
+            elif node["scrollable"] or self.screen in ("building_list", "bookings"):
+                self.scroll_by(start[1] - end[1])
+
+    def scroll_by(self, dy: int) -> None:
+        if self.screen == "bookings":
+            rows = len(self.server.bookings_for(self)) * BOOKING_ROW_H
+            max_scroll = max(0, rows - (BOOKINGS_BOTTOM - BOOKINGS_TOP))
+        else:
+            max_scroll = max(0, len(self.server.card_descs) * 180 - (SCREEN_H - 270))
+        self.scroll = min(max_scroll, max(0, self.scroll + dy))
+
+    def back(self) -> None:
+        with self.lock:
+            if self.running:
+                self._pop()
+
+    def terminate(self) -> None:
+        with self.lock:
+            self.running = False
+
+    def activate(self) -> None:
+        with self.lock:
+            if not self.running:
+                self.running = True
+                self.stack = ["home"]
+                self.changed_at = time.monotonic()
+
+    def scroll_into_view(self, selector: str) -> None:
+        """UiScrollable.scrollIntoView: move the centre list so the matching card is on screen."""
+        with self.lock:
+            if self.screen != "building_list":
+                return
+            for i, desc in enumerate(self.server.card_descs_for(self.selected)):
+                snap = Snapshot.parse(render_xml(APP_PACKAGE, [_node(desc=desc, clickable=True, bounds=(0, 0, 1, 1))]))
+                if snap.find_all("-android uiautomator", selector):
+                    self.scroll = 0
+                    self.scroll_by(max(0, i * 180 - 360))
+                    return
+
+
+def render_xml(package: str, nodes: List[dict]) -> str:
+    parts = ["<?xml version='1.0' encoding='UTF-8' standalone='yes' ?><hierarchy rotation=\"0\">"]
+    for i, n in enumerate(nodes):
+        x1, y1, x2, y2 = n["bounds"]
+        parts.append(
+            f'<node index="{i}" text="{escape(n["text"])}" resource-id="{escape(n["rid"])}" '
+            f'class="{n["cls"]}" package="{package}" content-desc="{escape(n["desc"])}" '
+            f'checkable="false" checked="false" clickable="{str(n["clickable"]).lower()}" '
+            f'enabled="{str(n["enabled"]).lower()}" focusable="false" focused="false" '
+            f'scrollable="{str(n["scrollable"]).lower()}" long-clickable="false" password="false" '
+            f'selected="{str(n.get("selected", False)).lower()}" bounds="[{x1},{y1}][{x2},{y2}]" />'
+        )
+    parts.append("</hierarchy>")
+    return "".join(parts).replace("\n", "&#10;")
+
+
+class WebDriverError(Exception):
+    def __init__(self, status: int, error: str, message: str = ""):
+        super().__init__(message)
+        self.status = status
+        self.error = error
+        self.message = message
+
+
+class FakeAppiumServer:
+    COMMANDS = (
+        "new_session", "delete_session", "find", "find_many", "displayed", "enabled", "rect",
+        "click", "actions", "source", "execute", "back", "screenshot", "events", "other",
+    )
+
+    def __init__(self, config: Optional[FakeConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeConfig()
+        self.random = random.Random(self.config.seed)
+        self.home_nodes = load_fixture(self.config.home_fixture)
+        self.card_descs = [
+            f"{self.random.randint(5, 120)}\n{name}\n{rating}\n{floor}\n{km} km"
+            for name, floor, rating, km in self.config.buildings
+        ]
+        self.sessions: Dict[str, FakeApp] = {}
+        self.session_caps: Dict[str, dict] = {}
+        # Per-session event timings (appium:eventTimings), epoch milliseconds
+        self.session_events: Dict[str, Dict[str, list]] = {}
+        self.server_installed = self.config.server_installed
+        self.elements: Dict[str, Tuple[str, dict]] = {}
+        self.bookings: List[dict] = []
+        self.command_counts: Dict[str, int] = {c: 0 for c in self.COMMANDS}
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeAppiumServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-appium", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # -------------------------
+    # STATE
+    # -------------------------
+
+    def record_booking(self, app: FakeApp, date: dt.date, building: str) -> None:
+        with self._lock:
+            udid = next((self.session_caps[s].get("appium:udid") for s, a in self.sessions.items() if a is app), None)
+            self.bookings.append({
+                "date": date, "building": building, "udid": udid,
+                "at": time.monotonic() - self.started_at,
+            })
+
+    def card_descs_for(self, date: Optional[dt.date]) -> List[str]:
+        """Centre cards as listed for `date`: the leading number is the desks still free that day."""
+        if date is None:
+            return self.card_descs
+        descs = []
+        for name, floor, rating, km in self.config.buildings:
+            # Stable per (seed, date, centre), less the desks booked here
+            free = random.Random(f"{self.config.seed}:{date}:{name}").randint(0, 120)
+            with self._lock:
+                free -= sum(
+                    1 for b in self.bookings if b["date"] == date and b["building"] == name and not b.get("cancelled")
+                )
+            descs.append(f"{max(free, 0)}\n{name}\n{rating}\n{floor}\n{km} km")
+        return descs
+
+    def cancel_booking(self, booking: dict) -> None:
+        # Kept in `bookings` (benchmarks count booking flows from it), just no longer listed
+        with self._lock:
+            booking["cancelled"] = True
+
+    def bookings_for(self, app: FakeApp) -> List[dict]:
+        today = dt.date.today()
+        with self._lock:
+            return sorted(
+                (b for b in self.bookings if b["date"] >= today and not b.get("cancelled")),
+                key=lambda b: (b["date"], b["building"]),
+            )
+
+    def _app(self, sid: str) -> FakeApp:
+        app = self.sessions.get(sid)
+        if app is None:
+            raise WebDriverError(404, "invalid session id", f"Session {sid} does not exist")
+        return app
+
+    def _element(self, sid: str, eid: str) -> dict:
+        owner, node = self.elements.get(eid, (None, None))
+        if owner != sid:
+            raise WebDriverError(404, "no such element", f"Element {eid} is unknown")
+        _, current = self._app(sid).nodes()
+        if not any(n["desc"] == node["desc"] and n["bounds"] == node["bounds"] for n in current):
+            raise WebDriverError(404, "stale element reference", f"Element {eid} is no longer on screen")
+        return node
+
+    def _find(self, sid: str, using: str, value: str) -> List[dict]:
+        app = self._app(sid)
+        m = _SCROLL_INTO_VIEW_RE.search(value) if using == "-android uiautomator" else None
+        if m:
+            app.scroll_into_view(m.group(1))
+            value = m.group(1)
+        package, nodes = app.nodes()
+        matches = Snapshot.parse(render_xml(package, nodes)).find_all(using, value)
+        if matches is None:
+            raise WebDriverError(400, "invalid selector", f"Unsupported locator {using}={value}")
+        found = []
+        for m_node in matches:
+            for n in nodes:
+                if n["desc"] == m_node.desc and tuple(n["bounds"]) == m_node.bounds and n["cls"] == m_node.cls:
+                    found.append(n)
+                    break
+        return found
+
+    def _new_element(self, sid: str, node: dict) -> dict:
+        eid = f"el-{next(self._ids)}"
+        self.elements[eid] = (sid, node)
+        return {ELEMENT_KEY: eid, "ELEMENT": eid}
+
+    def _perform_actions(self, app: FakeApp, payload: dict) -> None:
+        for source in payload.get("actions", []):
+            if source.get("type") != "pointer":
+                continue
+            pos, down_at, elapsed, idle = (0, 0), None, 0.0, 0.0
+            for a in source.get("actions", []):
+                kind = a.get("type")
+                if kind == "pointerMove":
+                    pos = (int(a.get("x", 0)), int(a.get("y", 0)))
+                    elapsed += a.get("duration", 0) or 0
+                elif kind == "pause" and down_at is None:
+                    # Pauses between gestures are real time, not scaled: the app
+                    # keeps rendering, and a tap sent too soon hits a loading screen
+                    idle += a.get("duration", 0) or 0
+                elif kind == "pause":
+                    elapsed += a.get("duration", 0) or 0
+                elif kind == "pointerDown":
+                    time.sleep(idle / 1000)
+                    down_at, elapsed, idle = pos, 0.0, 0.0
+                elif kind == "pointerUp" and down_at is not None:
+                    time.sleep(elapsed / 1000 * self.config.gesture_time_scale)
+                    if abs(pos[0] - down_at[0]) < 10 and abs(pos[1] - down_at[1]) < 10:
+                        app.tap(*pos)
+                    else:
+                        app.swipe(down_at, pos, elapsed)
+                    down_at = None
+            time.sleep(idle / 1000)
+
+    # -------------------------
+    # DISPATCH
+    # -------------------------
+
+    def handle(self, method: str, path: str, body: dict):
+        parts = [p for p in path.split("/") if p]
+        if path.rstrip("/") == "/status":
+            return {"ready": True, "message": "fake appium"}
+        if parts == ["session"] and method == "POST":
+            return self._new_session(body)
+        if len(parts) < 2 or parts[0] != "session":
+            raise WebDriverError(404, "unknown command", f"{method} {path}")
+        sid, rest = parts[1], parts[2:]
+        if not rest and method == "DELETE":
+            with self._lock:
+                self.sessions.pop(sid, None)
+                self.session_events.pop(sid, None)
+            return None
+        app = self._app(sid)
+        route = "/".join(rest)
+
+        if route == "element" and method == "POST":
+            found = self._find(sid, body.get("using"), body.get("value"))
+            if not found:
+                raise WebDriverError(404, "no such element", f"{body.get('using')}={body.get('value')}")
+            return self._new_element(sid, found[0])
+        if route == "elements" and method == "POST":
+            return [self._new_element(sid, n) for n in self._find(sid, body.get("using"), body.get("value"))]
+        m = re.fullmatch(r"element/([^/]+)/(displayed|enabled|rect|click|attribute/.+)", route)
+        if m:
+            node = self._element(sid, m.group(1))
+            what = m.group(2)
+            if what == "displayed":
+                return True
+            if what == "enabled":
+                return node["enabled"]
+            x1, y1, x2, y2 = node["bounds"]
+            if what == "rect":
+                return {"x": x1, "y": y1, "width": x2 - x1, "height": y2 - y1}
+            if what == "click":
+                app.tap((x1 + x2) // 2, (y1 + y2) // 2)
+                return None
+            attr = what.split("/", 1)[1]
+            return {"content-desc": node["desc"], "text": node["text"],
+                             "resource-id": node["rid"], "class": node["cls"]}.get(attr)
+        if route == "actions":
+            if method == "POST":
+                self._perform_actions(app, body)
+            return None
+        if route == "source":
+            return render_xml(*app.nodes())
+        if route == "screenshot":
+            return _PNG
+        if route == "back":
+            app.back()
+            return None
+        if route in ("execute/sync", "execute"):
+            return self._execute(app, body.get("script", ""), (body.get("args") or [{}])[0] or {})
+        if route == "timeouts":
+            return None
+        if route == "appium/events" and method == "POST":
+            return {**self.session_events.get(sid, {}), "commands": []}
+        raise WebDriverError(404, "unknown command", f"{method} {path}")
+
+    def _new_session(self, body: dict) -> dict:
+        caps = dict(body.get("capabilities", {}).get("alwaysMatch", {}))
+        events = {"newSessionRequested": [_now_ms()]}
+
+        def _phase(event: str, seconds: float) -> None:
+            time.sleep(seconds)
+            events[event] = [_now_ms()]
+
+        time.sleep(self.config.session_startup)
+        if not caps.get("appium:skipServerInstallation"):
+            _phase("uiautomator2ServerInstalled", self.config.server_install_s)
+            self.server_installed = True
+        elif not self.server_installed:
+            raise WebDriverError(
+                500, "session not created",
+                "The UiAutomator2 server is not installed on the device and skipServerInstallation is set",
+            )
+        if not caps.get("appium:skipDeviceInitialization"):
+            _phase("deviceInitialized", self.config.device_init_s)
+        if caps.get("appium:autoLaunch") is not False:
+            _phase("appLaunched", self.config.app_launch_s)
+        events["newSessionStarted"] = [_now_ms()]
+        sid = uuid.uuid4().hex
+        with self._lock:
+            self.sessions[sid] = FakeApp(self)
+            self.session_caps[sid] = caps
+            self.session_events[sid] = events
+        return {"sessionId": sid, "capabilities": {**caps, "platformName": "Android"}}
+
+    def _execute(self, app: FakeApp, script: str, args: dict):
+        if script == "mobile: getCurrentPackage":
+            return app.nodes()[0]
+        if script == "mobile: terminateApp":
+            app.terminate()
+            return True
+        if script == "mobile: activateApp":
+            app.activate()
+            return None
+        if script == "mobile: queryAppState":
+            return 4 if app.running else 1
+        if script == "mobile: shell":
+            if args.get("command") == "dumpsys" and APP_PACKAGE in (args.get("args") or []):
+                return f"Packages:\n  Package [{APP_PACKAGE}]:\n    versionName={self.config.app_version}\n"
+            return ""
+        raise WebDriverError(404, "unknown method", f"Unsupported script {script}")
+
+    def delay_and_faults(self, command: str) -> None:
+        with self._lock:
+            self.command_counts[command] = self.command_counts.get(command, 0) + 1
+        time.sleep(self.config.command_latency.get(command, self.config.latency))
+        if command in self.config.fault_commands and self.random.random() < self.config.fault_rate:
+            raise WebDriverError(500, "unknown error", f"Injected fault in {command}")
+
+
+_COMMAND_PATTERNS = [
+    ("POST", r"/session/?", "new_session"),
+    ("DELETE", r"/session/[^/]+/?", "delete_session"),
+    ("POST", r"/session/[^/]+/element", "find"),
+    ("POST", r"/session/[^/]+/elements", "find_many"),
+    (None, r"/session/[^/]+/element/[^/]+/displayed", "displayed"),
+    (None, r"/session/[^/]+/element/[^/]+/enabled", "enabled"),
+    (None, r"/session/[^/]+/element/[^/]+/rect", "rect"),
+    (None, r"/session/[^/]+/element/[^/]+/click", "click"),
+    (None, r"/session/[^/]+/actions", "actions"),
+    (None, r"/session/[^/]+/source", "source"),
+    (None, r"/session/[^/]+/execute(/sync)?", "execute"),
+    (None, r"/session/[^/]+/back", "back"),
+    (None, r"/session/[^/]+/screenshot", "screenshot"),
+    (None, r"/session/[^/]+/appium/events", "events"),
+]
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def command_for(method: str, path: str) -> str:
+    """Name used for per-command latency, fault injection and counters."""
+    for m, pattern, name in _COMMAND_PATTERNS:
+        if (m is None or m == method) and re.fullmatch(pattern, path):
+            return name
+    return "other"
+
+
+def _make_handler(server: FakeAppiumServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _dispatch(self, method: str):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            try:
+                body = json.loads(raw) if raw else {}
+                # Faults are injected before the command runs so a failed click never taps
+                server.delay_and_faults(command_for(method, self.path))
+                value = server.handle(method, self.path, body)
+                status, payload = 200, {"value": value}
+            except WebDriverError as e:
+                status, payload = e.status, {"value": {"error": e.error, "message": e.message, "stacktrace": ""}}
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def do_DELETE(self):
+            self._dispatch("DELETE")
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4723)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every command")
+    parser.add_argument("--render-delay", type=float, default=0.0, help="seconds before a new screen shows its elements")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="probability of an injected find/click/actions error")
+    parser.add_argument("--gesture-time-scale", type=float, default=1.0)
+    parser.add_argument("--min-swipe-ms", type=int, default=0)
+    parser.add_argument("--session-startup", type=float, default=0.0)
+    parser.add_argument("--server-install", type=float, default=0.0, help="seconds of server APK checks per session")
+    parser.add_argument("--device-init", type=float, default=0.0, help="seconds of device init per session")
+    parser.add_argument("--app-launch", type=float, default=0.0, help="seconds to launch the app at session start")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        latency=args.latency, render_delay=args.render_delay, fault_rate=args.fault_rate,
+        gesture_time_scale=args.gesture_time_scale, min_swipe_ms=args.min_swipe_ms,
+        session_startup=args.session_startup, server_install_s=args.server_install,
+        device_init_s=args.device_init, app_launch_s=args.app_launch, seed=args.seed,
+    )
+    server = FakeAppiumServer(config, args.host, args.port)
+    print(f"Fake Appium listening on {server.url}", file=sys.stderr)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
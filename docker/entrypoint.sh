@@ -20,5 +20,18 @@ else
     sleep 5
 fi
 
-# Start MCP server (stdio); run as module so app_mcp is on path
-python -m app_mcp.server
+# Start MCP server; run as module so app_mcp is on path.
+# MCP_TRANSPORT=streamable-http (or sse) serves many clients over HTTP on
+# MCP_PORT (default 8000) instead of one client over stdio.
+MCP_TRANSPORT="${MCP_TRANSPORT:-stdio}"
+if [ "$MCP_TRANSPORT" != "stdio" ]; then
+    # Reachable from outside the container only when it is protected; the
+    # server refuses a non-loopback bind without one of these
+    if [ -n "$MCP_ALLOWED_HOSTS" ] || [ -n "$MCP_AUTH_TOKEN" ]; then
+        export MCP_HOST="${MCP_HOST:-0.0.0.0}"
+    else
+        export MCP_HOST="${MCP_HOST:-127.0.0.1}"
+    fi
+    echo "[entrypoint] MCP server on $MCP_TRANSPORT at $MCP_HOST:${MCP_PORT:-8000}" >&2
+fi
+exec python -m app_mcp.server --transport "$MCP_TRANSPORT" "$@"
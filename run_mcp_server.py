@@ -22,6 +22,7 @@ _project_root = os.path.dirname(os.path.abspath(__file__))
 if _project_root not in sys.path:
     sys.path.insert(0, _project_root)
 
-# Run the MCP server module
-import runpy
-runpy.run_path(os.path.join(_project_root, "app_mcp", "server.py"), run_name="__main__")
+# Run the MCP server in this process (no runpy re-execution of server.py)
+from app_mcp.server import main
+
+main()
@@ -6,14 +6,25 @@ set -e
 SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
 cd "$SCRIPT_DIR"
 
+CONDA_ENV="${CONDA_ENV:-wework}"
+
 # Set CONDA_ROOT to your conda install if not in a standard place (e.g. export in your shell or edit below)
 CONDA_ROOT="${CONDA_ROOT:-$HOME/miniconda3}"
 [[ -d "$CONDA_ROOT" ]] || CONDA_ROOT="$HOME/anaconda3"
 [[ -d "$CONDA_ROOT" ]] || CONDA_ROOT="$HOME/opt/miniconda3"
+
+# Fast path: exec the env's python directly. `conda activate` costs a second or
+# more of shell start-up on every launch, which counts against the MCP handshake.
+ENV_PYTHON="$CONDA_ROOT/envs/$CONDA_ENV/bin/python"
+if [[ -x "$ENV_PYTHON" ]]; then
+  export PATH="$CONDA_ROOT/envs/$CONDA_ENV/bin:$PATH"
+  exec "$ENV_PYTHON" -m app_mcp.server
+fi
+
 if [[ ! -f "$CONDA_ROOT/etc/profile.d/conda.sh" ]]; then
   echo "Could not find conda at CONDA_ROOT=$CONDA_ROOT. Set CONDA_ROOT or edit this script." >&2
   exit 1
 fi
 source "$CONDA_ROOT/etc/profile.d/conda.sh"
-conda activate wework
-exec python run_mcp_server.py
+conda activate "$CONDA_ENV"
+exec python -m app_mcp.server
@@ -0,0 +1,33 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+from automation import waits  # noqa: E402
+from automation.state import STATE_DIR_ENV  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def state_dir():
+    """
+    Learned state (ledger, wait stats, caches) goes to a scratch directory
+    instead of ~/.wework-automation, removed once the run is over.
+    """
+    previous = os.environ.get(STATE_DIR_ENV)
+    with tempfile.TemporaryDirectory(prefix="wework-tests-", ignore_cleanup_errors=True) as path:
+        os.environ[STATE_DIR_ENV] = path
+        try:
+            yield path
+        finally:
+            # Save the learned waits now, while the directory still exists, so the atexit flush has nothing left
+            if waits._stats is not None:
+                waits._stats.flush()
+            if previous is None:
+                os.environ.pop(STATE_DIR_ENV, None)
+            else:
+                os.environ[STATE_DIR_ENV] = previous
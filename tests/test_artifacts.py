@@ -0,0 +1,66 @@
+import base64
+import os
+import time
+
+import pytest
+
+from automation.artifacts import ArtifactStore, screenshot_bytes
+
+
+class ScreenDriver:
+    """Just the two calls a capture makes, counted."""
+
+    def __init__(self, source_bytes=200):
+        self.source_bytes = source_bytes
+        self.sources = 0
+        self.screenshots = 0
+
+    @property
+    def page_source(self):
+        self.sources += 1
+        # Random, so gzip cannot shrink the artifacts below the ring size
+        return base64.b64encode(os.urandom(self.source_bytes)).decode()
+
+    def get_screenshot_as_base64(self):
+        self.screenshots += 1
+        return base64.b64encode(b"\x89PNG fake").decode()
+
+
+def test_screenshot_only_when_asked(tmp_path):
+    store = ArtifactStore(root=tmp_path)
+    driver = ScreenDriver()
+    retried = store.capture(driver, ValueError("retried"), screenshot=False, stage="building")
+    final = store.capture(driver, ValueError("final"), stage="building")
+    store.flush()
+
+    assert (driver.sources, driver.screenshots) == (2, 1)
+    assert screenshot_bytes(store.load(retried)) is None
+    assert screenshot_bytes(store.load(final)) == b"\x89PNG fake"
+    metas = {m["id"]: m for m in store.list()}
+    assert metas[final]["has_screenshot"] and not metas[retried]["has_screenshot"]
+    assert metas[final]["stage"] == "building"
+
+
+def test_ring_keeps_the_newest_within_its_size(tmp_path):
+    store = ArtifactStore(root=tmp_path, max_bytes=100_000)
+    driver = ScreenDriver(source_bytes=20_000)
+    ids = []
+    for i in range(10):
+        ids.append(store.capture(driver, RuntimeError(f"failure {i}")))
+        store.flush()
+        # Ids sort by capture time to the millisecond
+        time.sleep(0.002)
+
+    kept = [m["id"] for m in store.list(limit=100)]
+    assert sum(p.stat().st_size for p in tmp_path.iterdir()) <= 100_000
+    assert 0 < len(kept) < len(ids)
+    assert kept == ids[::-1][:len(kept)]
+    with pytest.raises(KeyError):
+        store.load(ids[0])
+
+
+def test_capture_off(tmp_path):
+    store = ArtifactStore(root=tmp_path, max_bytes=0)
+    driver = ScreenDriver()
+    assert store.capture(driver, RuntimeError("ignored")) is None
+    assert driver.sources == 0
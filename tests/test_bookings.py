@@ -0,0 +1,115 @@
+import datetime as dt
+
+import pytest
+
+from automation import bookings as bookings_module
+from automation import ledger as ledger_module
+from automation.bookings import (
+    BookingNotFound, BookingsCache, CancelAborted, cancel_booking, entries_in, parse_date, parse_entry, read_bookings,
+)
+from automation.driver import create_driver
+from automation.ledger import CANCELLED, Ledger, account_name
+from automation.locator import Snapshot, UiNode
+from devtools.fake_appium import FakeApp, FakeAppiumServer, FakeConfig
+
+TODAY = dt.date(2026, 12, 20)
+BUILDING = "Two Horizon Center"
+
+
+def node(desc, bounds=(30, 300, 690, 440)):
+    return UiNode(desc, "", "", "android.view.View", bounds, True, True, False)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2027-01-04", dt.date(2027, 1, 4)),
+    ("Mon, 4 Jan", dt.date(2027, 1, 4)),
+    ("Mon, Dec 21", dt.date(2026, 12, 21)),
+    ("21 Dec 2027", dt.date(2027, 12, 21)),
+    ("30 Feb", None),
+    ("Desk", None),
+])
+def test_parse_date(text, expected):
+    # Year-less dates in an upcoming list roll over to next year
+    assert parse_date(text, TODAY) == expected
+
+
+def test_parse_entry_skips_noise_lines():
+    entry = parse_entry(node("Desk\nTue, 22 Dec\nTwo Horizon Center"), TODAY, page=3)
+    assert (entry.date, entry.building, entry.page) == (dt.date(2026, 12, 22), BUILDING, 3)
+    assert parse_entry(node("Tue, 22 Dec"), TODAY) is None
+    assert parse_entry(node("Desk\nTue, 22 Dec"), TODAY) is None
+
+
+def test_entries_in_ignores_hidden_rows():
+    snap = Snapshot([
+        node("Desk\nTue, 22 Dec\nTwo Horizon Center"),
+        node("Desk\nWed, 23 Dec\nTwo Horizon Center", bounds=(30, 1440, 690, 1440)),
+        node("Bookings"),
+    ])
+    assert [e.date for e in entries_in(snap, TODAY)] == [dt.date(2026, 12, 22)]
+
+
+def working_days(n, ahead=1):
+    day, days = dt.date.today() + dt.timedelta(days=ahead), []
+    while len(days) < n:
+        if day.weekday() != 6:
+            days.append(day)
+        day += dt.timedelta(days=1)
+    return days
+
+
+@pytest.fixture
+def booked(tmp_path, monkeypatch):
+    """A fake with 20 upcoming bookings and a fresh bookings cache and ledger."""
+    monkeypatch.setattr(bookings_module, "_cache", BookingsCache())
+    monkeypatch.setattr(ledger_module, "_ledger", Ledger(str(tmp_path / "ledger.sqlite3")))
+    with FakeAppiumServer(FakeConfig(latency=0.002, render_delay=0.01)) as fake:
+        days = working_days(20)
+        for day in days:
+            fake.record_booking(None, day, BUILDING)
+        driver = create_driver("fake-0", server_url=fake.url, system_port=8300)
+        try:
+            yield fake, driver, days
+        finally:
+            driver.quit()
+
+
+def test_read_bookings_is_complete_only_at_the_end_of_the_list(booked, monkeypatch):
+    _, driver, days = booked
+    monkeypatch.setattr(bookings_module, "MAX_LIST_PAGES", 2)
+    cache = read_bookings(driver)
+    assert not cache.complete
+    assert cache.read_through is not None and cache.read_through < days[-1]
+
+    monkeypatch.setattr(bookings_module, "MAX_LIST_PAGES", 30)
+    cache = read_bookings(driver)
+    assert cache.complete
+    assert [e.date for e in cache.between(None, None)] == days
+
+
+def test_cancel_booking(booked):
+    fake, driver, days = booked
+    entry = cancel_booking(driver, days[15], BUILDING)
+
+    assert entry.date == days[15] and entry.page > 0
+    assert [b["date"] for b in fake.bookings if b.get("cancelled")] == [days[15]]
+    assert ledger_module.get_ledger().status(account_name(), BUILDING, days[15].isoformat()) == CANCELLED
+    with pytest.raises(BookingNotFound):
+        cancel_booking(driver, days[15], BUILDING)
+
+
+def test_cancel_aborts_on_another_bookings_page(booked, monkeypatch):
+    fake, driver, days = booked
+    real_render = FakeApp._render_booking_detail
+
+    def wrong_detail(app):
+        # The row tapped opens some other booking
+        app.opened = next(b for b in fake.bookings if b["date"] != app.opened["date"])
+        return real_render(app)
+
+    monkeypatch.setattr(FakeApp, "_render_booking_detail", wrong_detail)
+    with pytest.raises(CancelAborted):
+        cancel_booking(driver, days[3], BUILDING)
+
+    assert not any(b.get("cancelled") for b in fake.bookings)
+    assert all(app.stack[-1] != "cancel_dialog" for app in fake.sessions.values())
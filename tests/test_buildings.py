@@ -0,0 +1,119 @@
+import datetime as dt
+import json
+
+import pytest
+
+from automation import buildings
+from automation.buildings import BuildingCard, BuildingIndex, BuildingNotFound, aliases, normalize, parse_card
+from automation.driver import create_driver
+from automation.locator import take_snapshot
+from automation.screens import CONFIRMATION, detect_screen
+from automation.wework_flow import check_day, open_date_picker, return_home, select_building
+from devtools.fake_appium import FakeAppiumServer, FakeConfig
+
+# More centres than fit on one screen of the list
+CENTRES = [(f"Centre {i}", "1st Floor", 4.0, float(i)) for i in range(1, 25)]
+
+
+def index_of(tmp_path, *names):
+    index = BuildingIndex(str(tmp_path / "buildings.json"))
+    for page, name in enumerate(names):
+        index.add(BuildingCard(name=name, desc=name, page=page))
+    return index
+
+
+def test_parse_card():
+    card = parse_card("86\nTwo Horizon Center\n4.6\n5th Floor\n2.51 km", page=2)
+    assert (card.name, card.available, card.rating, card.floor, card.distance_km, card.page) == (
+        "Two Horizon Center", 86, 4.6, "5th Floor", 2.51, 2,
+    )
+    # Not a centre card: no distance line
+    assert parse_card("Two Horizon Center\n5th Floor") is None
+
+
+def test_aliases():
+    assert normalize("Two-Horizon  Centre") == "two horizon center"
+    assert sorted(aliases("WeWork Two Horizon Centre")) == ["two horizon", "wework two horizon center"]
+
+
+def test_lookup_is_exact_or_a_unique_part(tmp_path):
+    index = index_of(tmp_path, "Two Horizon Center", "DLF Cyber Hub", "Forum DLF")
+    assert index.lookup("two horizon centre").name == "Two Horizon Center"
+    assert index.lookup("Cyber").name == "DLF Cyber Hub"
+    # Part of two buildings' names
+    assert index.lookup("DLF") is None
+
+
+def test_near_misses_are_only_suggested(tmp_path):
+    index = index_of(tmp_path, "Two Horizon Center", "DLF Cyber Hub")
+    assert index.lookup("One Horizon Center") is None
+    with pytest.raises(BuildingNotFound) as e:
+        index.resolve("One Horizon Center")
+    assert e.value.suggestions[0] == "Two Horizon Center"
+
+
+def test_canonical_uses_only_exact_aliases_while_stale(tmp_path):
+    index = index_of(tmp_path, "Two Horizon Center")
+    assert not index.fresh
+    assert index.canonical("two horizon") == "Two Horizon Center"
+    assert index.canonical("Horizon") == "Horizon"
+    index.complete, index.built_at = True, 1e12
+    assert index.canonical("Horizon") == "Two Horizon Center"
+
+
+def test_saved_index_is_loaded(tmp_path):
+    index = index_of(tmp_path, "Two Horizon Center", "DLF Cyber Hub")
+    index.save()
+    loaded = BuildingIndex(index.path)
+    assert loaded.lookup("cyber hub").page == 1
+
+
+def test_index_from_another_version_is_discarded(tmp_path):
+    path = tmp_path / "buildings.json"
+    path.write_text(json.dumps({"built_at": 1e12, "complete": True, "cards": [{"title": "Two Horizon Center"}]}))
+    index = BuildingIndex(str(path))
+    assert not index.fresh and index.cards == {}
+
+
+@pytest.fixture
+def on_centre_list(tmp_path, monkeypatch):
+    monkeypatch.setattr(buildings, "_index", BuildingIndex(str(tmp_path / "buildings.json")))
+    with FakeAppiumServer(FakeConfig(buildings=CENTRES)) as fake:
+        driver = create_driver("fake-0", server_url=fake.url)
+        day = dt.date.today() + dt.timedelta(days=3)
+        if day.weekday() == 6:
+            day += dt.timedelta(days=1)
+        try:
+            return_home(driver)
+            open_date_picker(driver, day)
+            assert check_day(driver, day) is not None
+            yield fake, driver
+        finally:
+            driver.quit()
+
+
+def test_scan_records_every_card_and_its_page(on_centre_list):
+    fake, driver = on_centre_list
+    index = buildings.get_building_index()
+    index.scan(driver)
+    assert index.fresh
+    assert sorted(index.cards) == sorted(name for name, *_ in CENTRES)
+    assert index.cards["Centre 1"].page == 0
+    assert index.cards["Centre 24"].page > 0
+
+
+def test_select_building_scrolls_straight_to_the_recorded_page(on_centre_list):
+    fake, driver = on_centre_list
+    index = buildings.get_building_index()
+    index.scan(driver)
+    # Back at the top of the list, as the flow finds it
+    driver.back()
+    day = dt.date.today() + dt.timedelta(days=3)
+    if day.weekday() == 6:
+        day += dt.timedelta(days=1)
+    check_day(driver, day)
+    finds = fake.command_counts["find"]
+    assert select_building(driver, "centre 23") == "Centre 23"
+    # No UiScrollable search on the server
+    assert fake.command_counts["find"] == finds
+    assert detect_screen(take_snapshot(driver)) == CONFIRMATION
@@ -0,0 +1,76 @@
+import datetime as dt
+
+import pytest
+
+from automation.calendar import HOLIDAY, NON_WORKING, OUTSIDE_WINDOW, PAST, expand_dates
+
+# A Monday
+TODAY = dt.date(2026, 3, 2)
+
+
+def expand(*specs, **kwargs):
+    kwargs.setdefault("holidays", [])
+    return expand_dates(specs, today=TODAY, **kwargs)
+
+
+def test_single_day():
+    assert expand("2026-03-03").dates == ["2026-03-03"]
+
+
+def test_range_drops_sundays():
+    result = expand("2026-03-02..2026-03-08")
+    assert result.dates == ["2026-03-02", "2026-03-03", "2026-03-04", "2026-03-05", "2026-03-06", "2026-03-07"]
+    assert result.skipped == {NON_WORKING: ["2026-03-08"]}
+
+
+def test_range_with_weekdays():
+    assert expand("2026-03-02..2026-03-15:Tue,Thu").dates == ["2026-03-03", "2026-03-05", "2026-03-10", "2026-03-12"]
+
+
+def test_relative_endpoints():
+    assert expand("today..+1w:Mon-Wed").dates == ["2026-03-02", "2026-03-03", "2026-03-04", "2026-03-09"]
+
+
+def test_weekly_rrule():
+    assert expand("RRULE:FREQ=WEEKLY;BYDAY=TU,TH;UNTIL=20260312").dates == [
+        "2026-03-03", "2026-03-05", "2026-03-10", "2026-03-12",
+    ]
+
+
+def test_rrule_interval_and_count():
+    assert expand("RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=FR;COUNT=3;DTSTART=20260306").dates == [
+        "2026-03-06", "2026-03-20", "2026-04-03",
+    ]
+
+
+def test_overlapping_specs_are_merged():
+    assert expand("2026-03-04", "2026-03-02..2026-03-04").dates == ["2026-03-02", "2026-03-03", "2026-03-04"]
+
+
+def test_dropped_days_are_reported_by_reason():
+    result = expand("2026-02-27", "2026-03-04", "2026-03-05", "2026-03-20",
+                    holidays=["2026-03-04"], window_days=10)
+    assert result.dates == ["2026-03-05"]
+    assert result.skipped == {PAST: ["2026-02-27"], HOLIDAY: ["2026-03-04"], OUTSIDE_WINDOW: ["2026-03-20"]}
+
+
+@pytest.mark.parametrize("spec", ["next tuesday", "2026-03-02..2026-03-06:Funday", "RRULE:FREQ=MONTHLY"])
+def test_unreadable_spec(spec):
+    with pytest.raises(ValueError):
+        expand(spec)
+
+
+def test_long_holiday_calendar_is_clipped_to_the_window():
+    result = expand("2026-03-03", holidays=["2020-01-01..2030-12-31:Tue"])
+    assert result.dates == []
+    assert result.skipped == {HOLIDAY: ["2026-03-03"]}
+
+
+def test_too_many_requested_days():
+    with pytest.raises(ValueError, match="requested date specs"):
+        expand("2026-03-02..2028-03-02", window_days=1000)
+
+
+def test_unreadable_holiday_spec_is_named():
+    with pytest.raises(ValueError, match="holiday spec"):
+        expand("2026-03-03", holidays=["not a day"])
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from automation.devices import DEVICE, OFFLINE, TCP, USB, DeviceRegistry
+from devtools.fake_adb import FakeAdbServer
+
+TIMEOUT = 5.0
+
+
+def wait_for(check, timeout=TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while not check():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+@pytest.fixture
+def adb():
+    with FakeAdbServer(devices={"emulator-5554": DEVICE}) as server:
+        yield server
+
+
+@pytest.fixture
+def registry(adb):
+    registry = DeviceRegistry(port=adb.port).start()
+    assert registry.wait_ready(TIMEOUT)
+    yield registry
+    registry.stop()
+
+
+def test_initial_devices(registry):
+    assert registry.connected
+    assert registry.serials() == ["emulator-5554"]
+    assert registry.get("emulator-5554").transport == USB
+
+
+def test_added_and_removed_devices_reach_listeners(adb, registry):
+    changes = []
+    lock = threading.Lock()
+
+    def listener(serial, old_state, new_state):
+        with lock:
+            changes.append((serial, old_state, new_state))
+
+    registry.add_listener(listener)
+    adb.set_device("192.168.1.20:5555", OFFLINE)
+    assert wait_for(lambda: registry.get("192.168.1.20:5555") is not None)
+    assert registry.get("192.168.1.20:5555").transport == TCP
+    assert registry.serials() == ["emulator-5554"]
+
+    adb.set_device("192.168.1.20:5555", DEVICE)
+    assert wait_for(lambda: "192.168.1.20:5555" in registry.serials())
+
+    adb.remove_device("emulator-5554")
+    assert wait_for(lambda: registry.get("emulator-5554") is None)
+
+    with lock:
+        assert changes == [
+            ("192.168.1.20:5555", None, OFFLINE),
+            ("192.168.1.20:5555", OFFLINE, DEVICE),
+            ("emulator-5554", DEVICE, None),
+        ]
+
+
+def test_registry_reconnects_after_adb_restart(adb, registry):
+    adb.drop_clients()
+    # The watcher reconnects on its own and gets the full list again
+    assert wait_for(lambda: registry.connected and registry.serials() == ["emulator-5554"])
+    adb.set_device("emulator-5556")
+    assert wait_for(lambda: sorted(registry.serials()) == ["emulator-5554", "emulator-5556"])
@@ -0,0 +1,125 @@
+import contextlib
+import datetime as dt
+import functools
+import threading
+import time
+
+import pytest
+
+from automation import dispatcher as dispatcher_module
+from automation.dispatcher import Dispatcher
+from automation.driver import create_driver
+from automation.results import FAILED, BookingResult
+from automation.session_pool import SessionPool
+from devtools.fake_appium import FakeAppiumServer, FakeConfig
+
+BUILDING = "Two Horizon Center"
+# Each test books its own days, so ledger rows from earlier tests never apply
+_next_day = [dt.date.today()]
+
+
+def working_days(n):
+    days = []
+    while len(days) < n:
+        _next_day[0] += dt.timedelta(days=1)
+        if _next_day[0].weekday() != 6:
+            days.append(_next_day[0].isoformat())
+    return days
+
+
+@pytest.fixture
+def fake():
+    config = FakeConfig(latency=0.005, render_delay=0.02, gesture_time_scale=0.02)
+    with FakeAppiumServer(config) as server:
+        yield server
+
+
+@pytest.fixture
+def make_dispatcher(fake):
+    pools = []
+
+    def make(devices):
+        pool = SessionPool(factory=functools.partial(create_driver, server_url=fake.url))
+        pools.append(pool)
+        return Dispatcher(pool=pool, udids=[f"fake-{i}" for i in range(devices)])
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def start_client(dispatcher, client, dates, finished):
+    def run():
+        results = dispatcher.book(dates, BUILDING, client=client,
+                                  on_result=lambda r: finished.append((client, r.date, time.monotonic())))
+        finished.append((client, "done", results))
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_same_desk_from_two_clients_is_booked_once(fake, make_dispatcher):
+    dispatcher = make_dispatcher(devices=2)
+    day = working_days(1)
+    finished = []
+    threads = [start_client(dispatcher, f"agent-{i}", day, finished) for i in range(2)]
+    for t in threads:
+        t.join(60)
+
+    results = [r for _, what, r in finished if what == "done"]
+    assert len(results) == 2
+    assert all(r[day[0]].ok for r in results)
+    assert dispatcher.stats()["coalesced"] == 1
+    assert len(fake.bookings) == 1
+
+
+class _NoDevicePool:
+    """Pool stand-in for tests that replace book_desks: the session is never used."""
+
+    @contextlib.contextmanager
+    def session(self, udid=None):
+        yield None
+
+
+def test_retry_budget_is_shared_by_a_request(monkeypatch):
+    budgets = []
+
+    def failing_book_desks(dates, building, retry_budget_s, **kwargs):
+        budgets.append(retry_budget_s)
+        time.sleep(0.3)
+        return {dates[0]: BookingResult(dates[0], FAILED, building, error="no luck")}
+
+    monkeypatch.setattr(dispatcher_module, "RETRY_BUDGET_S", 1.0)
+    monkeypatch.setattr(dispatcher_module, "book_desks", failing_book_desks)
+    dispatcher = Dispatcher(pool=_NoDevicePool(), udids=["fake-0"])
+    results = dispatcher.book(working_days(5), BUILDING, client="agent")
+
+    assert not any(r.ok for r in results.values())
+    # One budget for the whole request, used up as its dates run
+    assert budgets[0] == pytest.approx(1.0, abs=0.05)
+    assert budgets == sorted(budgets, reverse=True)
+    assert budgets[-1] == 0.0
+
+
+def test_short_request_is_not_stuck_behind_a_long_one(make_dispatcher):
+    dispatcher = make_dispatcher(devices=1)
+    long_dates = working_days(5)
+    short_date = working_days(1)
+    finished = []
+    heavy = start_client(dispatcher, "heavy", long_dates, finished)
+    # The other request arrives once the device is busy with the heavy client's first date
+    deadline = time.monotonic() + 30
+    while dispatcher.stats()["devices"].get("fake-0", {}).get("booking") is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    light = start_client(dispatcher, "light", short_date, finished)
+    for t in (heavy, light):
+        t.join(120)
+
+    order = [(client, date) for client, date, _ in finished if date != "done"]
+    assert len(order) == len(long_dates) + 1
+    # Clients take turns, and the heavy client just had one: the light date
+    # comes right after the running one, ahead of the rest of the heavy range
+    assert order.index(("light", short_date[0])) == 1
+    assert all(r.ok for _, what, rs in finished if what == "done" for r in rs.values())
@@ -0,0 +1,125 @@
+import datetime as dt
+import time
+
+import pytest
+
+from automation import gestures, waits
+from automation.driver import create_driver
+from automation.gestures import (
+    DEFAULT_RUNG, FLOOR_TTL_S, LADDER, PROBE_AFTER, GestureProfiles, SwipeNotAccepted, swipe_to_book,
+)
+from automation.wework_flow import check_day, open_date_picker, return_home, select_building
+from devtools.fake_appium import FakeAppiumServer, FakeConfig
+
+KEY = "fake-0|1.0.0"
+
+
+@pytest.fixture
+def profiles(tmp_path, monkeypatch):
+    profiles = GestureProfiles(str(tmp_path / "gestures.json"))
+    monkeypatch.setattr(gestures, "_profiles", profiles)
+    return profiles
+
+
+def test_successes_probe_a_faster_rung(profiles):
+    for _ in range(PROBE_AFTER):
+        profiles.record(KEY, DEFAULT_RUNG, True)
+    assert profiles.rung(KEY) == DEFAULT_RUNG - 1
+
+
+def test_rejection_climbs_and_sets_the_floor(profiles):
+    profiles.record(KEY, DEFAULT_RUNG - 1, False)
+    assert profiles.rung(KEY) == DEFAULT_RUNG
+    # Successes on the floor rung do not probe below it
+    for _ in range(PROBE_AFTER):
+        profiles.record(KEY, DEFAULT_RUNG, True)
+    assert profiles.rung(KEY) == DEFAULT_RUNG
+    assert GestureProfiles(profiles.path).rung(KEY) == DEFAULT_RUNG
+
+
+def test_floor_is_forgotten_after_its_ttl(profiles):
+    profiles.record(KEY, DEFAULT_RUNG - 1, False)
+    profiles._profiles[KEY]["floor_at"] = time.time() - FLOOR_TTL_S - 1
+    for _ in range(PROBE_AFTER):
+        profiles.record(KEY, DEFAULT_RUNG, True)
+    assert profiles.rung(KEY) == DEFAULT_RUNG - 1
+
+
+def test_profiles_are_bounded(profiles, monkeypatch):
+    monkeypatch.setattr(gestures, "MAX_PROFILES", 3)
+    for i in range(5):
+        profiles.record(f"device-{i}|1.0.0", DEFAULT_RUNG, True)
+    assert sorted(profiles._profiles) == ["device-2|1.0.0", "device-3|1.0.0", "device-4|1.0.0"]
+
+
+def test_session_keys_are_bounded(monkeypatch):
+    monkeypatch.setattr(gestures, "MAX_SESSION_KEYS", 2)
+    monkeypatch.setattr(gestures, "_keys", gestures.OrderedDict())
+
+    class Driver:
+        def __init__(self, sid):
+            self.session_id = sid
+            self.capabilities = {"udid": "fake-0"}
+
+        def execute_script(self, *args):
+            return "versionName=2.0"
+
+    for sid in ("a", "b", "c"):
+        assert gestures.profile_key(Driver(sid)) == "fake-0|2.0"
+    assert list(gestures._keys) == ["b", "c"]
+
+
+@pytest.fixture
+def confirmation(profiles, tmp_path, monkeypatch, request):
+    """A session on the fake app's confirmation sheet; request.param is the FakeConfig."""
+    # Learned waits from other tests must not stretch the verify timeout
+    monkeypatch.setattr(waits, "_stats", waits.LatencyStats(str(tmp_path / "latency.json")))
+    with FakeAppiumServer(request.param) as fake:
+        driver = create_driver("fake-0", server_url=fake.url)
+        day = dt.date.today() + dt.timedelta(days=2)
+        if day.weekday() == 6:
+            day += dt.timedelta(days=1)
+        try:
+            return_home(driver)
+            open_date_picker(driver, day)
+            check_day(driver, day)
+            select_building(driver, "Two Horizon Center")
+            yield fake, driver
+        finally:
+            driver.quit()
+
+
+@pytest.mark.parametrize("confirmation", [FakeConfig(gesture_time_scale=0.01, min_swipe_ms=2000)], indirect=True)
+def test_rejected_swipe_is_retried_one_rung_slower(confirmation, profiles):
+    fake, driver = confirmation
+    assert swipe_to_book(driver) == LADDER[DEFAULT_RUNG + 1]
+    assert len(fake.bookings) == 1
+    assert profiles.rung(KEY) == DEFAULT_RUNG + 1
+
+
+@pytest.mark.parametrize("confirmation", [FakeConfig(gesture_time_scale=0.01)], indirect=True)
+def test_other_screens_are_not_rejections(confirmation, profiles, monkeypatch):
+    fake, driver = confirmation
+
+    def swipe_into_home(driver, rect, profile):
+        # e.g. the app dropped back home instead of booking
+        app = next(iter(fake.sessions.values()))
+        app.stack = ["home"]
+
+    monkeypatch.setattr(gestures, "perform_swipe", swipe_into_home)
+    with pytest.raises(SwipeNotAccepted, match="home"):
+        swipe_to_book(driver)
+    assert "floor_at" not in profiles._profiles.get(KEY, {})
+    assert profiles.rung(KEY) == DEFAULT_RUNG
+
+
+@pytest.mark.parametrize("confirmation", [FakeConfig(gesture_time_scale=0.01, render_delay=0.6)], indirect=True)
+def test_slow_booked_sheet_is_not_swiped_again(confirmation, profiles, monkeypatch):
+    fake, driver = confirmation
+    # The booked sheet renders after the verify timeout but within the second look
+    monkeypatch.setattr(gestures, "VERIFY_TIMEOUT", 0.2)
+    swipes = []
+    real = gestures.perform_swipe
+    monkeypatch.setattr(gestures, "perform_swipe", lambda *a: (swipes.append(a[2]), real(*a)))
+    assert swipe_to_book(driver) == LADDER[DEFAULT_RUNG]
+    assert len(swipes) == 1 and len(fake.bookings) == 1
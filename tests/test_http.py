@@ -0,0 +1,45 @@
+import pytest
+from starlette.testclient import TestClient
+
+from app_mcp import server
+
+INITIALIZE = {
+    "jsonrpc": "2.0", "id": 1, "method": "initialize",
+    "params": {"protocolVersion": "2025-03-26", "capabilities": {}, "clientInfo": {"name": "test", "version": "1"}},
+}
+HEADERS = {"accept": "application/json, text/event-stream", "content-type": "application/json"}
+
+
+@pytest.fixture(autouse=True)
+def http_settings(monkeypatch):
+    """configure_http changes the shared server settings; put them back afterwards."""
+    for name in ("host", "port", "json_response", "transport_security"):
+        monkeypatch.setattr(server.mcp.settings, name, getattr(server.mcp.settings, name))
+    for name in ("MCP_ALLOWED_HOSTS", "MCP_AUTH_TOKEN"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_open_bind_without_protection_is_refused():
+    with pytest.raises(ValueError, match="Refusing to serve on 0.0.0.0"):
+        server.configure_http("0.0.0.0", 8000)
+
+
+def test_loopback_and_protected_binds_are_accepted(monkeypatch):
+    server.configure_http("127.0.0.1", 8000)
+    monkeypatch.setenv("MCP_ALLOWED_HOSTS", "desks.example:8000")
+    server.configure_http("0.0.0.0", 8000)
+    assert server.mcp.settings.transport_security.allowed_hosts == ["desks.example:8000"]
+
+
+def test_bearer_token_is_required(monkeypatch):
+    monkeypatch.setenv("MCP_AUTH_TOKEN", "s3cret")
+    server.configure_http("0.0.0.0", 8000)
+    with TestClient(server.http_app("streamable-http")) as client:
+        missing = client.post("/mcp", json=INITIALIZE, headers=HEADERS)
+        wrong = client.post("/mcp", json=INITIALIZE, headers={**HEADERS, "authorization": "Bearer guess"})
+        right = client.post("/mcp", json=INITIALIZE, headers={**HEADERS, "authorization": "Bearer s3cret"})
+
+    assert missing.status_code == wrong.status_code == 401
+    assert missing.headers["www-authenticate"] == "Bearer"
+    assert right.status_code == 200
+    assert "serverInfo" in right.text
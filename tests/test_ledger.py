@@ -0,0 +1,72 @@
+import datetime as dt
+
+import pytest
+
+from automation import ledger as ledger_module
+from automation.driver import create_driver
+from automation.ledger import ATTEMPTED, CANCELLED, CONFIRMED, FAILED, Ledger
+from automation.results import ALREADY_BOOKED, BOOKED
+from automation.wework_flow import book_desks
+from devtools.fake_appium import FakeAppiumServer, FakeConfig
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return Ledger(str(tmp_path / "ledger.sqlite3"))
+
+
+def test_marks_and_normalised_names(ledger):
+    ledger.mark_attempted("me", "Two Horizon Centre", "2026-03-03")
+    assert ledger.status("me", "Two Horizon Center", "2026-03-03") == ATTEMPTED
+    ledger.mark_confirmed("me", "two horizon center", "2026-03-03")
+    assert ledger.confirmed_dates("me", "Two Horizon Center", ["2026-03-03", "2026-03-04"]) == {"2026-03-03"}
+    ledger.mark_cancelled("me", "Two Horizon Center", "2026-03-03")
+    assert ledger.status("me", "Two Horizon Center", "2026-03-03") == CANCELLED
+    ledger.discard("me", "Two Horizon Center", "2026-03-03")
+    assert ledger.status("me", "Two Horizon Center", "2026-03-03") is None
+
+
+def test_reconcile_confirms_what_the_app_lists(ledger):
+    ledger.mark_failed("me", "Two Horizon Center", "2026-03-04", "timeout")
+    ledger.reconcile("me", [("Two Horizon Center", "2026-03-04"), ("Forum DLF", "2026-03-06")])
+    assert ledger.status("me", "Two Horizon Center", "2026-03-04") == CONFIRMED
+    assert ledger.status("me", "Forum DLF", "2026-03-06") == CONFIRMED
+
+
+def test_reconcile_fails_confirmed_rows_missing_from_the_listed_span(ledger):
+    for date in ("2026-03-02", "2026-03-05", "2026-03-20"):
+        ledger.mark_confirmed("me", "Two Horizon Center", date)
+    ledger.mark_confirmed("someone else", "Two Horizon Center", "2026-03-05")
+    ledger.reconcile("me", [("Two Horizon Center", "2026-03-04"), ("Two Horizon Center", "2026-03-06")])
+    # Inside 03-04..03-06 and not listed: cancelled in the app or never went through
+    assert ledger.status("me", "Two Horizon Center", "2026-03-05") == FAILED
+    # Outside the span the app showed, nothing can be concluded
+    assert ledger.status("me", "Two Horizon Center", "2026-03-02") == CONFIRMED
+    assert ledger.status("me", "Two Horizon Center", "2026-03-20") == CONFIRMED
+    assert ledger.status("someone else", "Two Horizon Center", "2026-03-05") == CONFIRMED
+
+
+def test_reconcile_with_nothing_listed_changes_nothing(ledger):
+    ledger.mark_confirmed("me", "Two Horizon Center", "2026-03-05")
+    ledger.reconcile("me", [])
+    assert ledger.status("me", "Two Horizon Center", "2026-03-05") == CONFIRMED
+
+
+def test_booking_runs_skip_confirmed_dates_and_record_the_centre_name(ledger, monkeypatch):
+    monkeypatch.setattr(ledger_module, "_ledger", ledger)
+    day = dt.date.today() + dt.timedelta(days=5)
+    if day.weekday() == 6:
+        day += dt.timedelta(days=1)
+    with FakeAppiumServer(FakeConfig()) as fake:
+        driver = create_driver("fake-0", server_url=fake.url)
+        try:
+            first = book_desks([day.isoformat()], "two horizon", driver=driver, account="me", reconcile=False)
+            again = book_desks([day.isoformat()], "Two Horizon Center", driver=driver, account="me", reconcile=False)
+        finally:
+            driver.quit()
+    assert first[day.isoformat()].status == BOOKED
+    assert again[day.isoformat()].status == ALREADY_BOOKED
+    assert len(fake.bookings) == 1
+    # Keyed by the card's name, not the words the caller used
+    assert ledger.status("me", "Two Horizon Center", day.isoformat()) == CONFIRMED
+    assert ledger.status("me", "two horizon", day.isoformat()) is None
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+from appium.webdriver.common.appiumby import AppiumBy
+
+from automation.driver import APP_PACKAGE, create_driver
+from automation.locator import Snapshot, parse_uiselector, take_snapshot, tap_node
+from devtools.fake_appium import FakeAppiumServer, FakeConfig
+
+UI_XML = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ui.xml")
+
+
+@pytest.fixture(scope="module")
+def home():
+    with open(UI_XML, encoding="utf-8") as f:
+        return Snapshot.parse(f.read())
+
+
+def test_parse_keeps_package_and_entities(home):
+    assert home.package == APP_PACKAGE
+    # &#10; in content-desc becomes a real newline
+    assert "Two Horizon Center\n5th Floor" in home.by_desc
+    assert home.find(AppiumBy.ID, "android:id/content").bounds == (0, 0, 720, 1536)
+
+
+def test_accessibility_id(home):
+    desk = home.find(AppiumBy.ACCESSIBILITY_ID, "Desk")
+    assert desk.bounds == (22, 964, 167, 1122)
+    assert desk.center == (94, 1043)
+    assert desk.rect == {"x": 22, "y": 964, "width": 145, "height": 158}
+
+
+def test_zero_size_nodes_are_not_matched(home):
+    # The dump holds two "VIEW ALL ->" links; the second is laid out off screen
+    assert len(home.by_desc["VIEW ALL ->"]) == 2
+    assert [n.bounds for n in home.find_all(AppiumBy.ACCESSIBILITY_ID, "VIEW ALL ->")] == [(576, 908, 698, 942)]
+
+
+def test_uiselector_chains(home):
+    contains = 'new UiSelector().descriptionContains("Two Horizon")'
+    assert home.find(AppiumBy.ANDROID_UIAUTOMATOR, contains).desc == "Two Horizon Center\n5th Floor"
+    scroll = 'new UiSelector().className("android.widget.ScrollView").instance(0)'
+    assert home.find(AppiumBy.ANDROID_UIAUTOMATOR, scroll).bounds == (0, 0, 720, 1536)
+    starts = 'new UiSelector().descriptionStartsWith("Book").clickable(true)'
+    assert [n.desc for n in home.find_all(AppiumBy.ANDROID_UIAUTOMATOR, starts)] == ["Bookings"]
+
+
+def test_miss_and_unsupported_selectors(home):
+    assert home.find(AppiumBy.ACCESSIBILITY_ID, "Does not exist") is None
+    # None (not []) tells the caller to ask the server instead
+    assert home.find_all(AppiumBy.XPATH, "//node") is None
+    assert home.find_all(AppiumBy.ANDROID_UIAUTOMATOR, 'new UiScrollable(new UiSelector()).scrollIntoView(x)') is None
+
+
+def test_parse_uiselector():
+    assert parse_uiselector('new UiSelector().text("a \\"b\\"").instance(2).enabled(false)') == {
+        "text": 'a "b"', "instance": 2, "enabled": False,
+    }
+    assert parse_uiselector('new UiSelector().textMatches("a.*")') is None
+    assert parse_uiselector('new UiSelector().text("a") junk') is None
+
+
+def test_tap_from_snapshot_on_the_fake_app():
+    with FakeAppiumServer(FakeConfig()) as fake:
+        driver = create_driver("fake-0", server_url=fake.url)
+        try:
+            snap = take_snapshot(driver)
+            tap_node(driver, snap.find(AppiumBy.ACCESSIBILITY_ID, "Desk"))
+            assert take_snapshot(driver).descs_containing("All day")
+            # One source dump and one W3C action; no element finds or clicks
+            assert fake.command_counts["find"] == 0 and fake.command_counts["click"] == 0
+        finally:
+            driver.quit()
@@ -0,0 +1,34 @@
+import datetime as dt
+
+from automation.planner import FIXED_ACTIONS, plan_bookings
+
+TODAY = dt.date(2026, 3, 10)
+
+
+def test_duplicates_dropped_and_grouped_by_month_then_building():
+    plan = plan_bookings([
+        ("2026-04-02", "Vatika"), ("2026-03-12", "Two Horizon"), ("2026-04-01", "Two Horizon"),
+        ("2026-03-11", "Vatika"), ("2026-03-12", "Two Horizon"), ("2026-03-13", "Two Horizon"),
+    ], today=TODAY)
+    assert [(i.date.isoformat(), i.building) for i in plan.items] == [
+        ("2026-03-12", "Two Horizon"), ("2026-03-13", "Two Horizon"), ("2026-03-11", "Vatika"),
+        ("2026-04-01", "Two Horizon"), ("2026-04-02", "Vatika"),
+    ]
+    assert [(g["month"], g["building"], len(g["dates"])) for g in plan.groups()] == [
+        ("2026-03", "Two Horizon", 2), ("2026-03", "Vatika", 1),
+        ("2026-04", "Two Horizon", 1), ("2026-04", "Vatika", 1),
+    ]
+
+
+def test_estimate_counts_month_presses_from_the_current_month():
+    plan = plan_bookings([("2026-03-12", "A"), ("2026-04-01", "A"), ("2026-06-01", "A")], today=TODAY)
+    assert [i.month_presses for i in plan.items] == [0, 1, 3]
+    # The picker reopens on the current month each time, so presses never carry over
+    assert plan.estimated_actions == 3 * FIXED_ACTIONS + 4
+    assert plan.describe().startswith(f"3 booking(s), ~{3 * FIXED_ACTIONS + 4} UI actions (4 of them month presses")
+
+
+def test_empty_plan():
+    plan = plan_bookings([], today=TODAY)
+    assert plan.estimated_actions == 0
+    assert plan.describe().endswith("nothing to book")
@@ -0,0 +1,73 @@
+import datetime as dt
+import functools
+import time
+
+import pytest
+
+from automation import ledger as ledger_module
+from automation.dispatcher import Dispatcher
+from automation.driver import create_driver
+from automation.ledger import Ledger
+from automation.scheduler import DONE, Scheduler
+from automation.session_pool import SessionPool
+from devtools.fake_appium import FakeAppiumServer, FakeConfig
+
+BUILDING = "Two Horizon Center"
+
+
+def working_day(ahead):
+    day = dt.date.today() + dt.timedelta(days=ahead)
+    if day.weekday() == 6:
+        day += dt.timedelta(days=1)
+    return day.isoformat()
+
+
+@pytest.fixture
+def dispatcher():
+    config = FakeConfig(latency=0.005, render_delay=0.02, gesture_time_scale=0.02)
+    with FakeAppiumServer(config) as server:
+        pool = SessionPool(factory=functools.partial(create_driver, server_url=server.url))
+        try:
+            yield server, Dispatcher(pool=pool, udids=["fake-0"])
+        finally:
+            pool.close()
+
+
+def wait_for_run(scheduler, schedule_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while True:
+        schedule = next(s for s in scheduler.list() if s.id == schedule_id)
+        if schedule.runs:
+            return schedule
+        assert time.monotonic() < deadline, "the schedule never ran"
+        time.sleep(0.05)
+
+
+def test_prewarmed_schedule_fires_on_time(tmp_path, dispatcher, monkeypatch):
+    fake, d = dispatcher
+    # A ledger of its own, so no other test's booking marks these dates booked already
+    monkeypatch.setattr(ledger_module, "_ledger", Ledger(str(tmp_path / "ledger.sqlite3")))
+    dates = [working_day(10), working_day(12)]
+    scheduler = Scheduler(str(tmp_path / "schedules.json"), dispatcher=d).start()
+    try:
+        schedule = scheduler.add(dates, BUILDING, fire_at=time.time() + 3, lead_s=2.5)
+        schedule = wait_for_run(scheduler, schedule.id)
+    finally:
+        scheduler.stop()
+
+    run = schedule.runs[0]
+    assert schedule.status == DONE
+    assert run["prewarmed"] is True
+    # The picker was open before the fire time, so only the tap-to-swipe part is left at it
+    assert run["prewarm_s"] < 2.5
+    assert abs(run["jitter_ms"]) < 100
+    assert "first_booked_after_ms" in run
+    assert [r["status"] for r in run["results"]] == ["booked", "booked"]
+    assert sorted(b["date"].isoformat() for b in fake.bookings) == dates
+
+
+def test_schedules_survive_a_restart(tmp_path):
+    path = str(tmp_path / "schedules.json")
+    schedule = Scheduler(path).add([working_day(10)], BUILDING, fire_at=time.time() + 3600)
+    reloaded = Scheduler(path).list()
+    assert [(s.id, s.dates, s.fire_at) for s in reloaded] == [(schedule.id, schedule.dates, schedule.fire_at)]
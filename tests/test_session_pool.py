@@ -0,0 +1,88 @@
+import functools
+import time
+
+import pytest
+
+from automation.devices import OFFLINE
+from automation.driver import SYSTEM_PORT_BASE, create_driver
+from automation.session_pool import SessionPool
+from devtools.fake_appium import FakeAppiumServer, FakeConfig
+
+
+@pytest.fixture
+def fake():
+    with FakeAppiumServer(FakeConfig()) as server:
+        yield server
+
+
+def make_pool(fake, **kwargs):
+    created = []
+
+    def factory(udid, **caps):
+        driver = create_driver(udid, server_url=fake.url, **caps)
+        created.append((udid, caps.get("system_port")))
+        return driver
+
+    return SessionPool(factory=factory, **kwargs), created
+
+
+def test_session_is_reused_between_leases(fake):
+    pool, created = make_pool(fake)
+    try:
+        with pool.session("fake-0") as first:
+            pass
+        with pool.session("fake-0") as second:
+            assert second is first
+        assert created == [("fake-0", SYSTEM_PORT_BASE)]
+    finally:
+        pool.close()
+
+
+def test_devices_get_their_own_system_port(fake):
+    pool, created = make_pool(fake)
+    try:
+        pool.warm("fake-0")
+        pool.warm("fake-1")
+        assert [port for _, port in created] == [SYSTEM_PORT_BASE, SYSTEM_PORT_BASE + 1]
+    finally:
+        pool.close()
+
+
+def test_reconnected_device_keeps_its_system_port(fake):
+    pool, created = make_pool(fake)
+    try:
+        pool.warm("fake-0")
+        pool.warm("fake-1")
+        for _ in range(3):
+            pool.device_changed("fake-1", "device", OFFLINE)
+            pool.warm("fake-1")
+        assert {port for udid, port in created if udid == "fake-1"} == {SYSTEM_PORT_BASE + 1}
+    finally:
+        pool.close()
+
+
+def test_keepalive_rebuilds_a_reaped_idle_session(fake):
+    pool, created = make_pool(fake, keepalive_interval=0.2)
+    try:
+        pool.warm("fake-0")
+        # Appium's newCommandTimeout ran out while nobody held the session
+        fake.sessions.clear()
+        deadline = time.monotonic() + 5
+        while len(created) < 2:
+            assert time.monotonic() < deadline, "keepalive did not rebuild the session"
+            time.sleep(0.05)
+        with pool.session("fake-0") as driver:
+            assert driver.current_package
+        assert len(created) == 2
+    finally:
+        pool.close()
+
+
+def test_session_of_a_dropped_device_is_quit_when_returned(fake):
+    pool, _ = make_pool(fake)
+    try:
+        with pool.session("fake-0"):
+            pool.device_changed("fake-0", "device", None)
+        assert not fake.sessions
+    finally:
+        pool.close()
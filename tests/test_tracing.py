@@ -0,0 +1,75 @@
+import json
+import uuid
+
+import pytest
+
+from automation import tracing
+from automation.state import state_dir
+
+
+def unique(name):
+    return f"{name}-{uuid.uuid4().hex[:6]}"
+
+
+def test_span_records_duration_retries_fields_and_run():
+    step = unique("step")
+    with tracing.run() as run_id:
+        with tracing.span(step, selector="Desk", label="desk") as s:
+            tracing.note_retry()
+            tracing.note_retry()
+            s.set(via="snapshot")
+    [record] = tracing.recent_spans(run_id)
+    assert record["step"] == step and record["run"] == run_id
+    assert (record["selector"], record["retries"], record["outcome"]) == ("Desk", 2, "ok")
+    assert (record["label"], record["via"]) == ("desk", "snapshot")
+    assert record["duration_ms"] >= 0
+
+
+def test_failed_span_keeps_the_error_and_reraises():
+    step = unique("step")
+    with tracing.run() as run_id:
+        with pytest.raises(ValueError):
+            with tracing.span(step):
+                raise ValueError("no such card")
+    [record] = tracing.recent_spans(run_id)
+    assert record["outcome"] == "error"
+    assert record["error"] == "ValueError: no such card"
+
+
+def test_retries_count_against_the_innermost_span():
+    with tracing.run() as run_id:
+        with tracing.span(unique("outer")):
+            with tracing.span(unique("inner")):
+                tracing.note_retry()
+    inner, outer = tracing.recent_spans(run_id)
+    assert (inner["retries"], outer["retries"]) == (1, 0)
+
+
+def test_spans_go_to_the_trace_file():
+    step = unique("step")
+    with tracing.run():
+        with tracing.span(step):
+            pass
+    lines = (state_dir() / tracing.TRACE_FILE).read_text(encoding="utf-8").splitlines()
+    assert any(json.loads(line)["step"] == step for line in lines)
+
+
+def test_summarize_over_the_last_runs():
+    step = unique("step")
+    for retries in (0, 1, 2):
+        with tracing.run():
+            with tracing.span(step):
+                for _ in range(retries):
+                    tracing.note_retry()
+    with tracing.run():
+        with pytest.raises(RuntimeError):
+            with tracing.span(step):
+                raise RuntimeError("boom")
+
+    summary = tracing.summarize(last_runs=4)
+    assert summary["runs"] == 4
+    stats = summary["steps"][step]
+    assert (stats["count"], stats["errors"], stats["retries"]) == (4, 1, 3)
+    assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+    # The window only holds the latest run
+    assert tracing.summarize(last_runs=1)["steps"][step]["count"] == 1
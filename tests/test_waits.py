@@ -0,0 +1,95 @@
+import json
+import threading
+
+import pytest
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+
+from automation import waits
+from automation.waits import BUCKETS, MAX_TIMEOUT, MIN_SAMPLES, MIN_TIMEOUT, LatencyHistogram, LatencyStats
+
+
+def test_histogram_percentiles_are_bucket_upper_bounds():
+    hist = LatencyHistogram()
+    for seconds in [0.01] * 90 + [0.3] * 9 + [100.0]:
+        hist.add(seconds)
+    assert hist.total == 100
+    assert hist.percentile(50) == 0.025
+    assert hist.percentile(95) == 0.35
+    # The open-ended last bucket reads as the timeout cap
+    assert hist.percentile(100) == MAX_TIMEOUT
+    assert LatencyHistogram().percentile(99) == 0.0
+
+
+def test_histogram_rejects_counts_of_another_layout():
+    assert LatencyHistogram([1, 2, 3]).counts == [0] * (len(BUCKETS) + 1)
+
+
+def test_timeout_is_learned_once_there_are_enough_samples(tmp_path):
+    stats = LatencyStats(str(tmp_path / "latency.json"))
+    for _ in range(MIN_SAMPLES - 1):
+        stats.record("desk", 1.2)
+    assert stats.timeout_for("desk", 20.0) == 20.0
+    stats.record("desk", 1.2)
+    # p99 lands in the 1.5 s bucket, times the headroom
+    assert stats.timeout_for("desk", 20.0) == pytest.approx(1.5 * waits.HEADROOM)
+    for _ in range(MIN_SAMPLES):
+        stats.record("fast", 0.01)
+    assert stats.timeout_for("fast", 20.0) == MIN_TIMEOUT
+
+
+def test_stats_survive_a_restart(tmp_path):
+    path = str(tmp_path / "latency.json")
+    stats = LatencyStats(path)
+    for _ in range(MIN_SAMPLES):
+        stats.record("desk", 0.4)
+    stats.flush()
+    assert LatencyStats(path).snapshot() == {"desk": {"samples": MIN_SAMPLES, "p50": 0.5, "p99": 0.5}}
+
+
+def test_stats_from_another_bucket_layout_are_ignored(tmp_path):
+    path = tmp_path / "latency.json"
+    path.write_text(json.dumps({"buckets": [1, 2], "steps": {"desk": [5, 0, 0]}}))
+    assert LatencyStats(str(path)).snapshot() == {}
+
+
+def test_concurrent_flushes_leave_a_whole_file(tmp_path):
+    path = tmp_path / "latency.json"
+    stats = LatencyStats(str(path))
+
+    def work(step):
+        for _ in range(50):
+            stats.record(step, 0.1)
+            stats.flush()
+
+    threads = [threading.Thread(target=work, args=(f"step-{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(json.loads(path.read_text())["steps"]) == [f"step-{i}" for i in range(4)]
+    # No temp files left behind next to the stats file
+    assert [p.name for p in tmp_path.iterdir()] == ["latency.json"]
+
+
+def test_adaptive_wait_polls_until_ready(tmp_path, monkeypatch):
+    stats = LatencyStats(str(tmp_path / "latency.json"))
+    monkeypatch.setattr(waits, "_stats", stats)
+    calls = []
+
+    def ready(driver):
+        calls.append(driver)
+        if len(calls) < 3:
+            raise NoSuchElementException()
+        return "element"
+
+    assert waits.adaptive_wait("driver", ready, "step", 5.0) == "element"
+    assert len(calls) == 3
+    assert stats.snapshot()["step"]["samples"] == 1
+
+
+def test_adaptive_wait_records_timeouts(tmp_path, monkeypatch):
+    stats = LatencyStats(str(tmp_path / "latency.json"))
+    monkeypatch.setattr(waits, "_stats", stats)
+    with pytest.raises(TimeoutException):
+        waits.adaptive_wait(None, lambda d: None, "never", 0.2)
+    assert stats.snapshot()["never"]["samples"] == 1